@@ -1,14 +1,46 @@
+import hashlib
 from collections.abc import Iterator
 from itertools import chain
+from types import SimpleNamespace
 from typing import Any
 
-
-def apply_min_period(samples: Iterator, period: float) -> Iterator:
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.generated import EPICSEvent_pb2
+from aa_edit_data.waveform import (
+    WAVEFORM_DTYPES,
+    decode_values,
+    import_numpy,
+    packed_values,
+)
+from aa_edit_data.wire import (
+    FIELD_NAME,
+    FIELDACTUALCHANGE,
+    FIELDVALUES,
+    LEN,
+    VARINT,
+    iter_fields,
+    read_varint,
+    val_fields,
+    wire_timestamp,
+)
+
+# Tag bytes of the fieldvalues and fieldactualchange fields of a sample, which are
+# never escaped
+FIELD_TAGS = (b"\x3a", b"\x40")
+# Functions giving the part of a line of a PB file that duplicates share
+DUPLICATE_KEYS = {"bytes": bytes, "timestamp": wire_timestamp}
+
+
+def apply_min_period(
+    samples: Iterator, period: float, state: dict | None = None
+) -> Iterator:
     """Reduce the frequency of samples by applying a minimum period.
 
     Args:
         samples (Iterator): Iterator of samples.
         period (float): Desired minimum period between adjacent samples.
+        state (dict | None, optional): State to continue from, updated in place with
+        the timestamp of the last yielded sample so that processing can be resumed.
 
     Raises:
         ValueError: Raised if a period of less than 1 nanosecond is given.
@@ -28,61 +60,105 @@ def apply_min_period(samples: Iterator, period: float) -> Iterator:
         delta = nano_delta  # For short periods still count nano
         get_diff = get_nano_diff
 
-    first_sample = next(samples)
-    yield first_sample
-    last_yielded_sample = first_sample
+    if state is not None and "secondsintoyear" in state:
+        last_yielded_sample = SimpleNamespace(**state)
+    else:
+        first_sample = next(samples, None)
+        if first_sample is None:
+            return
+        _save_timestamp(state, first_sample)
+        yield first_sample
+        last_yielded_sample = first_sample
     for sample in samples:
         if get_diff(last_yielded_sample, sample) >= delta:
             last_yielded_sample = sample
+            if state is not None:
+                _save_timestamp(state, sample)
             yield sample
 
 
-def remove_by_factor(samples: Iterator, factor: int) -> Iterator:
+def _save_timestamp(state: dict | None, sample: Any):
+    if state is not None:
+        state["secondsintoyear"] = sample.secondsintoyear
+        state["nano"] = sample.nano
+
+
+def remove_by_factor(
+    samples: Iterator, factor: int, state: dict | None = None
+) -> Iterator:
     """Reduce the number of samples by a certain factor.
 
     Args:
         samples (Iterator): Iterator of samples.
         factor (int): Factor to reduce the data by.
+        state (dict | None, optional): State to continue from, updated in place with
+        the number of samples seen so that processing can be resumed.
 
     Returns:
         Iterator: Iterator of reduced list of samples.
     """
     if factor <= 0:
         raise ValueError(f"Factor ({factor}) should be > 0.")
-    return (sample for i, sample in enumerate(samples) if i % factor == 0)
+    if state is None:
+        return (sample for i, sample in enumerate(samples) if i % factor == 0)
+    return _remove_by_factor_with_state(samples, factor, state)
 
 
-def remove_before_ts(samples: Iterator, seconds: int, nano: int = 0) -> Iterator:
+def _remove_by_factor_with_state(
+    samples: Iterator, factor: int, state: dict
+) -> Iterator:
+    for sample in samples:
+        i = state.get("index", 0)
+        state["index"] = i + 1
+        if i % factor == 0:
+            yield sample
+
+
+def remove_before_ts(
+    samples: Iterator, seconds: int, nano: int = 0, state: dict | None = None
+) -> Iterator:
     """Remove all samples before a certain timestamp.
 
     Args:
         samples (Iterator): Iterator of samples.
         seconds (int): Seconds portion of timestamp.
         nano (int, optional): Nanoseconds portion of timestamp. Defaults to 0.
+        state (dict | None, optional): State to continue from, updated in place once
+        the timestamp is reached so that processing can be resumed.
 
     Returns:
         Iterator: Iterator of reduced list of samples.
     """
+    if state is not None and state.get("reached"):
+        return samples
     if nano >= 10**9 or nano < 0:
         seconds += nano // (10**9)
         nano = nano % (10**9)
     for sample in samples:
         if not is_before(sample, seconds, nano):
+            if state is not None:
+                state["reached"] = True
             return chain([sample], samples)
     return iter([])
 
 
-def remove_after_ts(samples: Iterator, seconds: int, nano: int = 0) -> Iterator:
+def remove_after_ts(
+    samples: Iterator, seconds: int, nano: int = 0, state: dict | None = None
+) -> Iterator:
     """Remove all samples after a certain timestamp.
 
     Args:
         samples (list): Iterator of samples.
         seconds (int): Seconds portion of timestamp.
         nano (int, optional): Nanoseconds portion of timestamp. Defaults to 0.
+        state (dict | None, optional): State to continue from, updated in place once
+        the timestamp is passed so that processing can be resumed.
 
     Returns:
         Iterator: Iterator of reduced list of samples.
     """
+    if state is not None and state.get("passed"):
+        return
     if nano >= 10**9 or nano < 0:
         seconds += nano // (10**9)
         nano = nano % (10**9)
@@ -90,9 +166,217 @@ def remove_after_ts(samples: Iterator, seconds: int, nano: int = 0) -> Iterator:
         if not is_after(sample, seconds, nano):
             yield sample
         else:
+            if state is not None:
+                state["passed"] = True
             break
 
 
+def remove_duplicates(
+    samples: Iterator[bytes],
+    by: str = "bytes",
+    keep: str = "first",
+    state: dict | None = None,
+) -> Iterator[bytes]:
+    """Remove consecutive duplicate samples, comparing the lines of the PB file
+    without decoding them.
+
+    Args:
+        samples (Iterator[bytes]): Iterator of samples as bytes.
+        by (str, optional): "bytes" to remove samples identical to the one before,
+        or "timestamp" to remove samples with the same timestamp as the one before,
+        whatever their value. Defaults to "bytes".
+        keep (str, optional): Keep the "first" or "last" of each run of duplicates.
+        Defaults to "first".
+        state (dict | None, optional): State to continue from, updated in place with
+        the last sample yielded and any sample held back, as hex, so that processing
+        can be resumed. A duplicate of the last sample yielded by a previous run is
+        always removed, even when keeping the last.
+
+    Raises:
+        ValueError: Raised if by or keep is not one of the values above.
+
+    Yields:
+        Iterator[bytes]: Iterator of samples without duplicates.
+    """
+    if by not in DUPLICATE_KEYS:
+        raise ValueError(f"Cannot compare samples by {by!r}")
+    if keep not in ("first", "last"):
+        raise ValueError(f"Cannot keep the {keep!r} duplicate")
+    key = DUPLICATE_KEYS[by]
+    last = _load_sample(state, "last")
+    last_key = None if last is None else key(last)
+    # With keep="last", the sample held back until one with a different key is read
+    pending = _load_sample(state, "pending")
+    pending_key = None if pending is None else key(pending)
+    for sample in samples:
+        sample_key = key(sample)
+        if keep == "first":
+            if sample_key == last_key:
+                continue
+            last_key = sample_key
+            _save_sample(state, "last", sample)
+            yield sample
+        elif pending is not None and sample_key == pending_key:
+            pending = sample
+            _save_sample(state, "pending", sample)
+        elif pending is None and sample_key == last_key:
+            continue
+        else:
+            if pending is not None:
+                _save_sample(state, "last", pending)
+                yield pending
+            pending, pending_key = sample, sample_key
+            _save_sample(state, "pending", sample)
+    if pending is not None:
+        _save_sample(state, "last", pending)
+        _save_sample(state, "pending", None)
+        yield pending
+
+
+def _load_sample(state: dict | None, name: str) -> bytes | None:
+    if state is None or state.get(name) is None:
+        return None
+    return bytes.fromhex(state[name])
+
+
+def _save_sample(state: dict | None, name: str, sample: bytes | None):
+    if state is not None:
+        state[name] = None if sample is None else sample.hex()
+
+
+def strip_fields(
+    samples: Iterator[bytes], keep_changed: bool = False, state: dict | None = None
+) -> Iterator[bytes]:
+    """Remove the fieldvalues and fieldactualchange fields, e.g. the PV's DESC and
+    EGU that the archiver stores with some samples, from the lines of a PB file
+    without decoding them. Lines without those fields are passed through unchanged.
+
+    Args:
+        samples (Iterator[bytes]): Iterator of samples as bytes.
+        keep_changed (bool, optional): Keep each field value that differs from the
+        last one kept with the same name, and the fieldactualchange flag of samples
+        that keep one. Defaults to False.
+        state (dict | None, optional): State to continue from, updated in place with
+        the last value kept for each field name, as hex, so that processing can be
+        resumed.
+
+    Yields:
+        Iterator[bytes]: Iterator of samples without the fields.
+    """
+    last_values: dict[bytes, bytes] = {}
+    if state is not None:
+        fields = state.setdefault("fields", {})
+        last_values = {
+            bytes.fromhex(name): bytes.fromhex(value) for name, value in fields.items()
+        }
+    for sample in samples:
+        if FIELD_TAGS[0] not in sample and FIELD_TAGS[1] not in sample:
+            yield sample
+            continue
+        data = ArchiverData.unescape_line(sample)
+        kept = []
+        actual_change = None
+        removed = changed = False
+        for number, wire_type, start, end in iter_fields(data):
+            if number == FIELDVALUES and wire_type == LEN:
+                if keep_changed and _field_changed(data[start:end], last_values, state):
+                    kept.append(data[start:end])
+                    changed = True
+                else:
+                    removed = True
+            elif number == FIELDACTUALCHANGE and wire_type == VARINT:
+                actual_change = data[start:end]
+                removed = True
+            else:
+                kept.append(data[start:end])
+        if not removed:
+            yield sample
+            continue
+        if changed and actual_change is not None:
+            kept.append(actual_change)
+        yield ArchiverData.escape_line(b"".join(kept))
+
+
+def _field_changed(field: bytes, last_values: dict[bytes, bytes], state: dict | None):
+    """Check whether a fieldvalues field differs from the last one kept with the same
+    name, and if so record it as the last one kept."""
+    _, pos = read_varint(field, 0)
+    _, pos = read_varint(field, pos)
+    value = field[pos:]
+    name = b""
+    for number, wire_type, start, end in iter_fields(value):
+        if number == FIELD_NAME and wire_type == LEN:
+            name = value[read_varint(value, start + 1)[1] : end]
+    if last_values.get(name) == value:
+        return False
+    last_values[name] = value
+    if state is not None:
+        state["fields"][name.hex()] = value.hex()
+    return True
+
+
+def remove_unchanged(
+    samples: Iterator[bytes],
+    proto_class_name: str,
+    tolerance: float = 0,
+    state: dict | None = None,
+) -> Iterator[bytes]:
+    """Remove samples whose value is the same as that of the last sample kept, e.g.
+    waveforms of lookup tables or configuration that are archived at a fixed rate
+    but rarely change. Values are compared by a hash of their serialised bytes,
+    without decoding them.
+
+    Args:
+        samples (Iterator[bytes]): Iterator of samples as bytes.
+        proto_class_name (str): Name of the EPICSEvent_pb2 class of the samples.
+        tolerance (float, optional): Also remove samples whose elements each differ
+        by at most this much from those of the last sample kept. The values are
+        then decoded, so this needs numpy and a waveform of numbers. Defaults to 0.
+        state (dict | None, optional): State to continue from, updated in place with
+        the hash, or with tolerance the values, of the last sample kept, as hex, so
+        that processing can be resumed.
+
+    Raises:
+        ValueError: Raised if tolerance is given for samples that are not waveforms
+        of numbers, or is negative.
+
+    Yields:
+        Iterator[bytes]: Iterator of samples whose value changed.
+    """
+    if tolerance < 0:
+        raise ValueError(f"Tolerance {tolerance} is negative")
+    if tolerance and proto_class_name not in WAVEFORM_DTYPES:
+        raise ValueError(f"{proto_class_name} samples cannot be compared by tolerance")
+    if not tolerance:
+        last = _load_sample(state, "last_hash")
+        for sample in samples:
+            digest = hashlib.blake2b(val_fields(sample), digest_size=16).digest()
+            if digest == last:
+                continue
+            last = digest
+            _save_sample(state, "last_hash", digest)
+            yield sample
+        return
+    np = import_numpy()
+    scratch = getattr(EPICSEvent_pb2, proto_class_name)()
+    last = _load_sample(state, "last_val")
+    last_values = None
+    if last is not None:
+        last_values = decode_values(last, proto_class_name).astype(np.float64)
+    for sample in samples:
+        payload = packed_values(sample, scratch)
+        values = decode_values(payload, proto_class_name).astype(np.float64)
+        if (
+            last_values is not None
+            and values.shape == last_values.shape
+            and np.all(np.abs(values - last_values) <= tolerance)
+        ):
+            continue
+        last_values = values
+        _save_sample(state, "last_val", payload)
+        yield sample
+
+
 def get_nano_diff(sample1: Any, sample2: Any) -> int:
     """Get the difference in nano seconds between two samples.
 
@@ -1,15 +1,35 @@
 import csv
-import subprocess
-from collections.abc import Callable, Generator, Iterator
+import mmap
+import os
+import time
+from collections.abc import Callable, Generator, Iterable, Iterator
+from contextlib import ExitStack
 from datetime import datetime, timedelta
 from itertools import islice
 from os import PathLike
 from pathlib import Path
-from typing import TypeVar
+from typing import TYPE_CHECKING, BinaryIO, TypeVar
 
 from tqdm import tqdm
 
+from aa_edit_data.compression import (
+    CHUNK_SIZE,
+    detect_compression,
+    get_compression,
+    is_stdio,
+    open_pb_read,
+    open_pb_write,
+    open_text_write,
+    strip_compression_suffix,
+)
+from aa_edit_data.delta import write_delta
 from aa_edit_data.generated import EPICSEvent_pb2
+from aa_edit_data.iocontrol import LIMITS, open_file
+from aa_edit_data.profiling import TIMED_BATCH_SIZE, ProcessStats
+from aa_edit_data.rewrite import atomic_write
+
+if TYPE_CHECKING:
+    from aa_edit_data.checkpoint import Checkpoint
 
 Header = EPICSEvent_pb2.PayloadInfo
 Scalar = (
@@ -34,24 +54,68 @@ Vector = (
 Sample = Scalar | Vector
 EpicsMessage = TypeVar("EpicsMessage", bound=Sample | Header)
 
+# Name of the EPICSEvent_pb2 class of the samples of each pv type
+PROTO_CLASS_NAMES = {
+    "SCALAR_STRING": "ScalarString",
+    "SCALAR_SHORT": "ScalarShort",
+    "SCALAR_FLOAT": "ScalarFloat",
+    "SCALAR_ENUM": "ScalarEnum",
+    "SCALAR_BYTE": "ScalarByte",
+    "SCALAR_INT": "ScalarInt",
+    "SCALAR_DOUBLE": "ScalarDouble",
+    "WAVEFORM_STRING": "VectorString",
+    "WAVEFORM_SHORT": "VectorShort",
+    "WAVEFORM_FLOAT": "VectorFloat",
+    "WAVEFORM_ENUM": "VectorEnum",
+    "WAVEFORM_BYTE": "VectorByte",
+    "WAVEFORM_INT": "VectorInt",
+    "WAVEFORM_DOUBLE": "VectorDouble",
+    "V4_GENERIC_BYTES": "V4GenericBytes",
+}
+REVERSE_BLOCK_SIZE = 2**16
+
 
 class ArchiverData:
+    _stdin: BinaryIO | None = None
+    # Whether to show a progress bar while processing samples
+    progress: bool = True
+
     def __init__(self, filepath: PathLike):
         """Initialise a ArchiverData object. If filepath is set, read the protobuf
         file at this location to gather its header, samples and type.
 
         Args:
             filepath (Optional[PathLike], optional): Path to PB file to be
-            read. Defaults to None.
+            read, or "-" to read from standard input. Standard input can only be
+            read once. Defaults to None.
             chunk_size (Optional[int], optional): Number of lines to read/write
             at one time.
         """
         self.filepath = Path(filepath)
-        with open(filepath, "rb") as f:
-            self.header = self.deserialize(f.readline(), Header)
+        if is_stdio(filepath):
+            self._stdin = open_pb_read(filepath)
+            self.header = self.deserialize(self._stdin.readline(), Header)
+        else:
+            with open_pb_read(filepath, threaded=False) as f:
+                self.header = self.deserialize(f.readline(), Header)
         self.pv_type = self._get_pv_type()
         self.proto_class = self._get_proto_class()
 
+    def _open_samples(self) -> BinaryIO:
+        """Open this PB file positioned at its first sample."""
+        if is_stdio(self.filepath):
+            if self._stdin is None:
+                raise ValueError("Samples from standard input can only be read once.")
+            f, self._stdin = self._stdin, None
+            return f
+        f = open_pb_read(self.filepath)
+        f.readline()
+        return f
+
+    def _progress(self, iterable: Iterable) -> Iterable:
+        """Wrap an iterable in a progress bar if self.progress is set."""
+        return tqdm(iterable, disable=not self.progress)
+
     def get_samples(self) -> Generator[Sample]:
         """Read a PB file that is structured in the Archiver Appliance format.
         Gathers the header and samples from this file and assigns them to
@@ -60,8 +124,8 @@ class ArchiverData:
         Args:
             filepath (PathLike): Path to PB file.
         """
-        with open(self.filepath, "rb") as f:
-            for line in islice(f, 1, None):
+        with self._open_samples() as f:
+            for line in f:
                 yield self.deserialize(line, self.proto_class)
 
     def get_samples_bytes(self) -> Generator[bytes]:
@@ -72,8 +136,214 @@ class ArchiverData:
         Args:
             filepath (PathLike): Path to PB file.
         """
-        with open(self.filepath, "rb") as f:
-            yield from islice(f, 1, None)
+        with self._open_samples() as f:
+            yield from f
+
+    def get_sample_views(self) -> Generator["SampleView"]:
+        """Read a PB file that is structured in the Archiver Appliance format,
+        yielding a SampleView for each sample. The views share one protobuf message
+        for decoding, so no message is allocated for samples that are not modified.
+        """
+        scratch = self.proto_class()
+        for line in self.get_samples_bytes():
+            yield SampleView(line, scratch)
+
+    def scan_samples(self) -> tuple[int, Sample | None, Sample | None]:
+        """Count the samples in this PB file without decoding them, decoding only the
+        first and last. Uncompressed files are memory mapped, so only the count has to
+        touch every byte. A partly written last line is ignored.
+
+        Returns:
+            tuple[int, Sample | None, Sample | None]: Number of samples, and the first
+            and last samples, which are None if there are no samples.
+        """
+        # Memory mapped reads bypass the I/O limits, so are only used without them
+        if not is_stdio(self.filepath) and not LIMITS.active:
+            with open(self.filepath, "rb") as f:
+                if detect_compression(f) is None:
+                    count, first, last = self._scan_mapped(f)
+                    return self._scan_result(count, first, last)
+        with self._open_samples() as f:
+            first = f.readline()
+            if not first.endswith(b"\n"):
+                return 0, None, None
+            count = 1
+            # Everything after the second to last newline, so that it always holds
+            # the last complete line
+            tail = b"\n"
+            while chunk := f.read(CHUNK_SIZE):
+                count += chunk.count(b"\n")
+                tail += chunk
+                end = tail.rfind(b"\n")
+                start = tail.rfind(b"\n", 0, end)
+                if start > 0:
+                    tail = tail[start:]
+        end = tail.rfind(b"\n")
+        last = tail[tail.rfind(b"\n", 0, end) + 1 : end + 1] if end > 0 else first
+        return self._scan_result(count, first, last)
+
+    @staticmethod
+    def _scan_mapped(f: BinaryIO) -> tuple[int, bytes, bytes]:
+        """Count the sample lines of an uncompressed PB file and get the first and
+        last, using a memory map."""
+        if os.fstat(f.fileno()).st_size == 0:
+            return 0, b"", b""
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            start = mm.find(b"\n") + 1
+            end = mm.rfind(b"\n") + 1
+            if start == 0 or end <= start:
+                return 0, b"", b""
+            count = 0
+            for i in range(start, end, CHUNK_SIZE):
+                count += mm[i : min(i + CHUNK_SIZE, end)].count(b"\n")
+            first = mm[start : mm.find(b"\n", start) + 1]
+            last = mm[mm.rfind(b"\n", 0, end - 1) + 1 : end]
+        return count, first, last
+
+    def _scan_result(
+        self, count: int, first: bytes, last: bytes
+    ) -> tuple[int, Sample | None, Sample | None]:
+        if not count:
+            return 0, None, None
+        return (
+            count,
+            self.deserialize(first, self.proto_class),
+            self.deserialize(last, self.proto_class),
+        )
+
+    def get_sample_range(self) -> tuple[int, int]:
+        """Get the byte offsets of the first sample, and of the end of the last
+        complete sample, of this uncompressed PB file."""
+        with self._open_seekable() as f:
+            start = len(f.readline())
+            return start, max(start, self._end_of_last_line(f))
+
+    def get_lines(self, start: int, end: int) -> Generator[bytes]:
+        """Read the sample lines of this uncompressed PB file between two byte
+        offsets, which must be at the start of lines.
+
+        Args:
+            start (int): Offset of the first line to read.
+            end (int): Offset to stop reading at.
+        """
+        with self._open_seekable() as f:
+            f.seek(start)
+            pos = start
+            for line in f:
+                if pos >= end:
+                    return
+                pos += len(line)
+                yield line
+
+    def decode_lines(self, lines: Iterable[bytes], raw=False, lazy=False) -> Iterator:
+        """Decode sample lines the way get_processed_samples does.
+
+        Args:
+            lines (Iterable[bytes]): Sample lines of this PB file.
+            raw (bool, optional): Leave the samples as bytes. Defaults to False.
+            lazy (bool, optional): Yield the samples as SampleViews. Defaults to
+            False.
+        """
+        if raw:
+            return iter(lines)
+        if lazy:
+            scratch = self.proto_class()
+            return (SampleView(line, scratch) for line in lines)
+        return (self.deserialize(line, self.proto_class) for line in lines)
+
+    def iter_reversed(self, raw: bool = False) -> Generator:
+        """Read the samples of this PB file from last to first. The file is read
+        backwards from the end in blocks, so the last few samples are found in
+        constant time however large the file is. A partly written last line is
+        ignored.
+
+        Args:
+            raw (bool, optional): Yield the samples as bytes. Defaults to False.
+
+        Raises:
+            ValueError: Raised if the file is compressed or is standard input, which
+            cannot be read backwards.
+        """
+        with self._open_seekable() as f:
+            start = len(f.readline())
+            pos = f.seek(0, os.SEEK_END)
+            # Bytes from pos up to the start of the last line yielded
+            buffer = b""
+            while pos > start:
+                size = min(REVERSE_BLOCK_SIZE, pos - start)
+                pos -= size
+                f.seek(pos)
+                buffer = f.read(size) + buffer
+                lines = buffer.split(b"\n")
+                if len(lines) == 1:
+                    continue
+                # The last part follows the last newline so is empty or a partial line.
+                # The first part is only a complete line at the start of the samples.
+                for line in reversed(lines[0 if pos == start else 1 : -1]):
+                    line += b"\n"
+                    yield line if raw else self.deserialize(line, self.proto_class)
+                buffer = lines[0] + b"\n"
+
+    def follow(self, poll_interval: float = 1.0, raw: bool = False) -> Generator:
+        """Wait for samples to be appended to this PB file and yield them as they are
+        written, starting after the last complete sample. If the file is truncated or
+        replaced, following continues from the end of the new file.
+
+        Args:
+            poll_interval (float, optional): Seconds between checks for new data.
+            raw (bool, optional): Yield the samples as bytes. Defaults to False.
+
+        Raises:
+            ValueError: Raised if the file is compressed or is standard input.
+        """
+        f = self._open_seekable()
+        try:
+            pos = self._end_of_last_line(f)
+            inode = os.fstat(f.fileno()).st_ino
+            while True:
+                stat = os.stat(self.filepath)
+                if stat.st_ino != inode or stat.st_size < pos:
+                    f.close()
+                    f = self._open_seekable()
+                    pos = self._end_of_last_line(f)
+                    inode = os.fstat(f.fileno()).st_ino
+                elif stat.st_size > pos:
+                    f.seek(pos)
+                    data = f.read(stat.st_size - pos)
+                    end = data.rfind(b"\n") + 1
+                    for line in data[:end].splitlines(keepends=True):
+                        yield line if raw else self.deserialize(line, self.proto_class)
+                    pos += end
+                    if end:
+                        continue
+                time.sleep(poll_interval)
+        finally:
+            f.close()
+
+    def _open_seekable(self) -> BinaryIO:
+        """Open this uncompressed PB file for random access."""
+        if is_stdio(self.filepath):
+            raise ValueError("Standard input cannot be read backwards or followed")
+        f = open_file(self.filepath, "rb")
+        if detect_compression(f) is not None:
+            f.close()
+            raise ValueError(
+                f"{self.filepath} is compressed so cannot be read backwards or followed"
+            )
+        return f
+
+    @staticmethod
+    def _end_of_last_line(f: BinaryIO) -> int:
+        """Get the position just after the last newline of a file."""
+        pos = f.seek(0, os.SEEK_END)
+        while pos > 0:
+            size = min(REVERSE_BLOCK_SIZE, pos)
+            f.seek(pos - size)
+            newline = f.read(size).rfind(b"\n")
+            if newline >= 0:
+                return pos - size + newline + 1
+            pos -= size
+        return 0
 
     def get_processed_samples(
         self,
@@ -81,12 +351,49 @@ class ArchiverData:
         process_args: list | None = None,
         process_kwargs: dict | None = None,
         raw: bool = False,
+        lazy: bool = False,
     ):
         process_args = process_args or []
         process_kwargs = process_kwargs or {}
-        samples = self.get_samples_bytes() if raw else self.get_samples()
+        if raw:
+            samples = self.get_samples_bytes()
+        elif lazy:
+            samples = self.get_sample_views()
+        else:
+            samples = self.get_samples()
         yield from process_func(samples, *process_args, **process_kwargs)
 
+    def get_timed_samples(
+        self, stats: ProcessStats, raw: bool = False, lazy: bool = False
+    ) -> Iterator:
+        """Equivalent to get_samples (or get_samples_bytes if raw is set), but
+        charges the time taken to read, unescape and decode each sample to the
+        matching stage of stats.
+
+        Args:
+            stats (ProcessStats): Statistics to record timings in.
+            raw (bool, optional): Yield the samples as bytes. Defaults to False.
+            lazy (bool, optional): Yield the samples as SampleViews. Defaults to
+            False.
+        """
+        lines = stats.timed(stats.count_in(self.get_samples_bytes()), "read")
+        if raw:
+            yield from lines
+            return
+        if lazy:
+            scratch = self.proto_class()
+            yield from stats.timed(
+                (SampleView(line, scratch) for line in lines), "decode"
+            )
+            return
+        unescaped = stats.timed(
+            (self._restore_newline_chars(line.rstrip(b"\n")) for line in lines),
+            "unescape",
+        )
+        yield from stats.timed(
+            (self._parse(data, self.proto_class) for data in unescaped), "decode"
+        )
+
     def process_and_write(
         self,
         filepath: PathLike,
@@ -95,27 +402,198 @@ class ArchiverData:
         process_args: list | None = None,
         process_kwargs: dict | None = None,
         raw: bool = False,
+        stats: ProcessStats | None = None,
+        lazy: bool = False,
+        delta_filepath: PathLike | None = None,
+        checkpoint: "Checkpoint | None" = None,
     ):
+        """Apply process_func to the samples of this file and write the result.
+
+        Args:
+            filepath (PathLike): Path to write the processed PB file to. May be the
+            path of this file. The file is written beside filepath and moved into
+            place once it is complete, so a failure leaves filepath untouched.
+            write_txt (bool): Also write the result to a text file.
+            process_func (Callable): Function taking an iterator of samples, and
+            process_args and process_kwargs, and returning an iterator of samples.
+            process_args (list | None, optional): Extra arguments to process_func.
+            process_kwargs (dict | None, optional): Extra keyword arguments to
+            process_func.
+            raw (bool, optional): Pass the samples to process_func as bytes.
+            stats (ProcessStats | None, optional): Record timings in stats.
+            lazy (bool, optional): Pass the samples to process_func as SampleViews.
+            Samples that process_func does not modify are written as their original
+            bytes.
+            delta_filepath (PathLike | None, optional): Write a delta backup of the
+            removed samples to this path, see write_delta.
+            checkpoint (Checkpoint | None, optional): Save checkpoints so that the run
+            can be resumed if it is stopped. process_func must accept a `state`
+            keyword argument. Only uncompressed files can be checkpointed, and
+            write_txt and stats are not supported.
+        """
         filepath = Path(filepath)
-        txt_filepath = filepath.with_suffix(".txt")
-
-        mv_to = ""
-        if filepath == self.filepath:
-            mv_to = filepath
-            filepath = self.get_temp_filename(filepath)
-
-        samples = self.get_processed_samples(
-            process_func,
-            process_args=process_args,
-            process_kwargs=process_kwargs,
-            raw=raw,
+        txt_filepath = strip_compression_suffix(filepath).with_suffix(".txt")
+        if stats is not None:
+            self._start_stats(stats, filepath)
+
+        if write_txt and is_stdio(filepath):
+            raise ValueError("Cannot write a text file when writing to standard output")
+        if delta_filepath is not None and (
+            is_stdio(filepath) or is_stdio(self.filepath)
+        ):
+            raise ValueError("Cannot make a delta backup of standard input or output")
+
+        if checkpoint is not None:
+            if write_txt or stats is not None:
+                raise ValueError("Checkpointed runs cannot write text or record stats")
+            self._process_with_checkpoint(
+                filepath,
+                process_func,
+                process_args,
+                process_kwargs,
+                raw,
+                lazy,
+                checkpoint,
+                delta_filepath,
+            )
+            return
+
+        with ExitStack() as stack:
+            pb_filepath = filepath
+            if not is_stdio(filepath):
+                pb_filepath = stack.enter_context(atomic_write(filepath))
+            if stats is None:
+                samples = self.get_processed_samples(
+                    process_func,
+                    process_args=process_args,
+                    process_kwargs=process_kwargs,
+                    raw=raw,
+                    lazy=lazy,
+                )
+                if write_txt:
+                    self.write_pb_and_txt(pb_filepath, txt_filepath, samples, raw=raw)
+                else:
+                    self.write_pb(pb_filepath, samples=samples, raw=raw)
+            else:
+                samples = stats.timed(
+                    process_func(
+                        self.get_timed_samples(stats, raw=raw, lazy=lazy),
+                        *(process_args or []),
+                        **(process_kwargs or {}),
+                    ),
+                    "algorithm",
+                )
+                self._write_timed(
+                    pb_filepath,
+                    txt_filepath if write_txt else None,
+                    samples,
+                    raw,
+                    stats,
+                )
+            if delta_filepath is not None:
+                write_delta(self.filepath, pb_filepath, delta_filepath)
+        if stats is not None:
+            stats.finish()
+
+    def _process_with_checkpoint(
+        self,
+        filepath: Path,
+        process_func: Callable,
+        process_args: list | None,
+        process_kwargs: dict | None,
+        raw: bool,
+        lazy: bool,
+        checkpoint: "Checkpoint",
+        delta_filepath: PathLike | None,
+    ):
+        if is_stdio(filepath) or get_compression(filepath) is not None:
+            raise ValueError("Checkpointed output must be an uncompressed file")
+        start, end = self.get_sample_range()
+        stat = self.filepath.stat()
+        identity = {
+            "input": str(self.filepath.resolve()),
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "algorithm": process_func.__name__,
+            "args": process_args or [],
+            "kwargs": process_kwargs or {},
+        }
+        checkpoint.start(identity, start)
+        with checkpoint.open() as f:
+            if not checkpoint.output_offset:
+                f.write(self.serialize(self.header))
+            lines = checkpoint.lines(self.get_lines(checkpoint.input_offset, end), f)
+            samples = process_func(
+                self.decode_lines(lines, raw, lazy),
+                *(process_args or []),
+                **(process_kwargs or {}),
+                state=checkpoint.state,
+            )
+            for sample in self._progress(samples):
+                f.write(sample if raw else self.serialize(sample))
+            checkpoint.save(f)
+        if delta_filepath is not None:
+            write_delta(self.filepath, checkpoint.partial, delta_filepath)
+        checkpoint.finish()
+
+    def _start_stats(self, stats: ProcessStats, filepath: PathLike):
+        stats.metadata.update(
+            pvname=self.header.pvname,
+            pv_type=self.pv_type,
+            input=str(self.filepath),
+            output=str(filepath),
         )
-        if write_txt:
-            self.write_pb_and_txt(filepath, txt_filepath, samples, raw=raw)
-        else:
-            self.write_pb(filepath, samples=samples, raw=raw)
-        if mv_to:
-            subprocess.run(["mv", filepath, mv_to], check=True)
+        stats.start()
+
+    def _write_timed(
+        self,
+        pb_filepath: PathLike,
+        txt_filepath: PathLike | None,
+        samples: Iterator,
+        raw: bool,
+        stats: ProcessStats,
+    ):
+        """Write samples to a PB file, and optionally a text file, charging the
+        time taken to encode and write each sample to the matching stage of stats.
+        """
+        year = self.header.year
+        with ExitStack() as stack:
+            f_pb = stack.enter_context(open_pb_write(pb_filepath))
+            f_txt = None
+            if txt_filepath is not None:
+                f_txt = stack.enter_context(open_text_write(txt_filepath))
+            stats.enter("write")
+            header = self.serialize(self.header)
+            f_pb.write(header)
+            stats.bytes_out += len(header)
+            if f_txt:
+                f_txt.write(
+                    f"{self.header.pvname}, {self.pv_type}, {self.header.year}\n"
+                )
+                f_txt.write(f"DATE{' ' * 19}SECONDS{' ' * 5}NANO{' ' * 9}VAL\n")
+            stats.exit()
+            samples = iter(self._progress(samples))
+            while batch := list(islice(samples, TIMED_BATCH_SIZE)):
+                decoded = batch
+                if raw and f_txt:
+                    stats.enter("decode")
+                    decoded = [
+                        self.deserialize(line, self.proto_class) for line in batch
+                    ]
+                    stats.exit()
+                stats.enter("encode")
+                lines = batch if raw else [self.serialize(sample) for sample in batch]
+                datastrs = []
+                if f_txt:
+                    datastrs = [self.format_datastr(sample, year) for sample in decoded]
+                stats.exit()
+                stats.enter("write")
+                f_pb.writelines(lines)
+                if f_txt:
+                    f_txt.writelines(datastrs)
+                stats.exit()
+                stats.samples_out += len(batch)
+                stats.bytes_out += sum(map(len, lines))
 
     def write_pb_and_txt(
         self,
@@ -125,13 +603,16 @@ class ArchiverData:
         raw=False,
     ):
         year = self.header.year
-        with open(pb_filepath, "wb") as f_pb, open(txt_filepath, "w") as f_txt:
+        with (
+            open_pb_write(pb_filepath) as f_pb,
+            open_text_write(txt_filepath) as f_txt,
+        ):
             # Write header
             f_pb.write(self.serialize(self.header))
             f_txt.write(f"{self.header.pvname}, {self.pv_type}, {self.header.year}\n")
             f_txt.write(f"DATE{' ' * 19}SECONDS{' ' * 5}NANO{' ' * 9}VAL\n")
             if raw:
-                for sample in tqdm(samples):
+                for sample in self._progress(samples):
                     f_pb.write(sample)
                     f_txt.write(
                         self.format_datastr(
@@ -139,50 +620,130 @@ class ArchiverData:
                         )
                     )
             else:
-                for sample in tqdm(samples):
+                for sample in self._progress(samples):
                     f_pb.write(self.serialize(sample))
                     f_txt.write(self.format_datastr(sample, year))
 
     def write_pb(self, filepath: PathLike, samples: Iterator | None = None, raw=True):
         samples = samples or self.get_samples_bytes()
-        with open(filepath, "wb") as f:
+        with open_pb_write(filepath) as f:
             f.write(self.serialize(self.header))
             f.writelines(
-                tqdm(samples)
+                self._progress(samples)
                 if raw
-                else (self.serialize(sample) for sample in tqdm(samples))
+                else (self.serialize(sample) for sample in self._progress(samples))
             )
 
-    def write_txt(self, filepath: PathLike, samples: Iterator | None = None):
+    def write_txt(
+        self,
+        filepath: PathLike,
+        samples: Iterator | None = None,
+        stats: ProcessStats | None = None,
+    ):
+        if stats is not None:
+            self._start_stats(stats, filepath)
+            samples = samples or self.get_timed_samples(stats)
         samples = samples or self.get_samples()
-        with open(filepath, "w") as f:
+        with open_text_write(filepath) as f:
             # Write header
             f.write(f"{self.header.pvname}, {self.pv_type}, {self.header.year}\n")
             # Write column titles
             f.write(f"DATE{' ' * 19}SECONDS{' ' * 5}NANO{' ' * 9}VAL\n")
             # Write samples
-            f.writelines(
-                tqdm(
-                    self.format_datastr(sample, self.header.year) for sample in samples
+            if stats is None:
+                f.writelines(
+                    self._progress(
+                        self.format_datastr(sample, self.header.year)
+                        for sample in samples
+                    )
                 )
-            )
-
-    def write_csv(self, filepath: PathLike, samples: Iterator | None = None):
+            else:
+                samples = iter(self._progress(samples))
+                while batch := list(islice(samples, TIMED_BATCH_SIZE)):
+                    stats.enter("encode")
+                    datastrs = [
+                        self.format_datastr(sample, self.header.year)
+                        for sample in batch
+                    ]
+                    stats.exit()
+                    stats.enter("write")
+                    f.writelines(datastrs)
+                    stats.exit()
+                    stats.samples_out += len(batch)
+                    stats.bytes_out += sum(map(len, datastrs))
+        if stats is not None:
+            stats.finish()
+
+    def write_csv(
+        self,
+        filepath: PathLike,
+        samples: Iterator | None = None,
+        stats: ProcessStats | None = None,
+    ):
+        if stats is not None:
+            self._start_stats(stats, filepath)
+            samples = samples or self.get_timed_samples(stats)
         samples = samples or self.get_samples()
-        with open(filepath, "w") as f:
+        with open_text_write(filepath) as f:
             writer = csv.writer(f)
-            for sample in tqdm(samples):
-                writer.writerow(self.format_csv_row(sample, self.header.year))
+            if stats is None:
+                for sample in self._progress(samples):
+                    writer.writerow(self.format_csv_row(sample, self.header.year))
+            else:
+                samples = iter(self._progress(samples))
+                while batch := list(islice(samples, TIMED_BATCH_SIZE)):
+                    stats.enter("encode")
+                    rows = [
+                        self.format_csv_row(sample, self.header.year)
+                        for sample in batch
+                    ]
+                    stats.exit()
+                    stats.enter("write")
+                    stats.bytes_out += sum(writer.writerow(row) for row in rows)
+                    stats.exit()
+                    stats.samples_out += len(batch)
+        if stats is not None:
+            stats.finish()
 
     @staticmethod
-    def serialize(sample: Sample | Header) -> bytes:
-        return ArchiverData._replace_newline_chars(sample.SerializeToString()) + b"\n"
+    def serialize(sample: "Sample | Header | SampleView") -> bytes:
+        if isinstance(sample, SampleView):
+            return sample.to_bytes()
+        return ArchiverData.escape_line(sample.SerializeToString())
 
     @staticmethod
     def deserialize(line: bytes, proto_class: type[EpicsMessage]) -> EpicsMessage:
-        sample_bytes = ArchiverData._restore_newline_chars(line.rstrip(b"\n"))
+        return ArchiverData._parse(ArchiverData.unescape_line(line), proto_class)
+
+    @staticmethod
+    def escape_line(data: bytes) -> bytes:
+        """Get the line of a PB file that stores a serialised protobuf message.
+
+        Args:
+            data (bytes): A serialised message.
+
+        Returns:
+            bytes: The message with newline characters escaped, and a trailing newline.
+        """
+        return ArchiverData._replace_newline_chars(data) + b"\n"
+
+    @staticmethod
+    def unescape_line(line: bytes) -> bytes:
+        """Get the serialised protobuf message stored in a line of a PB file.
+
+        Args:
+            line (bytes): A line of a PB file, with or without the trailing newline.
+
+        Returns:
+            bytes: The serialised message with newline characters restored.
+        """
+        return ArchiverData._restore_newline_chars(line.rstrip(b"\n"))
+
+    @staticmethod
+    def _parse(data: bytes, proto_class: type[EpicsMessage]) -> EpicsMessage:
+        """Parse an unescaped protobuf message."""
         sample = proto_class()
-        sample.ParseFromString(sample_bytes)
+        sample.ParseFromString(data)
         return sample
 
     @staticmethod
@@ -232,6 +793,18 @@ class ArchiverData:
             raise ValueError
         return ts
 
+    @staticmethod
+    def get_sample_datetime(year: int, sample: "Sample | SampleView") -> datetime:
+        """Get the date and time of a sample to the nearest microsecond.
+        Args:
+            year (int): Year of the PB file the sample is from.
+            sample (Sample | SampleView): A sample from a PB file.
+        Returns:
+            datetime: A datetime object of the sample's timestamp.
+        """
+        date = ArchiverData.convert_to_datetime(year, sample.secondsintoyear)
+        return date + timedelta(microseconds=sample.nano // 1000)
+
     @staticmethod
     def format_datastr(sample: Sample, year: int) -> str:
         """Get a string containing information about a sample.
@@ -281,29 +854,103 @@ class ArchiverData:
         Returns:
             str: Name of proto class, e.g VectorDouble.
         """
-        pv_type_to_class_name = {
-            "SCALAR_STRING": "ScalarString",
-            "SCALAR_SHORT": "ScalarShort",
-            "SCALAR_FLOAT": "ScalarFloat",
-            "SCALAR_ENUM": "ScalarEnum",
-            "SCALAR_BYTE": "ScalarByte",
-            "SCALAR_INT": "ScalarInt",
-            "SCALAR_DOUBLE": "ScalarDouble",
-            "WAVEFORM_STRING": "VectorString",
-            "WAVEFORM_SHORT": "VectorShort",
-            "WAVEFORM_FLOAT": "VectorFloat",
-            "WAVEFORM_ENUM": "VectorEnum",
-            "WAVEFORM_BYTE": "VectorByte",
-            "WAVEFORM_INT": "VectorInt",
-            "WAVEFORM_DOUBLE": "VectorDouble",
-            "V4_GENERIC_BYTES": "V4GenericBytes",
-        }
-        return pv_type_to_class_name[self.pv_type]
+        return PROTO_CLASS_NAMES[self.pv_type]
 
-    @staticmethod
-    def get_temp_filename(filename: PathLike) -> Path:
-        filename = Path(filename)
-        filename = filename.with_stem(f"{filename.stem}_tmp")
-        if filename.exists():
-            filename = ArchiverData.get_temp_filename(filename)
-        return filename
+
+class SampleView:
+    """A sample that holds the raw line it was read from and only decodes it when
+    one of its fields is accessed.
+
+    Decoding uses a protobuf message shared by every view from the same file, and
+    copies secondsintoyear, nano and val out of it, so reading fields does not
+    allocate a message per sample. Setting a field, or accessing message, gives the
+    view a message of its own; views without one are written as their original
+    bytes. Fields read from a view without a message are copies, so changes must be
+    made by assigning to them.
+    """
+
+    __slots__ = ("line", "_scratch", "_fields", "_message")
+
+    def __init__(self, line: bytes, scratch: Sample):
+        """Initialise a SampleView.
+
+        Args:
+            line (bytes): A line of a PB file, including the trailing newline.
+            scratch (Sample): Message of the file's proto class, reused to decode
+            every view that shares it.
+        """
+        self.line = line
+        self._scratch = scratch
+        self._fields: tuple | None = None
+        self._message: Sample | None = None
+
+    def _decode(self) -> tuple:
+        if self._fields is None:
+            scratch = self._scratch
+            # ParseFromString clears the message before parsing into it
+            scratch.ParseFromString(ArchiverData.unescape_line(self.line))
+            val = scratch.val
+            if not isinstance(val, str | bytes | int | float):
+                val = tuple(val)
+            self._fields = (scratch.secondsintoyear, scratch.nano, val)
+        return self._fields
+
+    @property
+    def secondsintoyear(self) -> int:
+        if self._message is not None:
+            return self._message.secondsintoyear
+        return self._decode()[0]
+
+    @secondsintoyear.setter
+    def secondsintoyear(self, value: int):
+        self.message.secondsintoyear = value
+
+    @property
+    def nano(self) -> int:
+        if self._message is not None:
+            return self._message.nano
+        return self._decode()[1]
+
+    @nano.setter
+    def nano(self, value: int):
+        self.message.nano = value
+
+    @property
+    def val(self):
+        """The value of the sample, a list for waveforms. Until the view is modified
+        each access gets a new copy of the value decoded from the line, so changing
+        a waveform in place, e.g. view.val[0] = 1 or view.val.append(1), has no
+        effect. Change the value by assigning to val, e.g.
+        view.val = [1, *view.val[1:]], or through message.
+        """
+        if self._message is not None:
+            return self._message.val
+        val = self._decode()[2]
+        return list(val) if isinstance(val, tuple) else val
+
+    @val.setter
+    def val(self, value):
+        message = self.message
+        if isinstance(message, Vector):
+            del message.val[:]
+            message.val.extend(value)
+        else:
+            message.val = value
+
+    @property
+    def message(self) -> Sample:
+        """A fully decoded message owned by this view. Changes made to it are
+        written out in place of the original line."""
+        if self._message is None:
+            self._message = ArchiverData.deserialize(self.line, type(self._scratch))
+        return self._message
+
+    @property
+    def modified(self) -> bool:
+        return self._message is not None
+
+    def to_bytes(self) -> bytes:
+        """Get the line to write for this sample, including the trailing newline."""
+        if self._message is None:
+            return self.line
+        return ArchiverData.serialize(self._message)
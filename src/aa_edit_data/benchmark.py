@@ -0,0 +1,212 @@
+import json
+import tempfile
+import time
+from collections.abc import Callable
+from importlib.util import find_spec
+from os import PathLike
+from pathlib import Path
+
+from aa_edit_data.algorithms import apply_min_period, remove_after_ts, remove_before_ts
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.archiver_data_generated import ArchiverDataGenerated
+from aa_edit_data.generated import EPICSEvent_pb2
+from aa_edit_data.waveform import waveform_batches
+
+DEFAULT_TOLERANCE = 0.25
+DEFAULT_REPEATS = 5
+MIN_RUN_TIME = 0.2
+# Number of elements of each sample of the generated waveform file
+WAVEFORM_ELEMENTS = 2048
+
+
+def _identity(samples):
+    return samples
+
+
+def _passthrough(ad: ArchiverData, write: Path):
+    ad.process_and_write(write, False, _identity, raw=True)
+
+
+def _min_period(ad: ArchiverData, write: Path):
+    ad.process_and_write(write, False, apply_min_period, [10], lazy=True)
+
+
+def _time_window(ad: ArchiverData, write: Path):
+    def window(samples, seconds, end_seconds):
+        return remove_after_ts(remove_before_ts(samples, seconds), end_seconds)
+
+    ad.process_and_write(write, False, window, [1000, 9000], lazy=True)
+
+
+def _text_export(ad: ArchiverData, write: Path):
+    ad.write_txt(write.with_suffix(".txt"))
+
+
+def _waveform_read(ad: ArchiverData, write: Path):
+    for _ in waveform_batches(ad):
+        pass
+
+
+# Each benchmark runs the path as the commands do, without recording stats, whose
+# per-sample timing would dominate the measurement
+BENCHMARKS: dict[str, Callable[[ArchiverData, Path], None]] = {
+    "raw_passthrough": _passthrough,
+    "apply_min_period": _min_period,
+    "time_window": _time_window,
+    "text_export": _text_export,
+    "waveform_short": _waveform_read,
+}
+# Benchmarks that read a generated VectorShort file, whose throughput counts
+# elements rather than samples, and which need numpy
+WAVEFORM_BENCHMARKS = {"waveform_short"}
+
+
+def calibrate(loops: int = 10**6) -> float:
+    """Measure the speed of this machine with a fixed pure-Python workload, so that
+    throughput measured on different machines can be compared.
+
+    Returns:
+        float: Loop iterations per second.
+    """
+    start = time.perf_counter()
+    total = 0
+    for i in range(loops):
+        total += i & 7
+    return loops / (time.perf_counter() - start)
+
+
+def run_benchmarks(
+    samples: int = 100000,
+    repeats: int = DEFAULT_REPEATS,
+    names: list[str] | None = None,
+) -> dict:
+    """Time the key processing paths on a generated SCALAR_DOUBLE file, and reading
+    a generated VectorShort file into numpy arrays if numpy is installed. Each run of a
+    path repeats it for at least MIN_RUN_TIME and is paired with a calibration run
+    just before it, so that changes in the load on the machine affect both alike.
+
+    Args:
+        samples (int, optional): Number of samples in the generated file.
+        repeats (int, optional): Number of runs of each path. The highest
+        throughput is compared to the highest calibration score of its runs.
+        names (list[str] | None, optional): Benchmarks to run. Defaults to all.
+
+    Returns:
+        dict: Throughput of each path in samples per second, and the same
+        throughput relative to the calibration score of this machine.
+    """
+    names = names or [
+        name
+        for name in BENCHMARKS
+        if name not in WAVEFORM_BENCHMARKS or find_spec("numpy") is not None
+    ]
+    results = {"samples": samples, "calibration": 0.0, "benchmarks": {}}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        read = Path(tmp_dir) / "benchmark.pb"
+        write = Path(tmp_dir) / "benchmark_result.pb"
+        generated = ArchiverDataGenerated(samples=samples, pv_type=6, nano_gap=10**8)
+        generated.progress = False
+        generated.write_pb(read)
+        waveforms = max(samples // WAVEFORM_ELEMENTS, 1)
+        if WAVEFORM_BENCHMARKS.intersection(names):
+            _write_waveform_file(Path(tmp_dir) / "waveform.pb", waveforms)
+        for name in names:
+            if name in WAVEFORM_BENCHMARKS:
+                ad = ArchiverData(Path(tmp_dir) / "waveform.pb")
+                count = waveforms * WAVEFORM_ELEMENTS
+            else:
+                ad = ArchiverData(read)
+                count = samples
+            # Drawing progress bars would clutter the output and be timed too
+            ad.progress = False
+            throughput = calibration = 0.0
+            for _ in range(repeats):
+                calibration = max(calibration, calibrate())
+                throughput = max(
+                    throughput, _time_path(BENCHMARKS[name], ad, write, count)
+                )
+            results["calibration"] = max(results["calibration"], calibration)
+            # Load on the machine only ever slows a run down, so the fastest path run
+            # and the fastest calibration run are each the best estimate of this
+            # machine unloaded. A ratio of single runs would be inflated whenever
+            # only the calibration was slowed
+            results["benchmarks"][name] = {
+                "samples_per_second": throughput,
+                "relative": throughput / calibration,
+            }
+    return results
+
+
+def _write_waveform_file(filepath: Path, samples: int):
+    """Write a VectorShort PB file of samples of WAVEFORM_ELEMENTS elements, whose
+    values take one to three bytes to encode."""
+    header = EPICSEvent_pb2.PayloadInfo(
+        type="WAVEFORM_SHORT",
+        pvname="generated_test_data",
+        year=2024,
+        elementCount=WAVEFORM_ELEMENTS,
+    )
+    with open(filepath, "wb") as f:
+        f.write(ArchiverData.serialize(header))
+        for i in range(samples):
+            val = [(i + 37 * j) % 65536 - 32768 for j in range(WAVEFORM_ELEMENTS)]
+            sample = EPICSEvent_pb2.VectorShort(secondsintoyear=i, nano=0, val=val)
+            f.write(ArchiverData.serialize(sample))
+
+
+def _time_path(
+    path: Callable[[ArchiverData, Path], None],
+    ad: ArchiverData,
+    write: Path,
+    samples: int,
+) -> float:
+    """Run a path until at least MIN_RUN_TIME has passed, and get its throughput in
+    samples per second."""
+    runs = 0
+    start = time.perf_counter()
+    while True:
+        path(ad, write)
+        runs += 1
+        elapsed = time.perf_counter() - start
+        if elapsed >= MIN_RUN_TIME:
+            return runs * samples / elapsed
+
+
+def compare_to_baseline(
+    results: dict, baseline: dict, tolerance: float = DEFAULT_TOLERANCE
+) -> list[str]:
+    """Compare benchmark results against a stored baseline.
+
+    Args:
+        results (dict): Output of run_benchmarks.
+        baseline (dict): Output of a previous run_benchmarks call.
+        tolerance (float, optional): Allowed fractional drop in relative throughput.
+
+    Returns:
+        list[str]: A description of each path that regressed by more than the
+        tolerance. Empty if there are no regressions.
+    """
+    regressions = []
+    for name, expected in baseline["benchmarks"].items():
+        if name not in results["benchmarks"]:
+            continue
+        result = results["benchmarks"][name]["relative"]
+        limit = expected["relative"] * (1 - tolerance)
+        if result < limit:
+            regressions.append(
+                f"{name}: relative throughput {result:.4f} is "
+                f"{1 - result / expected['relative']:.0%} below baseline "
+                f"{expected['relative']:.4f}"
+            )
+    return regressions
+
+
+def load_baseline(filepath: PathLike) -> dict:
+    with open(filepath) as f:
+        return json.load(f)
+
+
+def save_baseline(results: dict, filepath: PathLike):
+    with open(filepath, "w") as f:
+        json.dump(results, f, indent=2)
+        f.write("\n")
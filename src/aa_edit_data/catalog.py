@@ -0,0 +1,137 @@
+import sqlite3
+from collections.abc import Generator
+from os import PathLike
+from pathlib import Path
+
+from aa_edit_data.archiver_data import ArchiverData, Sample
+from aa_edit_data.compression import strip_compression_suffix
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    pvname TEXT NOT NULL,
+    pv_type TEXT NOT NULL,
+    year INTEGER NOT NULL,
+    element_count INTEGER NOT NULL,
+    sample_count INTEGER NOT NULL,
+    first_timestamp TEXT,
+    last_timestamp TEXT,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_pvname ON files (pvname);
+CREATE INDEX IF NOT EXISTS files_type_year ON files (pv_type, year);
+"""
+COLUMNS = (
+    "path",
+    "pvname",
+    "pv_type",
+    "year",
+    "element_count",
+    "sample_count",
+    "first_timestamp",
+    "last_timestamp",
+    "size",
+    "mtime_ns",
+)
+
+
+def find_pb_files(root: PathLike) -> Generator[Path]:
+    """Find every PB file, compressed or not, under a directory."""
+    for filepath in sorted(Path(root).rglob("*")):
+        if filepath.is_file() and strip_compression_suffix(filepath).suffix == ".pb":
+            yield filepath
+
+
+def format_timestamp(year: int, sample: Sample | None) -> str | None:
+    """Get the timestamp of a sample as an ISO 8601 string, which SQLite can compare
+    and pass to its date and time functions."""
+    if sample is None:
+        return None
+    date = ArchiverData.get_sample_datetime(year, sample)
+    return date.isoformat(" ", "microseconds")
+
+
+def read_file_info(filepath: PathLike) -> dict:
+    """Read the header of a PB file and count its samples.
+
+    Args:
+        filepath (PathLike): Path to PB file.
+
+    Returns:
+        dict: A row of the catalog, keyed by column name.
+    """
+    filepath = Path(filepath)
+    stat = filepath.stat()
+    ad = ArchiverData(filepath)
+    count, first, last = ad.scan_samples()
+    return {
+        "path": str(filepath),
+        "pvname": ad.header.pvname,
+        "pv_type": ad.pv_type,
+        "year": ad.header.year,
+        "element_count": ad.header.elementCount,
+        "sample_count": count,
+        "first_timestamp": format_timestamp(ad.header.year, first),
+        "last_timestamp": format_timestamp(ad.header.year, last),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def update_catalog(database: PathLike, root: PathLike) -> dict[str, list[Path]]:
+    """Bring the catalog of the PB files under root up to date. Files are only read if
+    they are new or their size or modification time has changed, and files that no
+    longer exist are removed.
+
+    Args:
+        database (PathLike): Path to the SQLite database, which is created if it does
+        not exist.
+        root (PathLike): Directory to scan for PB files.
+
+    Returns:
+        dict[str, list[Path]]: The files that were "added", "updated", "unchanged"
+        and "removed", and those that could not be read ("failed").
+    """
+    changes: dict[str, list[Path]] = {
+        key: [] for key in ("added", "updated", "unchanged", "removed", "failed")
+    }
+    root = Path(root).resolve()
+    with sqlite3.connect(database) as connection:
+        connection.executescript(SCHEMA)
+        known = {
+            path: (size, mtime_ns)
+            for path, size, mtime_ns in connection.execute(
+                "SELECT path, size, mtime_ns FROM files WHERE path LIKE ? ESCAPE '\\'",
+                (_escape_like(str(root)) + "/%",),
+            )
+        }
+        insert = (
+            f"INSERT OR REPLACE INTO files ({', '.join(COLUMNS)}) "
+            + f"VALUES ({', '.join('?' * len(COLUMNS))})"
+        )
+        for filepath in find_pb_files(root):
+            path = str(filepath)
+            stat = filepath.stat()
+            previous = known.pop(path, None)
+            if previous == (stat.st_size, stat.st_mtime_ns):
+                changes["unchanged"].append(filepath)
+                continue
+            try:
+                info = read_file_info(filepath)
+            except Exception:
+                if previous is not None:
+                    connection.execute("DELETE FROM files WHERE path = ?", (path,))
+                changes["failed"].append(filepath)
+                continue
+            connection.execute(insert, [info[column] for column in COLUMNS])
+            changes["added" if previous is None else "updated"].append(filepath)
+        for path in known:
+            connection.execute("DELETE FROM files WHERE path = ?", (path,))
+            changes["removed"].append(Path(path))
+    connection.close()
+    return changes
+
+
+def _escape_like(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
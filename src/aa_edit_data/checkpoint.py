@@ -0,0 +1,119 @@
+import os
+import shutil
+import time
+from collections.abc import Generator, Iterable
+from os import PathLike
+from pathlib import Path
+from typing import BinaryIO
+
+from aa_edit_data.incremental import load_state, save_state
+from aa_edit_data.iocontrol import open_file
+from aa_edit_data.rewrite import fsync_path
+
+DEFAULT_INTERVAL = 60.0
+
+
+class Checkpoint:
+    def __init__(
+        self, filepath: PathLike, interval: float = DEFAULT_INTERVAL, resume=False
+    ):
+        """Initialise a Checkpoint, which lets a long process_and_write run be
+        stopped and resumed. The output is written to a hidden .partial file beside
+        filepath, and the input offset, output offset and algorithm state are saved
+        to a hidden .checkpoint file at least every interval seconds. The partial file
+        is moved onto filepath when the run completes.
+
+        Args:
+            filepath (PathLike): Path of the PB file being written.
+            interval (float, optional): Seconds between checkpoints.
+            resume (bool, optional): Continue from the last checkpoint, if there is one
+            for the same input, output and algorithm.
+        """
+        self.output = Path(filepath)
+        self.partial = self.output.with_name(f".{self.output.name}.partial")
+        self.filepath = self.output.with_name(f".{self.output.name}.checkpoint")
+        self.interval = interval
+        self.resume = resume
+        self.identity: dict = {}
+        self.input_offset = 0
+        self.output_offset = 0
+        self.state: dict = {}
+        self._next_save = 0.0
+
+    def start(self, identity: dict, input_offset: int) -> bool:
+        """Start a run, resuming from the last checkpoint if asked to and it belongs
+        to the same run.
+
+        Args:
+            identity (dict): Describes the run, e.g. the input file's path, size and
+            modification time, and the algorithm and its arguments.
+            input_offset (int): Offset of the first sample of the input.
+
+        Returns:
+            bool: True if the run is resumed from a checkpoint.
+        """
+        self.identity = identity
+        self.input_offset = input_offset
+        self.output_offset = 0
+        self.state = {}
+        self._next_save = time.monotonic() + self.interval
+        saved = load_state(self.filepath) if self.resume else None
+        if (
+            saved is None
+            or saved["identity"] != identity
+            or not self.partial.is_file()
+            or self.partial.stat().st_size < saved["output_offset"]
+        ):
+            return False
+        self.input_offset = saved["input_offset"]
+        self.output_offset = saved["output_offset"]
+        self.state = saved["state"]
+        return True
+
+    def open(self) -> BinaryIO:
+        """Open the partial output file, positioned at the last checkpoint."""
+        if not self.output_offset:
+            return open_file(self.partial, "wb")
+        f = open_file(self.partial, "r+b")
+        f.seek(self.output_offset)
+        f.truncate()
+        return f
+
+    def lines(self, lines: Iterable[bytes], f_out: BinaryIO) -> Generator[bytes]:
+        """Pass lines of the input through, counting the input offset and saving a
+        checkpoint when one is due.
+
+        A checkpoint is only saved when the next line is requested. By then every
+        sample the algorithm has yielded has been written to f_out, and its state
+        reflects every line read, so the checkpoint is consistent.
+        """
+        for line in lines:
+            yield line
+            self.input_offset += len(line)
+            if time.monotonic() >= self._next_save:
+                self.save(f_out)
+
+    def save(self, f_out: BinaryIO):
+        """Flush the output to disk and save a checkpoint."""
+        f_out.flush()
+        os.fsync(f_out.fileno())
+        self.output_offset = f_out.tell()
+        save_state(
+            self.filepath,
+            {
+                "identity": self.identity,
+                "input_offset": self.input_offset,
+                "output_offset": self.output_offset,
+                "state": self.state,
+            },
+        )
+        self._next_save = time.monotonic() + self.interval
+
+    def finish(self):
+        """Move the completed output into place and remove the checkpoint."""
+        if self.output.exists():
+            shutil.copymode(self.output, self.partial)
+        fsync_path(self.partial)
+        os.replace(self.partial, self.output)
+        self.filepath.unlink(missing_ok=True)
+        fsync_path(self.output.parent)
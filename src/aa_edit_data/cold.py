@@ -0,0 +1,535 @@
+"""A compact, columnar container for PB files that are kept for the record but rarely
+read, which converts back to the original PB file byte for byte.
+
+The samples are stored in blocks. Each block holds columns of timestamps as deltas or
+delta-of-deltas, numeric values as they are or XORed with the previous value and
+split into byte planes, and dictionaries of strings and of the remaining fields. Each
+column is compressed with lzma, using whichever of its encodings compresses smallest.
+Lines that cannot be rebuilt exactly from their columns, e.g. because they are
+truncated or badly escaped, are stored as they are.
+"""
+
+import hashlib
+import lzma
+import struct
+from collections.abc import Generator, Iterable
+from contextlib import ExitStack
+from os import PathLike
+from pathlib import Path
+from typing import BinaryIO, NamedTuple
+
+from aa_edit_data.archiver_data import PROTO_CLASS_NAMES, ArchiverData, Header
+from aa_edit_data.compression import is_stdio, open_pb_read, open_pb_write
+from aa_edit_data.generated import EPICSEvent_pb2
+from aa_edit_data.rewrite import atomic_write
+from aa_edit_data.wire import (
+    I32,
+    I64,
+    LEN,
+    NANO,
+    SECONDSINTOYEAR,
+    VAL,
+    VARINT,
+    encode_varint,
+    iter_fields,
+    read_varint,
+)
+
+COLD_SUFFIX = ".cold"
+MAGIC = b"AACOLD1\n"
+# Length of the header line, which follows
+HEADER = struct.Struct("<I")
+# Number of lines in a block and its size in bytes. A block of 0 lines marks the end,
+# and is followed by the SHA-256 of the PB file.
+BLOCK = struct.Struct("<II")
+# A block ends at whichever of these it reaches first
+BLOCK_SIZE = 2**20
+BLOCK_BYTES = 2**24
+# Each column is a raw LZMA2 stream. Its dictionary need be no larger than the column,
+# and the smallest LZMA2 allows is 4 KiB.
+FILTERS = [{"id": lzma.FILTER_LZMA2, "preset": 9, "dict_size": BLOCK_BYTES}]
+MIN_DICT_SIZE = 2**12
+COLUMNS = 6
+TIMESTAMP_ORDERS = (1, 2)
+# Transforms of values of a fixed size, as flags
+XOR = 1
+PLANES = 2
+NANOSECONDS = 10**9
+SECONDS_TAG = bytes([SECONDSINTOYEAR << 3 | VARINT])
+NANO_TAG = bytes([NANO << 3 | VARINT])
+# Values stored as little-endian numbers of a fixed size, or as varints. Values of
+# the other types are stored in a dictionary.
+FIXED_SIZES = {
+    "ScalarDouble": 8,
+    "ScalarFloat": 4,
+    "ScalarInt": 4,
+    "VectorDouble": 8,
+    "VectorFloat": 4,
+    "VectorInt": 4,
+}
+VARINT_CLASSES = {"ScalarShort", "ScalarEnum", "VectorShort", "VectorEnum"}
+FIXED = "fixed"
+VARINTS = "varints"
+DICTIONARY = "dictionary"
+
+
+class Codec(NamedTuple):
+    kind: str
+    # Bytes of each value of a fixed size
+    size: int
+    vector: bool
+    # Tag of the val field, if it is not stored in a dictionary
+    tag: bytes
+
+
+def write_cold(
+    filepath: PathLike, cold_filepath: PathLike, block_size: int = BLOCK_SIZE
+) -> int:
+    """Convert a PB file to a cold file. read_cold converts it back.
+
+    Args:
+        filepath (PathLike): Path to the PB file, or "-" for standard input.
+        cold_filepath (PathLike): Path to write the cold file to.
+        block_size (int, optional): Most samples in each block. Defaults to
+        BLOCK_SIZE.
+
+    Raises:
+        ValueError: Raised if cold_filepath is standard output.
+        DecodeError: Raised if the header cannot be decoded.
+
+    Returns:
+        int: Number of samples.
+    """
+    if is_stdio(cold_filepath):
+        raise ValueError("Cannot write a cold file to standard output")
+    digest = hashlib.sha256()
+    count = 0
+    with (
+        open_pb_read(filepath) as f_pb,
+        atomic_write(cold_filepath) as tmp,
+        open(tmp, "wb") as f_cold,
+    ):
+        header_line = f_pb.readline()
+        digest.update(header_line)
+        codec = _codec(header_line)
+        f_cold.write(MAGIC + HEADER.pack(len(header_line)) + header_line)
+        for lines in _blocks(f_pb, block_size):
+            digest.update(b"".join(lines))
+            block = _encode_block(lines, codec)
+            f_cold.write(BLOCK.pack(len(lines), len(block)) + block)
+            count += len(lines)
+        f_cold.write(BLOCK.pack(0, 0) + digest.digest())
+    return count
+
+
+def read_cold(cold_filepath: PathLike, filepath: PathLike) -> int:
+    """Convert a cold file back to the PB file it was made from. The result is checked
+    against the SHA-256 of the original, and filepath is only replaced if they match.
+
+    Args:
+        cold_filepath (PathLike): Path to the cold file.
+        filepath (PathLike): Path to write the PB file to, or "-" for standard
+        output. It is compressed if its extension is .gz, .zst or .xz.
+
+    Raises:
+        ValueError: Raised if the cold file is not a cold file, is truncated, or does
+        not reproduce the original.
+
+    Returns:
+        int: Number of samples.
+    """
+    digest = hashlib.sha256()
+    count = 0
+    with ExitStack() as stack:
+        f_cold = stack.enter_context(open(cold_filepath, "rb"))
+        if f_cold.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{cold_filepath} is not a cold file")
+        (length,) = HEADER.unpack(_read(f_cold, HEADER.size, cold_filepath))
+        header_line = _read(f_cold, length, cold_filepath)
+        codec = _codec(header_line)
+        pb_filepath = Path(filepath)
+        if not is_stdio(filepath):
+            pb_filepath = stack.enter_context(atomic_write(filepath))
+        f_pb = stack.enter_context(open_pb_write(pb_filepath))
+        f_pb.write(header_line)
+        digest.update(header_line)
+        while True:
+            lines, size = BLOCK.unpack(_read(f_cold, BLOCK.size, cold_filepath))
+            if not lines:
+                break
+            data = b"".join(
+                _decode_block(_read(f_cold, size, cold_filepath), lines, codec)
+            )
+            f_pb.write(data)
+            digest.update(data)
+            count += lines
+        if f_cold.read(digest.digest_size) != digest.digest():
+            raise ValueError(
+                f"Converting {cold_filepath} did not reproduce the original PB file"
+            )
+    return count
+
+
+def _codec(header_line: bytes) -> Codec:
+    header = ArchiverData.deserialize(header_line, Header)
+    name = PROTO_CLASS_NAMES[EPICSEvent_pb2.PayloadType.Name(header.type)]
+    vector = name.startswith("Vector")
+    if name in FIXED_SIZES:
+        size = FIXED_SIZES[name]
+        wire_type = LEN if vector else I64 if size == 8 else I32
+        return Codec(FIXED, size, vector, bytes([VAL << 3 | wire_type]))
+    if name in VARINT_CLASSES:
+        wire_type = LEN if vector else VARINT
+        return Codec(VARINTS, 0, vector, bytes([VAL << 3 | wire_type]))
+    return Codec(DICTIONARY, 0, False, b"")
+
+
+def _blocks(f: BinaryIO, size: int) -> Generator[list[bytes]]:
+    lines = []
+    total = 0
+    for line in f:
+        lines.append(line)
+        total += len(line)
+        if len(lines) >= size or total >= BLOCK_BYTES:
+            yield lines
+            lines = []
+            total = 0
+    if lines:
+        yield lines
+
+
+def _read(f: BinaryIO, length: int, filepath: PathLike) -> bytes:
+    data = f.read(length)
+    if len(data) != length:
+        raise ValueError(f"{filepath} is truncated")
+    return data
+
+
+def _split_line(line: bytes, codec: Codec) -> tuple[int, bytes, bytes] | None:
+    """Split a line of a PB file into its timestamp in nanoseconds, its value as it is
+    stored in the columns, and the fields after the value, or None if _join_line
+    would not rebuild the line exactly from them."""
+    if not line.endswith(b"\n"):
+        return None
+    if b"\x1b" in line or b"\r" in line:
+        data = ArchiverData.unescape_line(line)
+        if ArchiverData.escape_line(data) != line:
+            return None
+    else:
+        data = line[:-1]
+    try:
+        if data[:1] != SECONDS_TAG:
+            return None
+        seconds, pos = read_varint(data, 1)
+        if not _is_minimal(data, 1, pos) or data[pos : pos + 1] != NANO_TAG:
+            return None
+        nano, end = read_varint(data, pos + 1)
+        if not _is_minimal(data, pos + 1, end) or nano >= NANOSECONDS:
+            return None
+        start = pos = end
+        if codec.kind == DICTIONARY:
+            for number, _, _, end in iter_fields(data, pos):
+                if number != VAL:
+                    break
+                pos = end
+            val = data[start:pos]
+        elif data[pos : pos + 1] != codec.tag:
+            if not codec.vector:
+                return None
+            # Empty waveforms have no val field
+            val = b""
+        elif codec.vector:
+            length, start = read_varint(data, pos + 1)
+            if not length or not _is_minimal(data, pos + 1, start):
+                return None
+            pos = start + length
+            val = data[start:pos]
+            if len(val) != length:
+                return None
+        elif codec.kind == FIXED:
+            pos += 1 + codec.size
+            val = data[start + 1 : pos]
+        else:
+            _, pos = read_varint(data, pos + 1)
+            val = data[start + 1 : pos]
+    except ValueError:
+        return None
+    if codec.kind == FIXED and (
+        len(val) % codec.size or not (codec.vector or len(val) == codec.size)
+    ):
+        return None
+    return seconds * NANOSECONDS + nano, val, data[pos:]
+
+
+def _is_minimal(data: bytes, start: int, end: int) -> bool:
+    """Check that the varint from start to end is encoded in as few bytes as it can
+    be, as encode_varint would encode it, i.e. it does not end in a 0 byte."""
+    return end - start == 1 or data[end - 1] != 0
+
+
+def _join_line(timestamp: int, val: bytes, tail: bytes, codec: Codec) -> bytes:
+    seconds, nano = divmod(timestamp, NANOSECONDS)
+    if codec.kind == DICTIONARY:
+        field = val
+    elif not codec.vector:
+        field = codec.tag + val
+    elif val:
+        field = codec.tag + encode_varint(len(val)) + val
+    else:
+        field = b""
+    data = SECONDS_TAG + encode_varint(seconds) + NANO_TAG + encode_varint(nano)
+    return ArchiverData.escape_line(data + field + tail)
+
+
+def _encode_block(lines: list[bytes], codec: Codec) -> bytes:
+    """Encode a block of lines as its compressed columns: the timestamps, the
+    dictionary of the fields after the value, the value lengths or dictionary ids,
+    the values or dictionary entries, and the lines stored as they are."""
+    timestamps = []
+    vals = []
+    tails = []
+    exceptions = []
+    for index, line in enumerate(lines):
+        parts = _split_line(line, codec)
+        if parts is None:
+            exceptions.append(encode_varint(index) + _with_length(line))
+            continue
+        timestamps.append(parts[0])
+        vals.append(parts[1])
+        tails.append(parts[2])
+    if codec.kind == DICTIONARY:
+        val_columns = [[column] for column in _dictionary(vals)]
+    else:
+        lengths = b""
+        if codec.vector or codec.kind != FIXED:
+            lengths = b"".join(encode_varint(len(val)) for val in vals)
+        val_columns = [[lengths], [b"".join(vals)]]
+        if codec.kind == FIXED:
+            val_columns[1] = _fixed_transforms(vals, codec.size)
+    columns = [
+        [_encode_timestamps(timestamps, order) for order in TIMESTAMP_ORDERS],
+        *([column] for column in _dictionary(tails)),
+        *val_columns,
+        [encode_varint(len(exceptions)) + b"".join(exceptions)],
+    ]
+    return b"".join(_with_length(_compress(candidates)) for candidates in columns)
+
+
+def _decode_block(block: bytes, count: int, codec: Codec) -> list[bytes]:
+    columns = []
+    pos = 0
+    for _ in range(COLUMNS):
+        length, pos = read_varint(block, pos)
+        columns.append(_decompress(block[pos : pos + length]))
+        pos += length
+    timestamps, tail_ids, tail_entries, val_index, val_data, exception_data = columns
+    exceptions = {}
+    exception_count, pos = read_varint(exception_data[1], 0)
+    for _ in range(exception_count):
+        index, pos = read_varint(exception_data[1], pos)
+        length, pos = read_varint(exception_data[1], pos)
+        exceptions[index] = exception_data[1][pos : pos + length]
+        pos += length
+    rows = count - len(exceptions)
+    transform, data = val_data
+    if codec.kind == DICTIONARY:
+        vals = _from_dictionary(val_index[1], data)
+    else:
+        if codec.kind == FIXED and not codec.vector:
+            lengths = [codec.size] * rows
+        else:
+            lengths = _read_varints(val_index[1])
+        if transform & PLANES:
+            data = _from_byte_planes(data, codec.size)
+        if transform & XOR:
+            data = _undo_xor(data, lengths)
+        vals = _split_lengths(data, lengths)
+    order = TIMESTAMP_ORDERS[timestamps[0]]
+    joined = iter(
+        [
+            _join_line(*parts, codec)
+            for parts in zip(
+                _decode_timestamps(timestamps[1], order),
+                vals,
+                _from_dictionary(tail_ids[1], tail_entries[1]),
+                strict=True,
+            )
+        ]
+    )
+    return [
+        exceptions[index] if index in exceptions else next(joined)
+        for index in range(count)
+    ]
+
+
+def _compress(candidates: list[bytes]) -> bytes:
+    """Compress whichever of the candidate encodings of a column compresses smallest.
+
+    Returns:
+        bytes: The index of the candidate, then the compressed data.
+    """
+    compressed = []
+    for data in candidates:
+        dict_size = min(max(len(data), MIN_DICT_SIZE), BLOCK_BYTES)
+        filters = [{**FILTERS[0], "dict_size": dict_size}]
+        compressed.append(lzma.compress(data, format=lzma.FORMAT_RAW, filters=filters))
+    best = min(range(len(compressed)), key=lambda i: len(compressed[i]))
+    return bytes([best]) + compressed[best]
+
+
+def _decompress(column: bytes) -> tuple[int, bytes]:
+    data = lzma.decompress(column[1:], format=lzma.FORMAT_RAW, filters=FILTERS)
+    return column[0], data
+
+
+def _fixed_transforms(vals: list[bytes], size: int) -> list[bytes]:
+    """Encode values of a fixed size each way they can be stored, in the order of
+    the transform flags. Values that repeat compress best as they are, and values
+    that drift compress best XORed with the previous value."""
+    joined = b"".join(vals)
+    xored = _xor_previous(vals)
+    return [joined, xored, _byte_planes(joined, size), _byte_planes(xored, size)]
+
+
+def _with_length(data: bytes) -> bytes:
+    return encode_varint(len(data)) + data
+
+
+def _read_varints(data: bytes) -> list[int]:
+    values = []
+    pos = 0
+    while pos < len(data):
+        value, pos = read_varint(data, pos)
+        values.append(value)
+    return values
+
+
+def _split_lengths(data: bytes, lengths: Iterable[int]) -> list[bytes]:
+    parts = []
+    pos = 0
+    for length in lengths:
+        parts.append(data[pos : pos + length])
+        pos += length
+    return parts
+
+
+def _zigzag(value: int) -> int:
+    return value << 1 if value >= 0 else (-value << 1) - 1
+
+
+def _unzigzag(value: int) -> int:
+    return -((value + 1) >> 1) if value & 1 else value >> 1
+
+
+def _encode_timestamps(timestamps: list[int], order: int) -> bytes:
+    """Encode timestamps as the difference between consecutive timestamps (order 1),
+    or as the change in that difference (order 2), which is 0 for samples at a
+    steady rate."""
+    encoded = []
+    previous = delta = 0
+    for timestamp in timestamps:
+        new_delta = timestamp - previous
+        encoded.append(encode_varint(_zigzag(new_delta - delta)))
+        previous = timestamp
+        if order == 2:
+            delta = new_delta
+    return b"".join(encoded)
+
+
+def _decode_timestamps(data: bytes, order: int) -> list[int]:
+    timestamps = []
+    previous = delta = 0
+    for value in _read_varints(data):
+        new_delta = delta + _unzigzag(value)
+        previous += new_delta
+        if order == 2:
+            delta = new_delta
+        timestamps.append(previous)
+    return timestamps
+
+
+def _dictionary(values: list[bytes]) -> tuple[bytes, bytes]:
+    """Encode values as ids into a dictionary of the distinct values.
+
+    Returns:
+        tuple[bytes, bytes]: The ids, and the entries of the dictionary.
+    """
+    ids: dict[bytes, int] = {}
+    encoded = b"".join(
+        encode_varint(ids.setdefault(value, len(ids))) for value in values
+    )
+    return encoded, b"".join(_with_length(value) for value in ids)
+
+
+def _from_dictionary(ids: bytes, entries: bytes) -> list[bytes]:
+    values = []
+    pos = 0
+    while pos < len(entries):
+        length, pos = read_varint(entries, pos)
+        values.append(entries[pos : pos + length])
+        pos += length
+    return [values[i] for i in _read_varints(ids)]
+
+
+def _xor_previous(vals: list[bytes]) -> bytes:
+    """XOR each value with the previous one if it is the same length, so that the
+    bytes that did not change become 0."""
+    joined = b"".join(vals)
+    step = len(vals[0]) if vals else 0
+    if all(len(val) == step for val in vals):
+        if not step:
+            return joined
+        # XOR all the values at once, as one little-endian integer
+        value = int.from_bytes(joined, "little")
+        value ^= value << (step * 8)
+        return value.to_bytes(len(joined) + step, "little")[: len(joined)]
+    parts = []
+    previous = b""
+    for val in vals:
+        parts.append(_xor(val, previous) if len(val) == len(previous) else val)
+        previous = val
+    return b"".join(parts)
+
+
+def _undo_xor(data: bytes, lengths: list[int]) -> bytes:
+    step = lengths[0] if lengths else 0
+    if all(length == step for length in lengths):
+        if not step:
+            return data
+        # Each value is the XOR of all the values up to it, which doubling the shift
+        # builds up in log2(count) steps
+        value = int.from_bytes(data, "little")
+        bits = len(data) * 8
+        mask = (1 << bits) - 1
+        shift = step * 8
+        while shift < bits:
+            value ^= (value << shift) & mask
+            shift *= 2
+        return value.to_bytes(len(data), "little")
+    parts = []
+    previous = b""
+    for val in _split_lengths(data, lengths):
+        previous = _xor(val, previous) if len(val) == len(previous) else val
+        parts.append(previous)
+    return b"".join(parts)
+
+
+def _xor(a: bytes, b: bytes) -> bytes:
+    return (int.from_bytes(a, "little") ^ int.from_bytes(b, "little")).to_bytes(
+        len(a), "little"
+    )
+
+
+def _byte_planes(data: bytes, size: int) -> bytes:
+    """Group the first bytes of each value of size bytes, then the second bytes, and
+    so on, so that bytes that change slowly, e.g. the sign and exponent of doubles,
+    are next to each other."""
+    return b"".join(data[i::size] for i in range(size))
+
+
+def _from_byte_planes(data: bytes, size: int) -> bytes:
+    joined = bytearray(len(data))
+    count = len(data) // size
+    for i in range(size):
+        joined[i::size] = data[i * count : (i + 1) * count]
+    return bytes(joined)
@@ -0,0 +1,323 @@
+import gzip
+import io
+import lzma
+import queue
+import sys
+import threading
+from os import PathLike
+from pathlib import Path
+from typing import BinaryIO, TextIO
+
+from aa_edit_data.iocontrol import open_file
+
+COMPRESSION_SUFFIXES = {".gz": "gzip", ".zst": "zstd", ".xz": "xz"}
+MAGIC_NUMBERS = {
+    b"\x1f\x8b": "gzip",
+    b"\x28\xb5\x2f\xfd": "zstd",
+    b"\xfd7zXZ\x00": "xz",
+}
+CHUNK_SIZE = 2**20
+QUEUE_CHUNKS = 8
+STDIO_PATH = Path("-")
+
+
+def is_stdio(filepath: PathLike | None) -> bool:
+    """Check whether a path is "-", meaning standard input or output."""
+    return filepath is not None and Path(filepath) == STDIO_PATH
+
+
+def get_compression(filepath: PathLike) -> str | None:
+    """Get the compression implied by a file's extension.
+
+    Args:
+        filepath (PathLike): Path to a file, e.g. RAW:2025.pb.gz.
+
+    Returns:
+        str | None: "gzip", "zstd" or "xz", or None if the file is uncompressed.
+    """
+    return COMPRESSION_SUFFIXES.get(Path(filepath).suffix)
+
+
+def strip_compression_suffix(filepath: PathLike) -> Path:
+    """Remove a compression extension from a path, e.g. RAW:2025.pb.gz becomes
+    RAW:2025.pb."""
+    filepath = Path(filepath)
+    if get_compression(filepath):
+        return filepath.with_suffix("")
+    return filepath
+
+
+def add_to_stem(filepath: PathLike, text: str) -> Path:
+    """Append text to the stem of a PB file's name, keeping any compression
+    extension, e.g. RAW:2025.pb.gz becomes RAW:2025_backup.pb.gz."""
+    filepath = Path(filepath)
+    base = strip_compression_suffix(filepath)
+    compression_suffix = filepath.suffix if base != filepath else ""
+    return base.with_stem(f"{base.stem}{text}").with_suffix(
+        base.suffix + compression_suffix
+    )
+
+
+def open_pb_read(filepath: PathLike, threaded: bool = True) -> BinaryIO:
+    """Open a PB file for reading, decompressing it if it is gzip, zstd or xz
+    compressed. The compression is detected from the start of the file, not its
+    extension.
+
+    Args:
+        filepath (PathLike): Path to PB file, or "-" for standard input.
+        threaded (bool, optional): Decompress on a background thread so that
+        decompression overlaps with processing. Defaults to True.
+
+    Returns:
+        BinaryIO: A binary file object of the uncompressed data.
+    """
+    if is_stdio(filepath):
+        f = StandardStream(sys.stdin.buffer)
+    else:
+        f = open_file(filepath, "rb")
+    compression = detect_compression(f)
+    if compression is None:
+        return f  # type: ignore
+    stream = _decompressor(f, compression)
+    if not threaded:
+        return stream
+    return io.BufferedReader(ThreadedReader(stream), buffer_size=CHUNK_SIZE)
+
+
+def open_pb_write(filepath: PathLike, threaded: bool = True) -> BinaryIO:
+    """Open a PB file for writing, compressing it if its extension is .gz, .zst or
+    .xz.
+
+    Args:
+        filepath (PathLike): Path to PB file, or "-" for standard output.
+        threaded (bool, optional): Compress on a background thread so that
+        compression overlaps with processing. Defaults to True.
+
+    Returns:
+        BinaryIO: A binary file object that accepts uncompressed data.
+    """
+    if is_stdio(filepath):
+        return StandardStream(sys.stdout.buffer)  # type: ignore
+    compression = get_compression(filepath)
+    if compression is None:
+        return open_file(filepath, "wb")
+    stream = _compressor(open_file(filepath, "wb"), compression)
+    if not threaded:
+        return stream
+    return io.BufferedWriter(ThreadedWriter(stream), buffer_size=CHUNK_SIZE)
+
+
+def open_text_write(filepath: PathLike) -> TextIO:
+    """Open a text file for writing.
+
+    Args:
+        filepath (PathLike): Path to text file, or "-" for standard output.
+    """
+    if is_stdio(filepath):
+        return StandardStream(sys.stdout)  # type: ignore
+    return open(filepath, "w")
+
+
+def detect_compression(f) -> str | None:
+    """Detect the compression of a file from its magic number without consuming
+    any of it."""
+    if hasattr(f, "peek"):
+        start = f.peek(6)[:6]
+    else:
+        start = f.read(6)
+        f.seek(-len(start), io.SEEK_CUR)
+    for magic, compression in MAGIC_NUMBERS.items():
+        if start.startswith(magic):
+            return compression
+    return None
+
+
+def _decompressor(source, compression: str) -> BinaryIO:
+    """Open a decompressing stream of a file object, which closes it when closed."""
+    if compression == "gzip":
+        return _close_with(gzip.open(source, "rb"), source)  # type: ignore
+    if compression == "xz":
+        return _close_with(lzma.open(source, "rb"), source)  # type: ignore
+    zstandard = _import_zstandard()
+    # Files written by pzstd, or by concatenating zstd output, have several frames
+    reader = zstandard.ZstdDecompressor().stream_reader(source, read_across_frames=True)
+    return io.BufferedReader(reader)  # type: ignore
+
+
+def _compressor(target, compression: str) -> BinaryIO:
+    """Open a compressing stream that writes to a file object, which closes it when
+    closed."""
+    if compression == "gzip":
+        return _close_with(gzip.open(target, "wb", compresslevel=6), target)  # type: ignore
+    if compression == "xz":
+        return _close_with(lzma.open(target, "wb"), target)  # type: ignore
+    zstandard = _import_zstandard()
+    return zstandard.ZstdCompressor().stream_writer(target)
+
+
+def _close_with(stream: BinaryIO, f: BinaryIO) -> BinaryIO:
+    """Make closing a gzip or lzma stream also close the file object it wraps, which
+    they leave open."""
+    close_stream = stream.close
+
+    def close():
+        try:
+            close_stream()
+        finally:
+            f.close()
+
+    stream.close = close  # type: ignore
+    return stream
+
+
+def _import_zstandard():
+    try:
+        import zstandard
+    except ImportError as e:
+        raise ImportError(
+            "Reading or writing .zst files requires the zstandard package. "
+            + "Install it with `pip install aa-edit-data[zstd]`."
+        ) from e
+    return zstandard
+
+
+class ThreadedReader(io.RawIOBase):
+    def __init__(self, stream: BinaryIO):
+        """Initialise a ThreadedReader, which reads a stream in chunks on a
+        background thread and hands them to the caller through a bounded queue.
+
+        Args:
+            stream (BinaryIO): Stream to read, e.g. a decompressor.
+        """
+        self._stream = stream
+        self._queue: queue.Queue = queue.Queue(maxsize=QUEUE_CHUNKS)
+        self._stop = threading.Event()
+        self._chunk = memoryview(b"")
+        self._eof = False
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                chunk = self._stream.read(CHUNK_SIZE)
+                self._put(chunk)
+                if not chunk:
+                    return
+        except BaseException as e:
+            self._put(e)
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        while not self._chunk:
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if isinstance(item, BaseException):
+                raise item
+            if not item:
+                self._eof = True
+                return 0
+            self._chunk = memoryview(item)
+        n = min(len(buffer), len(self._chunk))
+        buffer[:n] = self._chunk[:n]
+        self._chunk = self._chunk[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._stream.close()
+        super().close()
+
+
+class ThreadedWriter(io.RawIOBase):
+    def __init__(self, stream: BinaryIO):
+        """Initialise a ThreadedWriter, which passes chunks written to it through a
+        bounded queue to a background thread that writes them to a stream.
+
+        Args:
+            stream (BinaryIO): Stream to write to, e.g. a compressor.
+        """
+        self._stream = stream
+        self._queue: queue.Queue = queue.Queue(maxsize=QUEUE_CHUNKS)
+        self._error: BaseException | None = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            while (chunk := self._queue.get()) is not None:
+                if self._error is None:
+                    self._stream.write(chunk)
+        except BaseException as e:
+            self._error = e
+            # Keep draining so that the writer never blocks on a full queue
+            while self._queue.get() is not None:
+                pass
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, buffer) -> int:
+        if self._error is not None:
+            raise self._error
+        data = bytes(buffer)
+        self._queue.put(data)
+        return len(data)
+
+    def close(self):
+        if self.closed:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        try:
+            self._stream.close()
+        except Exception:
+            if self._error is None:
+                raise
+        finally:
+            super().close()
+        if self._error is not None:
+            raise self._error
+
+
+class StandardStream:
+    def __init__(self, stream):
+        """Initialise a StandardStream, which wraps sys.stdin or sys.stdout so that
+        it can be used like a file opened with open(). Closing it flushes the
+        stream instead of closing it.
+
+        Args:
+            stream: The stream to wrap, e.g. sys.stdin.buffer.
+        """
+        self._stream = stream
+        self.closed = False
+
+    def __getattr__(self, name: str):
+        return getattr(self._stream, name)
+
+    def __iter__(self):
+        return iter(self._stream)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if not self.closed and self._stream.writable():
+            self._stream.flush()
+        self.closed = True
@@ -0,0 +1,179 @@
+import gzip
+import struct
+import zlib
+from collections.abc import Generator
+from os import PathLike
+from pathlib import Path
+
+from aa_edit_data.compression import (
+    CHUNK_SIZE,
+    add_to_stem,
+    open_pb_read,
+    open_pb_write,
+    strip_compression_suffix,
+)
+from aa_edit_data.rewrite import atomic_write
+
+DELTA_SUFFIX = ".pbdelta"
+MAGIC = b"AADELTA1"
+# Number of bytes kept since the previous record, then the number of bytes removed.
+# The removed bytes follow. A record that removes nothing marks the end of the delta.
+RECORD = struct.Struct("<QQ")
+# Size and CRC-32 of the original file, then of the edited file
+FOOTER = struct.Struct("<QIQI")
+
+
+def default_delta_filename(filepath: PathLike) -> Path:
+    """Get the default delta backup path of a PB file, e.g. RAW:2025.pb.gz becomes
+    RAW:2025_backup.pbdelta."""
+    return strip_compression_suffix(add_to_stem(filepath, "_backup")).with_suffix(
+        DELTA_SUFFIX
+    )
+
+
+def write_delta(original: PathLike, edited: PathLike, delta_filepath: PathLike):
+    """Write a delta backup of a PB file that has had samples removed. The delta holds
+    only the removed lines and where they were, so that restore_delta can rebuild the
+    original from the edited file. It is gzip compressed.
+
+    Positions are counted in the uncompressed data, so a compressed file is restored
+    with the same content, though not necessarily the same compressed bytes.
+
+    Args:
+        original (PathLike): Path to the PB file before it was edited.
+        edited (PathLike): Path to the PB file after it was edited.
+        delta_filepath (PathLike): Path to write the delta to.
+
+    Raises:
+        ValueError: Raised if the lines of the edited file are not a subsequence of the
+        lines of the original, i.e. samples were changed rather than only removed.
+    """
+    original_sum = _Checksum()
+    edited_sum = _Checksum()
+    kept = 0
+    removed = bytearray()
+    with (
+        open_pb_read(original) as f_original,
+        open_pb_read(edited) as f_edited,
+        atomic_write(delta_filepath) as tmp,
+        gzip.open(tmp, "wb", compresslevel=6) as f_delta,
+    ):
+        f_delta.write(MAGIC)
+        next_line = f_edited.readline()
+        for line in f_original:
+            original_sum.update(line)
+            if line != next_line:
+                removed += line
+                # Write long runs of removed lines, e.g. a time-window cut, in
+                # records of about CHUNK_SIZE so that they are not held in memory
+                if len(removed) >= CHUNK_SIZE:
+                    kept = _write_record(f_delta, kept, removed)
+                continue
+            if removed:
+                kept = _write_record(f_delta, kept, removed)
+            kept += len(line)
+            edited_sum.update(line)
+            next_line = f_edited.readline()
+        if next_line:
+            raise ValueError(
+                f"Cannot make a delta backup: {edited} contains samples that are not "
+                + f"in {original}"
+            )
+        if removed:
+            kept = _write_record(f_delta, kept, removed)
+        f_delta.write(RECORD.pack(kept, 0))
+        f_delta.write(FOOTER.pack(*original_sum.value, *edited_sum.value))
+
+
+def restore_delta(edited: PathLike, delta_filepath: PathLike, filepath: PathLike):
+    """Rebuild an original PB file from the edited file and its delta backup. The
+    result is checked against the size and CRC-32 of the original stored in the delta,
+    and filepath is only replaced if they match.
+
+    Args:
+        edited (PathLike): Path to the PB file after it was edited.
+        delta_filepath (PathLike): Path to the delta written by write_delta.
+        filepath (PathLike): Path to write the original PB file to. May be the same as
+        edited.
+
+    Raises:
+        ValueError: Raised if the delta is not a delta backup, is truncated, or does
+        not belong to the edited file.
+    """
+    edited_sum = _Checksum()
+    restored_sum = _Checksum()
+    with (
+        gzip.open(delta_filepath, "rb") as f_delta,
+        open_pb_read(edited) as f_edited,
+        atomic_write(filepath) as tmp,
+        open_pb_write(tmp) as f_out,
+    ):
+        if f_delta.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{delta_filepath} is not a delta backup")
+        while True:
+            kept, length = _read_struct(f_delta, RECORD, delta_filepath)
+            for chunk in _read_chunks(f_edited, kept):
+                edited_sum.update(chunk)
+                restored_sum.update(chunk)
+                f_out.write(chunk)
+            if not length:
+                break
+            for chunk in _read_chunks(f_delta, length):
+                restored_sum.update(chunk)
+                f_out.write(chunk)
+        footer = _read_struct(f_delta, FOOTER, delta_filepath)
+        if f_edited.read(1) or edited_sum.value != footer[2:]:
+            raise ValueError(
+                f"{edited} does not match the file {delta_filepath} was made from"
+            )
+        if restored_sum.value != footer[:2]:
+            raise ValueError(
+                f"Restoring {edited} with {delta_filepath} did not reproduce the "
+                + "original file"
+            )
+
+
+class _Checksum:
+    def __init__(self):
+        """Initialise a _Checksum, which tracks the size and CRC-32 of a stream of
+        bytes."""
+        self.size = 0
+        self.crc = 0
+
+    def update(self, data: bytes):
+        self.size += len(data)
+        self.crc = zlib.crc32(data, self.crc)
+
+    @property
+    def value(self) -> tuple[int, int]:
+        return self.size, self.crc
+
+
+def _write_record(f_delta, kept: int, removed: bytearray) -> int:
+    """Write a record of the bytes kept since the previous one and the removed bytes,
+    and clear removed.
+
+    Returns:
+        int: The number of bytes kept since this record, 0.
+    """
+    f_delta.write(RECORD.pack(kept, len(removed)))
+    f_delta.write(removed)
+    removed.clear()
+    return 0
+
+
+def _read_chunks(f, length: int) -> Generator[bytes]:
+    """Read exactly length bytes from f in chunks."""
+    while length > 0:
+        chunk = f.read(min(length, CHUNK_SIZE))
+        if not chunk:
+            raise ValueError("Delta backup does not match the edited file")
+        length -= len(chunk)
+        yield chunk
+
+
+def _read_struct(f, s: struct.Struct, filepath: PathLike) -> tuple:
+    data = f.read(s.size)
+    if len(data) != s.size:
+        raise ValueError(f"{filepath} is truncated")
+    return s.unpack(data)
@@ -1,4 +1,4 @@
-import subprocess
+from collections.abc import Callable
 from datetime import datetime
 from pathlib import Path
 
@@ -6,12 +6,28 @@ import typer
 
 from aa_edit_data._version import __version__
 from aa_edit_data.algorithms import (
+    DUPLICATE_KEYS,
     apply_min_period,
     remove_after_ts,
     remove_before_ts,
     remove_by_factor,
+    remove_duplicates,
+    remove_unchanged,
+    strip_fields,
 )
 from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.checkpoint import DEFAULT_INTERVAL, Checkpoint
+from aa_edit_data.compression import add_to_stem, is_stdio, strip_compression_suffix
+from aa_edit_data.delta import DELTA_SUFFIX, default_delta_filename, restore_delta
+from aa_edit_data.incremental import process_incremental
+from aa_edit_data.iocontrol import configure_io, set_priority
+from aa_edit_data.merge import merge_files
+from aa_edit_data.narrow import narrow_type as narrow_file
+from aa_edit_data.profiling import ProcessStats
+from aa_edit_data.rewrite import backup_file
+from aa_edit_data.sort import DEFAULT_MEMORY, sort_file
+from aa_edit_data.split import PARTITIONS, split_file
+from aa_edit_data.waveform import extract_elements
 
 
 def validate_positive(value: float):
@@ -22,21 +38,116 @@ def validate_positive(value: float):
 
 app = typer.Typer()
 
-FILENAME_ARGUMENT = typer.Argument(help="path/to/file.pb of PB file being processed")
-NEW_FILENAME_OPTION = typer.Option(None, help="path/to/file.pb of new file to write to")
+FILENAME_ARGUMENT = typer.Argument(
+    help="path/to/file.pb of PB file being processed, or - for standard input"
+)
+NEW_FILENAME_OPTION = typer.Option(
+    None,
+    "--new-filename",
+    "-o",
+    help="path/to/file.pb of new file to write to, or - for standard output",
+)
+FILENAMES_ARGUMENT = typer.Argument(
+    help="path/to/file.pb of each PB file being merged, or - for standard input"
+)
+MERGED_FILENAME_OPTION = typer.Option(
+    ...,
+    "--new-filename",
+    "-o",
+    help="path/to/file.pb of new file to write to, or - for standard output",
+)
+DROP_DUPLICATES_OPTION = typer.Option(
+    False,
+    "--drop-duplicates",
+    help="Keep only the first sample with each timestamp, taken from the earliest "
+    + "file in the list",
+)
+RAW_OPTION = typer.Option(
+    False,
+    "--raw",
+    help="Compare timestamps read from the wire format without decoding samples",
+)
+OUTPUT_DIR_OPTION = typer.Option(
+    None, help="path/to/directory to write to. Defaults to the directory of filename"
+)
+TEMP_DIR_OPTION = typer.Option(
+    None, help="path/to/directory for temporary files. Defaults to the system's"
+)
 BACKUP_FILENAME_OPTION = typer.Option(None, help="path/to/file.pb of a backup file")
+DELTA_BACKUP_OPTION = typer.Option(
+    False,
+    "--delta-backup",
+    help="Back up only the removed samples to a .pbdelta file, which the restore "
+    + "command can use to rebuild the original",
+)
+DELTA_FILENAME_ARGUMENT = typer.Argument(
+    None,
+    help="path/to/file.pbdelta of a delta backup. Defaults to the one --delta-backup "
+    + "makes",
+)
+STATE_FILE_OPTION = typer.Option(
+    None,
+    help="path/to/state.json. Only process samples appended since the last run with "
+    + "this state file, and append the result to new-filename",
+)
+CHECKPOINT_INTERVAL_OPTION = typer.Option(
+    None,
+    help="Save a checkpoint at least this many seconds apart, so that the run can be "
+    + "continued with --resume if it is stopped",
+    min=0,
+)
+RESUME_OPTION = typer.Option(
+    False, "--resume", help="Continue from the last checkpoint of a stopped run"
+)
 WRITE_TXT_OPTION = typer.Option(
     False, "--write-txt", "-t", help="Write result to text file"
 )
+PROFILE_OPTION = typer.Option(
+    False, "--profile", help="Print timings and sample counts for each stage"
+)
+STATS_JSON_OPTION = typer.Option(
+    None, help="path/to/stats.json to write timings and sample counts to"
+)
+MAX_IO_RATE_OPTION = typer.Option(
+    None, help="Limit reading and writing PB files to this many MB/s in total", min=0
+)
+DROP_CACHE_OPTION = typer.Option(
+    False,
+    "--drop-cache",
+    help="Drop PB files from the page cache once processed, so that sweeps over an "
+    + "archive do not evict other processes' cached data",
+)
+NICE_OPTION = typer.Option(
+    None, help="Add this to the CPU and I/O niceness of the process", min=0
+)
+IDLE_IO_OPTION = typer.Option(
+    False, "--idle-io", help="Only read and write when no other process needs the disk"
+)
 
 
 @app.callback(invoke_without_command=True)
 def main(
     version: bool = typer.Option(False, "--version", help="Show version and exit"),
+    max_io_rate: float | None = MAX_IO_RATE_OPTION,
+    drop_cache: bool = DROP_CACHE_OPTION,
+    nice: int | None = NICE_OPTION,
+    idle_io: bool = IDLE_IO_OPTION,
 ):
     if version:
         typer.echo(f"Version: {__version__}")
         raise typer.Exit()
+    limit_io(max_io_rate, drop_cache, nice, idle_io)
+
+
+def limit_io(
+    max_io_rate: float | None, drop_cache: bool, nice: int | None, idle_io: bool
+):
+    """Apply the I/O limit and priority options."""
+    configure_io(max_io_rate, drop_cache)
+    try:
+        set_priority(nice, idle_io)
+    except OSError as e:
+        raise typer.BadParameter(str(e)) from e
 
 
 @app.command()
@@ -47,16 +158,31 @@ def reduce_to_period(
     ),
     new_filename: Path | None = NEW_FILENAME_OPTION,
     backup_filename: Path | None = BACKUP_FILENAME_OPTION,
+    delta_backup: bool = DELTA_BACKUP_OPTION,
     write_txt: bool = WRITE_TXT_OPTION,
+    state_file: Path | None = STATE_FILE_OPTION,
+    checkpoint_interval: float | None = CHECKPOINT_INTERVAL_OPTION,
+    resume: bool = RESUME_OPTION,
+    profile: bool = PROFILE_OPTION,
+    stats_json: Path | None = STATS_JSON_OPTION,
 ):
     """Reduce the frequency of data in a PB file by setting a minimum period between
     data points."""
-    f, new_f, backup_f = process_filenames(filename, new_filename, backup_filename)
-    if backup_f is not None:
-        subprocess.run(["cp", f, backup_f], check=True)
-
-    ad = ArchiverData(f)
-    ad.process_and_write(new_f, write_txt, apply_min_period, [period])
+    edit_file(
+        filename,
+        apply_min_period,
+        [period],
+        new_filename,
+        backup_filename,
+        delta_backup,
+        write_txt,
+        state_file,
+        checkpoint_interval,
+        resume,
+        profile,
+        stats_json,
+        lazy=True,
+    )
 
 
 @app.command()
@@ -65,15 +191,30 @@ def reduce_by_factor(
     factor: int = typer.Argument(help="Factor to reduce the data by", min=1),
     new_filename: Path | None = NEW_FILENAME_OPTION,
     backup_filename: Path | None = BACKUP_FILENAME_OPTION,
+    delta_backup: bool = DELTA_BACKUP_OPTION,
     write_txt: bool = WRITE_TXT_OPTION,
+    state_file: Path | None = STATE_FILE_OPTION,
+    checkpoint_interval: float | None = CHECKPOINT_INTERVAL_OPTION,
+    resume: bool = RESUME_OPTION,
+    profile: bool = PROFILE_OPTION,
+    stats_json: Path | None = STATS_JSON_OPTION,
 ):
     """Reduce the number of data points in a PB file by a certain factor."""
-    f, new_f, backup_f = process_filenames(filename, new_filename, backup_filename)
-    if backup_f is not None:
-        subprocess.run(["cp", f, backup_f], check=True)
-
-    ad = ArchiverData(f)
-    ad.process_and_write(new_f, write_txt, remove_by_factor, [factor], raw=True)
+    edit_file(
+        filename,
+        remove_by_factor,
+        [factor],
+        new_filename,
+        backup_filename,
+        delta_backup,
+        write_txt,
+        state_file,
+        checkpoint_interval,
+        resume,
+        profile,
+        stats_json,
+        raw=True,
+    )
 
 
 @app.command()
@@ -84,16 +225,30 @@ def remove_before(
     ),
     new_filename: Path | None = NEW_FILENAME_OPTION,
     backup_filename: Path | None = BACKUP_FILENAME_OPTION,
+    delta_backup: bool = DELTA_BACKUP_OPTION,
     write_txt: bool = WRITE_TXT_OPTION,
+    state_file: Path | None = STATE_FILE_OPTION,
+    checkpoint_interval: float | None = CHECKPOINT_INTERVAL_OPTION,
+    resume: bool = RESUME_OPTION,
+    profile: bool = PROFILE_OPTION,
+    stats_json: Path | None = STATS_JSON_OPTION,
 ):
     """Remove all data points before a certain timestamp in a PB file."""
-    f, new_f, backup_f = process_filenames(filename, new_filename, backup_filename)
-    if backup_f is not None:
-        subprocess.run(["cp", f, backup_f], check=True)
-
-    ad = ArchiverData(f)
-    seconds, nano = process_timestamp(ad.header.year, timestamp)
-    ad.process_and_write(new_f, write_txt, remove_before_ts, [seconds, nano])
+    edit_file(
+        filename,
+        remove_before_ts,
+        timestamp_args(timestamp),
+        new_filename,
+        backup_filename,
+        delta_backup,
+        write_txt,
+        state_file,
+        checkpoint_interval,
+        resume,
+        profile,
+        stats_json,
+        lazy=True,
+    )
 
 
 @app.command()
@@ -104,20 +259,445 @@ def remove_after(
     ),
     new_filename: Path | None = NEW_FILENAME_OPTION,
     backup_filename: Path | None = BACKUP_FILENAME_OPTION,
+    delta_backup: bool = DELTA_BACKUP_OPTION,
     write_txt: bool = WRITE_TXT_OPTION,
+    state_file: Path | None = STATE_FILE_OPTION,
+    checkpoint_interval: float | None = CHECKPOINT_INTERVAL_OPTION,
+    resume: bool = RESUME_OPTION,
+    profile: bool = PROFILE_OPTION,
+    stats_json: Path | None = STATS_JSON_OPTION,
 ):
     """Remove all data points after a certain timestamp in a PB file."""
+    edit_file(
+        filename,
+        remove_after_ts,
+        timestamp_args(timestamp),
+        new_filename,
+        backup_filename,
+        delta_backup,
+        write_txt,
+        state_file,
+        checkpoint_interval,
+        resume,
+        profile,
+        stats_json,
+        lazy=True,
+    )
+
+
+@app.command()
+def dedup(
+    filename: Path = FILENAME_ARGUMENT,
+    by: str = typer.Option(
+        "bytes",
+        help="Remove samples identical to the one before (bytes), or with the same "
+        + "timestamp (timestamp)",
+    ),
+    keep: str = typer.Option(
+        "first", help="Keep the first or last of each run of duplicates"
+    ),
+    new_filename: Path | None = NEW_FILENAME_OPTION,
+    backup_filename: Path | None = BACKUP_FILENAME_OPTION,
+    delta_backup: bool = DELTA_BACKUP_OPTION,
+    write_txt: bool = WRITE_TXT_OPTION,
+    state_file: Path | None = STATE_FILE_OPTION,
+    checkpoint_interval: float | None = CHECKPOINT_INTERVAL_OPTION,
+    resume: bool = RESUME_OPTION,
+    profile: bool = PROFILE_OPTION,
+    stats_json: Path | None = STATS_JSON_OPTION,
+):
+    """Remove consecutive duplicate samples from a PB file."""
+    if by not in DUPLICATE_KEYS:
+        raise typer.BadParameter(f"--by must be one of {', '.join(DUPLICATE_KEYS)}")
+    if keep not in ("first", "last"):
+        raise typer.BadParameter("--keep must be first or last")
+    edit_file(
+        filename,
+        remove_duplicates,
+        [by, keep],
+        new_filename,
+        backup_filename,
+        delta_backup,
+        write_txt,
+        state_file,
+        checkpoint_interval,
+        resume,
+        profile,
+        stats_json,
+        raw=True,
+    )
+
+
+@app.command("remove-unchanged")
+def remove_unchanged_command(
+    filename: Path = FILENAME_ARGUMENT,
+    tolerance: float = typer.Option(
+        0,
+        help="Also remove samples whose elements each differ by at most this much "
+        + "from those of the last sample kept",
+        min=0,
+    ),
+    new_filename: Path | None = NEW_FILENAME_OPTION,
+    backup_filename: Path | None = BACKUP_FILENAME_OPTION,
+    delta_backup: bool = DELTA_BACKUP_OPTION,
+    write_txt: bool = WRITE_TXT_OPTION,
+    state_file: Path | None = STATE_FILE_OPTION,
+    checkpoint_interval: float | None = CHECKPOINT_INTERVAL_OPTION,
+    resume: bool = RESUME_OPTION,
+    profile: bool = PROFILE_OPTION,
+    stats_json: Path | None = STATS_JSON_OPTION,
+):
+    """Remove samples whose value is the same as that of the last sample kept."""
+    edit_file(
+        filename,
+        remove_unchanged,
+        lambda ad: [ad.proto_class.__name__, tolerance],
+        new_filename,
+        backup_filename,
+        delta_backup,
+        write_txt,
+        state_file,
+        checkpoint_interval,
+        resume,
+        profile,
+        stats_json,
+        raw=True,
+    )
+
+
+@app.command("strip-fields")
+def strip_fields_command(
+    filename: Path = FILENAME_ARGUMENT,
+    keep_changed: bool = typer.Option(
+        False, help="Keep each field value that differs from the last one kept"
+    ),
+    new_filename: Path | None = NEW_FILENAME_OPTION,
+    backup_filename: Path | None = BACKUP_FILENAME_OPTION,
+    write_txt: bool = WRITE_TXT_OPTION,
+    state_file: Path | None = STATE_FILE_OPTION,
+    checkpoint_interval: float | None = CHECKPOINT_INTERVAL_OPTION,
+    resume: bool = RESUME_OPTION,
+    profile: bool = PROFILE_OPTION,
+    stats_json: Path | None = STATS_JSON_OPTION,
+):
+    """Remove the field values stored with samples of a PB file. There is no
+    --delta-backup, as the samples kept are rewritten rather than copied."""
+    edit_file(
+        filename,
+        strip_fields,
+        [keep_changed],
+        new_filename,
+        backup_filename,
+        False,
+        write_txt,
+        state_file,
+        checkpoint_interval,
+        resume,
+        profile,
+        stats_json,
+        raw=True,
+    )
+
+
+@app.command()
+def restore(
+    filename: Path = FILENAME_ARGUMENT,
+    delta_filename: Path | None = DELTA_FILENAME_ARGUMENT,
+    new_filename: Path | None = NEW_FILENAME_OPTION,
+):
+    """Rebuild the original of a PB file from a delta backup."""
+    validate_pb_file(filename, should_exist=True)
+    if is_stdio(filename) or is_stdio(new_filename):
+        raise ValueError("Cannot restore from or to standard input or output")
+    if delta_filename is None:
+        delta_filename = default_delta_filename(filename)
+    validate_delta_file(delta_filename, should_exist=True)
+    new_filename = new_filename or filename
+    validate_pb_file(new_filename)
+    restore_delta(filename, delta_filename, new_filename)
+
+
+@app.command()
+def merge(
+    filenames: list[Path] = FILENAMES_ARGUMENT,
+    new_filename: Path = MERGED_FILENAME_OPTION,
+    drop_duplicates: bool = DROP_DUPLICATES_OPTION,
+    raw: bool = RAW_OPTION,
+):
+    """Merge PB files of the same PV and year, each in timestamp order, into one."""
+    for filename in filenames:
+        validate_pb_file(filename, should_exist=True)
+    validate_pb_file(new_filename)
+    merge_files(filenames, new_filename, raw=raw, drop_duplicates=drop_duplicates)
+
+
+@app.command()
+def split(
+    filename: Path = FILENAME_ARGUMENT,
+    by: str = typer.Option(
+        "month", help=f"Length of each partition: {', '.join(PARTITIONS)}"
+    ),
+    output_dir: Path | None = OUTPUT_DIR_OPTION,
+    force: bool = typer.Option(
+        False, help="Overwrite partition files that already exist"
+    ),
+):
+    """Split a PB file into one file per month, day or hour, e.g. RAW:2025_03.pb."""
+    validate_pb_file(filename, should_exist=True)
+    if by not in PARTITIONS:
+        raise typer.BadParameter(f"Must be one of {', '.join(PARTITIONS)}")
+    for filepath in split_file(filename, by, output_dir, force):
+        typer.echo(filepath)
+
+
+@app.command()
+def repair_order(
+    filename: Path = FILENAME_ARGUMENT,
+    new_filename: Path | None = NEW_FILENAME_OPTION,
+    backup_filename: Path | None = BACKUP_FILENAME_OPTION,
+    memory: float = typer.Option(
+        DEFAULT_MEMORY, help="Memory budget in MiB for the samples held at once", min=1
+    ),
+    temp_dir: Path | None = TEMP_DIR_OPTION,
+):
+    """Sort the samples of a PB file into timestamp order, in bounded memory."""
     f, new_f, backup_f = process_filenames(filename, new_filename, backup_filename)
     if backup_f is not None:
-        subprocess.run(["cp", f, backup_f], check=True)
+        backup_file(f, backup_f, allow_hardlink=new_f == f)
+    count, out_of_order, unsortable = sort_file(f, new_f, memory, temp_dir)
+    if not is_stdio(new_f):
+        typer.echo(f"{out_of_order} of {count} samples were out of order")
+        if unsortable:
+            typer.echo(f"{unsortable} unsortable lines were kept unchanged at the end")
+
+
+@app.command()
+def extract_element(
+    filename: Path = FILENAME_ARGUMENT,
+    index: int | None = typer.Option(
+        None, help="Extract this element into a SCALAR_* file", min=0
+    ),
+    element_range: str | None = typer.Option(
+        None,
+        "--range",
+        help="Extract elements start:stop, as in a Python slice, into a smaller "
+        + "waveform file",
+    ),
+    new_filename: Path | None = NEW_FILENAME_OPTION,
+    backup_filename: Path | None = BACKUP_FILENAME_OPTION,
+):
+    """Extract one element or a range of elements of a waveform PB file."""
+    if (index is None) == (element_range is None):
+        raise typer.BadParameter("Give one of --index or --range")
+    start, stop = index, None
+    if element_range is not None:
+        first, _, last = element_range.partition(":")
+        try:
+            start, stop = int(first or 0), int(last)
+        except ValueError as e:
+            raise typer.BadParameter("--range must be start:stop") from e
+    f, new_f, backup_f = process_filenames(filename, new_filename, backup_filename)
+    if backup_f is not None:
+        backup_file(f, backup_f, allow_hardlink=new_f == f)
+    extract_elements(f, new_f, start or 0, stop)
+
+
+@app.command()
+def narrow_type(
+    filename: Path = FILENAME_ARGUMENT,
+    mantissa_bits: int | None = typer.Option(
+        None,
+        help="Keep only this many bits of the mantissa of each value, which makes "
+        + "the file compress better",
+        min=1,
+    ),
+    keep_double: bool = typer.Option(
+        False, help="Keep the values as doubles, only truncating their mantissas"
+    ),
+    new_filename: Path | None = NEW_FILENAME_OPTION,
+    backup_filename: Path | None = BACKUP_FILENAME_OPTION,
+):
+    """Rewrite a SCALAR_DOUBLE or WAVEFORM_DOUBLE PB file with float values."""
+    if keep_double and mantissa_bits is None:
+        raise typer.BadParameter("--keep-double needs --mantissa-bits")
+    f, new_f, backup_f = process_filenames(filename, new_filename, backup_filename)
+    if backup_f is not None:
+        backup_file(f, backup_f, allow_hardlink=new_f == f)
+    narrow_file(f, new_f, mantissa_bits, keep_double)
+
+
+def edit_file(
+    filename: Path,
+    process_func: Callable,
+    process_args: list | Callable[[ArchiverData], list],
+    new_filename: Path | None,
+    backup_filename: Path | None,
+    delta_backup: bool,
+    write_txt: bool,
+    state_file: Path | None,
+    checkpoint_interval: float | None,
+    resume: bool,
+    profile: bool,
+    stats_json: Path | None,
+    raw: bool = False,
+    lazy: bool = False,
+):
+    """Process a PB file with an algorithm the way the commands that edit PB files
+    do: incrementally if there is a state file, otherwise writing the new file, and
+    a backup, with optional checkpoints and statistics.
+
+    Args:
+        filename (Path): Path to the PB file to process.
+        process_func (Callable): Algorithm to process the samples with.
+        process_args (list | Callable[[ArchiverData], list]): Arguments of the
+        algorithm, or a function that gets them from the opened PB file.
+        new_filename (Path | None): Destination path for the processed PB file.
+        backup_filename (Path | None): Path to the backup file.
+        delta_backup (bool): Make a delta backup rather than a full copy.
+        write_txt (bool): Also write a text file of the samples.
+        state_file (Path | None): State file of incremental runs, if any.
+        checkpoint_interval (float | None): Seconds between checkpoints, if any.
+        resume (bool): Resume from the last checkpoint.
+        profile (bool): Print a timing summary.
+        stats_json (Path | None): Path to write timings to as JSON.
+        raw (bool, optional): Pass the samples to the algorithm as bytes.
+        lazy (bool, optional): Pass the samples to the algorithm as SampleViews.
+
+    Raises:
+        typer.BadParameter: Raised if there is a state file and an option that an
+        incremental run does not support.
+    """
+    if state_file is not None:
+        unsupported = [
+            option
+            for option, given in (
+                ("--delta-backup", delta_backup),
+                ("--checkpoint-interval", checkpoint_interval is not None),
+                ("--resume", resume),
+                ("--profile", profile),
+                ("--stats-json", stats_json is not None),
+            )
+            if given
+        ]
+        if unsupported:
+            raise typer.BadParameter(
+                f"--state-file cannot be used with {', '.join(unsupported)}"
+            )
+        ad, new_f = open_incremental(filename, new_filename, backup_filename, write_txt)
+        args = process_args(ad) if callable(process_args) else process_args
+        run_incremental(ad, new_f, state_file, process_func, args, raw=raw, lazy=lazy)
+        return
+    f, new_f, backup_f = process_filenames(
+        filename, new_filename, backup_filename, delta_backup
+    )
+    if backup_f is not None and not delta_backup:
+        backup_file(f, backup_f, allow_hardlink=new_f == f)
 
     ad = ArchiverData(f)
-    seconds, nano = process_timestamp(ad.header.year, timestamp)
-    ad.process_and_write(new_f, write_txt, remove_after_ts, [seconds, nano])
+    args = process_args(ad) if callable(process_args) else process_args
+    stats = new_stats(profile, stats_json)
+    ad.process_and_write(
+        new_f,
+        write_txt,
+        process_func,
+        args,
+        raw=raw,
+        stats=stats,
+        lazy=lazy,
+        delta_filepath=backup_f if delta_backup else None,
+        checkpoint=new_checkpoint(new_f, checkpoint_interval, resume),
+    )
+    report_stats(stats, profile, stats_json)
+
+
+def timestamp_args(timestamp: str) -> Callable[[ArchiverData], list]:
+    """Get a function that converts a timestamp entered by a user into the seconds
+    and nanoseconds into the year of a PB file, see process_timestamp."""
+    return lambda ad: list(process_timestamp(ad.header.year, timestamp))
+
+
+def open_incremental(
+    f: Path, new_f: Path | None, backup_f: Path | None, write_txt: bool
+) -> tuple[ArchiverData, Path]:
+    """Validate the filenames of an incremental run and open the PB file.
+
+    Args:
+        f (Path): Path to PB file being processed.
+        new_f (Path | None): Destination path for processed PB file.
+        backup_f (Path | None): Path to backup file.
+        write_txt (bool): Whether a text file was requested.
+
+    Raises:
+        ValueError: Raised if new_f is missing or the same as f, or a backup or text
+        file is requested, none of which an incremental run supports.
+
+    Returns:
+        tuple[ArchiverData, Path]: The opened PB file and the new filename.
+    """
+    validate_pb_file(f, should_exist=True)
+    if new_f is None or new_f == f or is_stdio(new_f):
+        raise ValueError("An incremental run needs a different --new-filename")
+    if backup_f is not None or write_txt:
+        raise ValueError("An incremental run cannot make a backup or text file")
+    validate_pb_file(new_f)
+    return ArchiverData(f), new_f
+
+
+def run_incremental(
+    ad: ArchiverData,
+    new_f: Path,
+    state_file: Path,
+    process_func: Callable,
+    process_args: list,
+    raw: bool = False,
+    lazy: bool = False,
+):
+    """Process the samples appended since the last incremental run and report how
+    many were written."""
+    count = process_incremental(
+        ad, new_f, state_file, process_func, process_args, raw=raw, lazy=lazy
+    )
+    typer.echo(f"Appended {count} samples to {new_f}", err=True)
+
+
+def new_checkpoint(
+    new_f: Path, interval: float | None, resume: bool
+) -> Checkpoint | None:
+    """Create a Checkpoint if the user asked for checkpoints or to resume, otherwise
+    None."""
+    if interval is None and not resume:
+        return None
+    return Checkpoint(new_f, DEFAULT_INTERVAL if interval is None else interval, resume)
+
+
+def new_stats(profile: bool, stats_json: Path | None) -> ProcessStats | None:
+    """Create a ProcessStats object if the user asked for timings, otherwise None so
+    that no timing overhead is added."""
+    if profile or stats_json is not None:
+        return ProcessStats()
+    return None
+
+
+def report_stats(stats: ProcessStats | None, profile: bool, stats_json: Path | None):
+    """Print and/or save the statistics collected while processing a PB file.
+
+    Args:
+        stats (ProcessStats | None): Collected statistics, if any.
+        profile (bool): Print a summary table to stderr.
+        stats_json (Path | None): Path to write the statistics to as JSON.
+    """
+    if stats is None:
+        return
+    if profile:
+        typer.echo(stats.format_report(), err=True)
+    if stats_json is not None:
+        stats.write_json(stats_json)
 
 
 def validate_pb_file(filepath: Path, should_exist: bool = False):
-    """Validate a file ensuring it has a .pb extension and, optionally, exists.
+    """Validate a file ensuring it has a .pb extension, optionally followed by a
+    compression extension (.gz, .zst or .xz), and, optionally, exists. "-", meaning
+    standard input or output, is always valid.
 
     Args:
         filepath (Path): Filepath being validated.
@@ -128,17 +708,41 @@ def validate_pb_file(filepath: Path, should_exist: bool = False):
         FileNotFoundError: Raised if the file should exist, and doesn't.
     """
     filepath = Path(filepath)
-    if filepath.suffix != ".pb":
+    if is_stdio(filepath):
+        return
+    suffix = strip_compression_suffix(filepath).suffix
+    if suffix != ".pb":
+        raise ValueError(
+            f"Invalid file extension for '{filepath}': '{suffix}'. "
+            + "Expected '.pb', '.pb.gz', '.pb.zst' or '.pb.xz'."
+        )
+    if should_exist and not filepath.is_file():
+        raise FileNotFoundError(f"No such file: '{filepath}'")
+
+
+def validate_delta_file(filepath: Path, should_exist: bool = False):
+    """Validate a delta backup file ensuring it has a .pbdelta extension and,
+    optionally, exists.
+
+    Args:
+        filepath (Path): Filepath being validated.
+        should_exist (bool, optional): Requires file to exist. Defaults to False.
+
+    Raises:
+        ValueError: Raised if the filepath does not have a .pbdelta extension.
+        FileNotFoundError: Raised if the file should exist, and doesn't.
+    """
+    if filepath.suffix != DELTA_SUFFIX:
         raise ValueError(
             f"Invalid file extension for '{filepath}': '{filepath.suffix}'. "
-            + "Expected '.pb'."
+            + f"Expected '{DELTA_SUFFIX}'."
         )
     if should_exist and not filepath.is_file():
         raise FileNotFoundError(f"No such file: '{filepath}'")
 
 
 def process_filenames(
-    f: Path, new_f: Path | None, backup_f: Path | None
+    f: Path, new_f: Path | None, backup_f: Path | None, delta: bool = False
 ) -> tuple[Path, Path, Path | None]:
     """Process and validate filename, new filename and backup filenames provided by the
     user.
@@ -147,18 +751,30 @@ def process_filenames(
         f (Path): Path to PB file beign processed.
         new_f (Path | None): Destination path for processed PB file.
         backup_f (Path | None): Path to backup file, a copy of the original PB file.
+        delta (bool, optional): The backup is a delta backup, which has a .pbdelta
+        extension.
+
+    If f is "-", the PB file is read from standard input and, unless new_f is
+    given, written to standard output.
 
     Raises:
-        ValueError: Raised if backup filename is the same as any of the others.
+        ValueError: Raised if backup filename is the same as any of the others, or a
+        backup of standard input is requested.
 
     Returns:
         tuple[Path, Path, Path | None]: Tuple containing valid filenames for the
         original, new and backup PB files.
     """
     validate_pb_file(f, should_exist=True)
+    if is_stdio(f):
+        if backup_f is not None:
+            raise ValueError("Cannot make a backup of standard input")
+        new_f = new_f or f
+        validate_pb_file(new_f)
+        return f, new_f, None
 
     if backup_f is None and (new_f in (None, f)):
-        backup_f = f.with_stem(f"{f.stem}_backup")
+        backup_f = default_delta_filename(f) if delta else add_to_stem(f, "_backup")
         new_f = f
     elif new_f is None:
         new_f = f
@@ -168,7 +784,9 @@ def process_filenames(
             + " new-filename"
         )
     validate_pb_file(new_f)
-    if backup_f is not None:
+    if backup_f is not None and delta:
+        validate_delta_file(backup_f)
+    elif backup_f is not None:
         validate_pb_file(backup_f)
     return f, new_f, backup_f
 
@@ -0,0 +1,130 @@
+from datetime import datetime, timezone
+from os import PathLike
+
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.compression import is_stdio
+from aa_edit_data.rewrite import atomic_write
+from aa_edit_data.waveform import (
+    BATCH_SIZE,
+    WAVEFORM_DTYPES,
+    import_numpy,
+    waveform_batches,
+)
+
+DEFAULT_COMPRESSION_LEVEL = 4
+CHUNK_BYTES = 2**20
+# 1-D datasets of each sample, and their dtypes
+SAMPLE_DATASETS = {
+    "timestamp": "<f8",
+    "secondsintoyear": "<u4",
+    "nano": "<u4",
+    "severity": "<i4",
+    "status": "<i4",
+    "element_count": "<u4",
+}
+
+
+def write_hdf5(
+    filepath: PathLike,
+    h5_filepath: PathLike,
+    batch_size: int = BATCH_SIZE,
+    compression_level: int = DEFAULT_COMPRESSION_LEVEL,
+) -> int:
+    """Write the samples of a waveform PB file to an HDF5 file, reading and writing
+    them in batches so that memory use does not grow with the file.
+
+    The file has a 2-D (samples x elements) "val" dataset, and 1-D "timestamp"
+    (seconds since 1970 UTC), "secondsintoyear", "nano", "severity", "status" and
+    "element_count" datasets. Waveforms shorter than the longest are padded with
+    NaN or 0. Every dataset is chunked and gzip compressed, and the root group has
+    the pvname, type, year and elementCount of the header as attributes.
+
+    Args:
+        filepath (PathLike): Path to a VectorDouble, VectorFloat, VectorInt,
+        VectorShort or VectorEnum PB file, or "-" for standard input.
+        h5_filepath (PathLike): Path to write the HDF5 file to.
+        batch_size (int, optional): Number of samples in each batch, and in each
+        chunk of the 1-D datasets. Defaults to BATCH_SIZE.
+        compression_level (int, optional): gzip compression level, from 0 to 9.
+        Defaults to DEFAULT_COMPRESSION_LEVEL.
+
+    Raises:
+        ValueError: Raised if the PB file is not one of the types above, or
+        h5_filepath is standard output.
+
+    Returns:
+        int: Number of samples.
+    """
+    h5py = _import_h5py()
+    np = import_numpy()
+    if is_stdio(h5_filepath):
+        raise ValueError("Cannot write an HDF5 file to standard output")
+    ad = ArchiverData(filepath)
+    name = ad.proto_class.__name__
+    if name not in WAVEFORM_DTYPES:
+        raise ValueError(f"{name} samples cannot be written to HDF5")
+    dtype = WAVEFORM_DTYPES[name][0]
+    epoch = datetime(ad.header.year, 1, 1, tzinfo=timezone.utc).timestamp()
+    options = {"compression": "gzip", "compression_opts": compression_level}
+    count = 0
+    with atomic_write(h5_filepath) as tmp, h5py.File(tmp, "w") as f:
+        f.attrs["pvname"] = ad.header.pvname
+        f.attrs["type"] = ad.pv_type
+        f.attrs["year"] = ad.header.year
+        f.attrs["elementCount"] = ad.header.elementCount
+        datasets = {
+            key: f.create_dataset(
+                key,
+                (0,),
+                dtype=key_dtype,
+                maxshape=(None,),
+                chunks=(batch_size,),
+                **options,
+            )
+            for key, key_dtype in SAMPLE_DATASETS.items()
+        }
+        val = None
+        for batch in waveform_batches(ad, batch_size):
+            samples, elements = batch.val.shape
+            if val is None:
+                # Chunks of val hold whole waveforms, about CHUNK_BYTES of them
+                row_size = max(elements, 1) * batch.val.itemsize
+                rows = max(1, min(batch_size, CHUNK_BYTES // row_size))
+                val = f.create_dataset(
+                    "val",
+                    (0, elements),
+                    dtype=dtype,
+                    maxshape=(None, None),
+                    chunks=(rows, max(elements, 1)),
+                    fillvalue=np.nan if dtype.startswith("<f") else 0,
+                    **options,
+                )
+            end = count + samples
+            val.resize((end, max(val.shape[1], elements)))
+            val[count:end, :elements] = batch.val
+            columns = {
+                "timestamp": epoch + batch.secondsintoyear + batch.nano / 10**9,
+                "secondsintoyear": batch.secondsintoyear,
+                "nano": batch.nano,
+                "severity": batch.severity,
+                "status": batch.status,
+                "element_count": np.full(samples, elements),
+            }
+            for key, dataset in datasets.items():
+                dataset.resize((end,))
+                dataset[count:end] = columns[key]
+            count = end
+        if val is None:
+            f.create_dataset("val", (0, 0), dtype=dtype, maxshape=(None, None))
+    return count
+
+
+def _import_h5py():
+    try:
+        import h5py
+    except ImportError as e:
+        raise ImportError(
+            "Writing HDF5 files requires the h5py package. "
+            + "Install it with `pip install aa-edit-data[hdf5]`."
+        ) from e
+    return h5py
@@ -0,0 +1,125 @@
+import json
+import os
+from collections.abc import Callable
+from os import PathLike
+from pathlib import Path
+
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.compression import get_compression
+from aa_edit_data.iocontrol import open_file
+from aa_edit_data.rewrite import atomic_write
+
+
+def load_state(filepath: PathLike) -> dict | None:
+    """Load a state file, or return None if it does not exist."""
+    try:
+        with open(filepath) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_state(filepath: PathLike, state: dict):
+    """Save a state file atomically, so that it is never left half written."""
+    with atomic_write(filepath) as tmp, open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+        f.write("\n")
+
+
+def process_incremental(
+    ad: ArchiverData,
+    filepath: PathLike,
+    state_filepath: PathLike,
+    process_func: Callable,
+    process_args: list | None = None,
+    raw: bool = False,
+    lazy: bool = False,
+) -> int:
+    """Apply process_func to the samples appended to this PB file since the last run
+    with the same state file, and append the result to filepath. The state file holds
+    the input and output offsets reached and the state of process_func, which must
+    accept a `state` keyword argument.
+
+    Args:
+        ad (ArchiverData): The uncompressed PB file being processed, which may still be
+        growing.
+        filepath (PathLike): Path of the uncompressed PB file to append the result to.
+        It is created on the first run.
+        state_filepath (PathLike): Path of the JSON state file, created on the first
+        run.
+        process_func (Callable): Function taking an iterator of samples, and
+        process_args, and returning an iterator of samples.
+        process_args (list | None, optional): Extra arguments to process_func.
+        raw (bool, optional): Pass the samples to process_func as bytes.
+        lazy (bool, optional): Pass the samples to process_func as SampleViews.
+
+    Raises:
+        ValueError: Raised if the output is compressed, if the state file belongs to a
+        different run, or if the input or output were changed other than by appending.
+
+    Returns:
+        int: Number of samples appended to filepath.
+    """
+    filepath = Path(filepath)
+    if get_compression(filepath) is not None:
+        raise ValueError("Incremental output cannot be compressed")
+    identity = {
+        "input": str(ad.filepath.resolve()),
+        "output": str(filepath.resolve()),
+        "algorithm": process_func.__name__,
+        "args": process_args or [],
+    }
+    start, end = ad.get_sample_range()
+    state = load_state(state_filepath)
+    if state is None:
+        state = {**identity, "input_offset": start, "output_offset": 0, "state": {}}
+    else:
+        check_state(state, identity, ad.filepath, filepath, end)
+
+    samples = process_func(
+        ad.decode_lines(ad.get_lines(state["input_offset"], end), raw, lazy),
+        *(process_args or []),
+        state=state["state"],
+    )
+    count = 0
+    with open_file(filepath, "r+b" if state["output_offset"] else "wb") as f:
+        # Drop anything written by a run that stopped before saving its state
+        f.seek(state["output_offset"])
+        f.truncate()
+        if not state["output_offset"]:
+            f.write(ad.serialize(ad.header))
+        for sample in samples:
+            f.write(sample if raw else ad.serialize(sample))
+            count += 1
+        f.flush()
+        os.fsync(f.fileno())
+        state["output_offset"] = f.tell()
+    state["input_offset"] = end
+    save_state(state_filepath, state)
+    return count
+
+
+def check_state(
+    state: dict, identity: dict, input_filepath: Path, output_filepath: Path, end: int
+):
+    """Check that a state file belongs to this run and that neither file has been
+    changed other than by appending to it.
+
+    Raises:
+        ValueError: Raised if the state file cannot be used.
+    """
+    for key, value in identity.items():
+        if state.get(key) != value:
+            raise ValueError(
+                f"The state file was made with {key} {state.get(key)!r}, not {value!r}"
+            )
+    if end < state["input_offset"]:
+        raise ValueError(
+            f"{input_filepath} is smaller than when it was last processed, so may "
+            + "have been replaced. Delete the state file to start again."
+        )
+    if output_filepath.stat().st_size < state["output_offset"]:
+        raise ValueError(
+            f"{output_filepath} is smaller than when it was last written to. Delete "
+            + "the state file to start again."
+        )
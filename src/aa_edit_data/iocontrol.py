@@ -0,0 +1,197 @@
+import ctypes
+import io
+import os
+import platform
+import threading
+import time
+from os import PathLike
+from typing import BinaryIO
+
+MB = 10**6
+# Bytes written between flushes to disk when dropping written data from the page cache
+DROP_CHUNK_SIZE = 2**23
+# Seconds of transfer that may happen at once before the rate limit applies
+BURST = 0.25
+IOPRIO_WHO_PROCESS = 1
+IOPRIO_CLASS_SHIFT = 13
+IOPRIO_CLASS_IDLE = 3
+SYS_IOPRIO_SET = {
+    "x86_64": 251,
+    "i386": 289,
+    "i686": 289,
+    "aarch64": 30,
+    "armv7l": 314,
+    "ppc64le": 273,
+    "s390x": 282,
+}
+
+
+class RateLimiter:
+    def __init__(self, rate: float):
+        """Initialise a RateLimiter, which makes callers sleep so that no more than
+        rate bytes per second pass through it on average. It is shared by every file
+        and thread of the process.
+
+        Args:
+            rate (float): Maximum rate in bytes per second.
+        """
+        self.rate = rate
+        self._lock = threading.Lock()
+        # Time at which everything consumed so far would have been transferred
+        self._available = time.monotonic()
+
+    def consume(self, nbytes: int):
+        """Account for nbytes of I/O, sleeping if it would exceed the rate."""
+        with self._lock:
+            now = time.monotonic()
+            self._available = max(self._available, now - BURST) + nbytes / self.rate
+            delay = self._available - now - BURST
+        if delay > 0:
+            time.sleep(delay)
+
+
+class IOLimits:
+    def __init__(self):
+        """Initialise an IOLimits object, which holds the I/O limits that apply to
+        every PB file opened by this process."""
+        self.limiter: RateLimiter | None = None
+        self.drop_cache = False
+
+    @property
+    def active(self) -> bool:
+        return self.limiter is not None or self.drop_cache
+
+
+LIMITS = IOLimits()
+
+
+def configure_io(max_rate: float | None = None, drop_cache: bool = False):
+    """Set the I/O limits for every PB file opened from now on.
+
+    Args:
+        max_rate (float | None, optional): Maximum combined read and write rate in
+        MB/s. Defaults to no limit.
+        drop_cache (bool, optional): Advise the kernel that data is read
+        sequentially and drop it from the page cache once it has been processed, so
+        that a sweep over many files does not evict other processes' cached data.
+    """
+    LIMITS.limiter = RateLimiter(max_rate * MB) if max_rate else None
+    LIMITS.drop_cache = drop_cache
+
+
+def set_priority(nice: int | None = None, idle_io: bool = False):
+    """Lower the CPU and I/O priority of this process.
+
+    Args:
+        nice (int | None, optional): Amount to add to the niceness of this process.
+        The I/O priority of the default best-effort class follows the niceness.
+        idle_io (bool, optional): Only do I/O when no other process needs the disk.
+        Linux only.
+
+    Raises:
+        OSError: Raised if the I/O priority cannot be set.
+    """
+    if nice:
+        os.nice(nice)
+    if idle_io:
+        number = SYS_IOPRIO_SET.get(platform.machine())
+        if number is None or platform.system() != "Linux":
+            raise OSError(f"Cannot set the I/O priority on {platform.machine()}")
+        libc = ctypes.CDLL(None, use_errno=True)
+        ioprio = IOPRIO_CLASS_IDLE << IOPRIO_CLASS_SHIFT
+        if libc.syscall(number, IOPRIO_WHO_PROCESS, 0, ioprio) != 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"Cannot set the I/O priority: {os.strerror(errno)}")
+
+
+def open_file(filepath: PathLike, mode: str = "rb") -> BinaryIO:
+    """Open a file in binary mode, applying the I/O limits if any are set.
+
+    Args:
+        filepath (PathLike): Path to the file.
+        mode (str, optional): "rb", "wb", "ab" or "r+b". Defaults to "rb".
+
+    Returns:
+        BinaryIO: A buffered binary file object.
+    """
+    if not LIMITS.active:
+        return open(filepath, mode)  # type: ignore  # noqa: SIM115
+    raw = LimitedFile(filepath, mode.replace("b", ""), LIMITS)
+    if mode == "rb":
+        return io.BufferedReader(raw, buffer_size=2**20)  # type: ignore
+    if mode == "r+b":
+        return io.BufferedRandom(raw, buffer_size=2**20)  # type: ignore
+    return io.BufferedWriter(raw, buffer_size=2**20)  # type: ignore
+
+
+class LimitedFile(io.RawIOBase):
+    def __init__(self, filepath: PathLike, mode: str, limits: IOLimits):
+        """Initialise a LimitedFile, a raw file that applies a rate limit and page
+        cache advice to every read and write.
+
+        Args:
+            filepath (PathLike): Path to the file.
+            mode (str): Mode to open the file with, e.g. "r" or "w".
+            limits (IOLimits): The limits to apply.
+        """
+        self._file = io.FileIO(filepath, mode)
+        self._limits = limits
+        self._unsynced = 0
+        if limits.drop_cache and self._file.readable():
+            os.posix_fadvise(self._file.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+
+    def readable(self) -> bool:
+        return self._file.readable()
+
+    def writable(self) -> bool:
+        return self._file.writable()
+
+    def seekable(self) -> bool:
+        return True
+
+    def fileno(self) -> int:
+        return self._file.fileno()
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        return self._file.seek(offset, whence)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def truncate(self, size: int | None = None) -> int:
+        return self._file.truncate(size)
+
+    def readinto(self, buffer) -> int:
+        n = self._file.readinto(buffer) or 0
+        if self._limits.limiter is not None:
+            self._limits.limiter.consume(n)
+        if self._limits.drop_cache and n:
+            end = self._file.tell()
+            os.posix_fadvise(self.fileno(), end - n, n, os.POSIX_FADV_DONTNEED)
+        return n
+
+    def write(self, buffer) -> int:
+        n = self._file.write(buffer) or 0
+        if self._limits.limiter is not None:
+            self._limits.limiter.consume(n)
+        if self._limits.drop_cache:
+            self._unsynced += n
+            if self._unsynced >= DROP_CHUNK_SIZE:
+                self._drop_written()
+        return n
+
+    def _drop_written(self):
+        # Dirty pages cannot be dropped, so write them out first
+        os.fdatasync(self.fileno())
+        os.posix_fadvise(self.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        self._unsynced = 0
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            if self._limits.drop_cache and self._unsynced:
+                self._drop_written()
+        finally:
+            self._file.close()
+            super().close()
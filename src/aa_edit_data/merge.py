@@ -0,0 +1,101 @@
+import heapq
+from collections.abc import Callable, Generator, Iterable, Sequence
+from contextlib import ExitStack
+from os import PathLike
+from pathlib import Path
+
+from aa_edit_data.archiver_data import ArchiverData, Sample, SampleView
+from aa_edit_data.compression import is_stdio
+from aa_edit_data.rewrite import atomic_write
+from aa_edit_data.wire import wire_timestamp
+
+HEADER_FIELDS = ("pvname", "type", "year", "elementCount")
+
+
+def check_headers(ads: list[ArchiverData]):
+    """Check that PB files hold data of the same PV, type and year, so that their
+    samples can be merged.
+
+    Raises:
+        ValueError: Raised if a header does not match the first file's.
+    """
+    first = ads[0]
+    for ad in ads[1:]:
+        for field in HEADER_FIELDS:
+            expected = getattr(first.header, field)
+            value = getattr(ad.header, field)
+            if value != expected:
+                raise ValueError(
+                    f"{ad.filepath} has {field} {value!r} but {first.filepath} has "
+                    + f"{expected!r}"
+                )
+
+
+def sample_timestamp(sample: "Sample | SampleView") -> tuple[int, int]:
+    return sample.secondsintoyear, sample.nano
+
+
+def merge_samples(
+    ads: list[ArchiverData], raw: bool = False, drop_duplicates: bool = False
+) -> Generator:
+    """Merge the samples of PB files into one stream in timestamp order, reading
+    one sample of each file at a time. Each file must already be in order. Samples
+    with equal timestamps are yielded in the order of the files.
+
+    Args:
+        ads (list[ArchiverData]): The files to merge.
+        raw (bool, optional): Yield the samples as bytes, comparing timestamps read
+        from the wire format without decoding the samples. Otherwise yield
+        SampleViews.
+        drop_duplicates (bool, optional): Only yield the first sample with each
+        timestamp.
+
+    Yields:
+        bytes | SampleView: The merged samples.
+    """
+    if raw:
+        streams: list[Iterable] = [ad.get_samples_bytes() for ad in ads]
+        key: Callable = wire_timestamp
+    else:
+        streams = [ad.get_sample_views() for ad in ads]
+        key = sample_timestamp
+    previous = None
+    for timestamp, sample in heapq.merge(
+        *(((key(sample), sample) for sample in stream) for stream in streams),
+        key=lambda item: item[0],
+    ):
+        if drop_duplicates and timestamp == previous:
+            continue
+        previous = timestamp
+        yield sample
+
+
+def merge_files(
+    filepaths: Sequence[PathLike],
+    filepath: PathLike,
+    raw: bool = False,
+    drop_duplicates: bool = False,
+):
+    """Merge PB files of the same PV into one, see merge_samples. The header is
+    taken from the first file.
+
+    Args:
+        filepaths (Sequence[PathLike]): Paths to the PB files to merge. Duplicate
+        samples are kept from the earliest file in the list.
+        filepath (PathLike): Path to write the merged PB file to, or "-" for
+        standard output. It may be one of the files being merged.
+        raw (bool, optional): Compare timestamps without decoding samples.
+        drop_duplicates (bool, optional): Drop samples whose timestamp has already
+        been written.
+
+    Raises:
+        ValueError: Raised if the headers do not match.
+    """
+    ads = [ArchiverData(path) for path in filepaths]
+    check_headers(ads)
+    samples = merge_samples(ads, raw=raw, drop_duplicates=drop_duplicates)
+    with ExitStack() as stack:
+        pb_filepath = Path(filepath)
+        if not is_stdio(filepath):
+            pb_filepath = stack.enter_context(atomic_write(filepath))
+        ads[0].write_pb(pb_filepath, samples, raw=raw)
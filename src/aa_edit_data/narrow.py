@@ -0,0 +1,150 @@
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack
+from itertools import islice
+from os import PathLike
+from pathlib import Path
+
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.compression import is_stdio, open_pb_write
+from aa_edit_data.generated import EPICSEvent_pb2
+from aa_edit_data.rewrite import atomic_write
+from aa_edit_data.waveform import BATCH_SIZE, import_numpy
+from aa_edit_data.wire import (
+    I32,
+    I64,
+    LEN,
+    VAL,
+    encode_varint,
+    iter_fields,
+    read_varint,
+)
+
+NARROW_TYPES = {"SCALAR_DOUBLE": "SCALAR_FLOAT", "WAVEFORM_DOUBLE": "WAVEFORM_FLOAT"}
+# Bits of the mantissa of each dtype, and the unsigned integer of the same size
+MANTISSA = {"<f8": (52, "<u8"), "<f4": (23, "<u4")}
+
+
+def narrow_type(
+    filepath: PathLike,
+    new_filepath: PathLike,
+    mantissa_bits: int | None = None,
+    keep_double: bool = False,
+    batch_size: int = BATCH_SIZE,
+) -> int:
+    """Rewrite a SCALAR_DOUBLE or WAVEFORM_DOUBLE PB file as a SCALAR_FLOAT or
+    WAVEFORM_FLOAT file, rounding each value to the nearest float, and optionally
+    truncate the mantissa of each value, which makes the file compress better. The
+    values of each batch of samples are converted together with numpy, and the
+    other fields of each sample are copied unchanged.
+
+    Args:
+        filepath (PathLike): Path to the PB file, or "-" for standard input.
+        new_filepath (PathLike): Path to write the new PB file to, or "-" for
+        standard output. May be filepath.
+        mantissa_bits (int | None, optional): Number of bits of the mantissa to keep,
+        setting the rest to 0, of at most 23 for floats or 52 for doubles. Defaults
+        to keeping them all.
+        keep_double (bool, optional): Keep the values as doubles, only truncating
+        their mantissas. Defaults to False.
+        batch_size (int, optional): Number of samples converted at once. Defaults to
+        BATCH_SIZE.
+
+    Raises:
+        ValueError: Raised if the file is not SCALAR_DOUBLE or WAVEFORM_DOUBLE,
+        mantissa_bits is out of range, or a value is too large for a float.
+        new_filepath is then left untouched.
+
+    Returns:
+        int: Number of samples.
+    """
+    np = import_numpy()
+    ad = ArchiverData(filepath)
+    if ad.pv_type not in NARROW_TYPES:
+        raise ValueError(f"Cannot narrow {ad.pv_type} values, only doubles")
+    dtype = "<f8" if keep_double else "<f4"
+    bits, int_dtype = MANTISSA[dtype]
+    mask = None
+    if mantissa_bits is not None:
+        if not 1 <= mantissa_bits <= bits:
+            raise ValueError(f"Can keep 1 to {bits} mantissa bits, not {mantissa_bits}")
+        # Keeps the sign, the exponent and the top mantissa_bits of the mantissa
+        total = np.dtype(int_dtype).itemsize * 8
+        mask = np.array((1 << total) - (1 << (bits - mantissa_bits)), int_dtype)
+    header = type(ad.header)()
+    header.CopyFrom(ad.header)
+    if not keep_double:
+        new_type = EPICSEvent_pb2.PayloadType.Value(NARROW_TYPES[ad.pv_type])
+        header.type = new_type  # type: ignore
+    waveform = ad.pv_type.startswith("WAVEFORM")
+    count = 0
+    with ExitStack() as stack:
+        pb_filepath = Path(new_filepath)
+        if not is_stdio(new_filepath):
+            pb_filepath = stack.enter_context(atomic_write(new_filepath))
+        f = stack.enter_context(open_pb_write(pb_filepath))
+        f.write(ArchiverData.serialize(header))
+        for batch in _batches(ad.get_samples_bytes(), batch_size):
+            count += len(batch)
+            parts = [_split_doubles(ArchiverData.unescape_line(line)) for line in batch]
+            values = np.frombuffer(b"".join(part[1] for part in parts), dtype="<f8")
+            if not keep_double:
+                with np.errstate(over="ignore"):
+                    narrowed = values.astype(dtype)
+                overflow = np.isinf(narrowed) & np.isfinite(values)
+                if overflow.any():
+                    value = values[overflow][0]
+                    raise ValueError(f"{value} is too large for a float")
+                values = narrowed
+            if mask is not None:
+                values = values.view(int_dtype) & mask
+            f.writelines(_join_samples(parts, values.tobytes(), dtype, waveform))
+    return count
+
+
+def _batches(lines: Iterable[bytes], size: int) -> Iterator[list[bytes]]:
+    iterator = iter(lines)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _split_doubles(data: bytes) -> tuple[bytes, bytes, bytes]:
+    """Split a serialised sample of doubles into the fields before its val field,
+    the values as little-endian doubles, and the fields after it."""
+    before = []
+    after = []
+    values = []
+    for number, wire_type, start, end in iter_fields(data):
+        if number < VAL:
+            before.append(data[start:end])
+        elif number > VAL:
+            after.append(data[start:end])
+        elif wire_type == LEN:
+            _, pos = read_varint(data, start)
+            _, pos = read_varint(data, pos)
+            values.append(data[pos:end])
+        elif wire_type == I64:
+            # Tag of a scalar, or of an element that was not packed
+            values.append(data[start + 1 : end])
+    return b"".join(before), b"".join(values), b"".join(after)
+
+
+def _join_samples(
+    parts: list[tuple[bytes, bytes, bytes]], values: bytes, dtype: str, waveform: bool
+) -> Iterator[bytes]:
+    """Rebuild the lines of a batch of samples from their other fields and their
+    converted values."""
+    size = int(dtype[2:])
+    tag = bytes([VAL << 3 | (LEN if waveform else I64 if size == 8 else I32)])
+    pos = 0
+    for before, doubles, after in parts:
+        end = pos + len(doubles) // 8 * size
+        val = values[pos:end]
+        pos = end
+        if not waveform:
+            field = tag + val
+        elif val:
+            field = tag + encode_varint(len(val)) + val
+        else:
+            # Empty packed fields are not written
+            field = b""
+        yield ArchiverData.escape_line(before + field + after)
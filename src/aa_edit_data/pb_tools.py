@@ -1,55 +1,190 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from itertools import islice
 from pathlib import Path
 
 import typer
+from google.protobuf.message import DecodeError
 
 from aa_edit_data._version import __version__
 from aa_edit_data.archiver_data import ArchiverData
-from aa_edit_data.edit_data import validate_pb_file
+from aa_edit_data.benchmark import (
+    DEFAULT_REPEATS,
+    DEFAULT_TOLERANCE,
+    compare_to_baseline,
+    load_baseline,
+    run_benchmarks,
+    save_baseline,
+)
+from aa_edit_data.catalog import update_catalog
+from aa_edit_data.cold import COLD_SUFFIX, read_cold, write_cold
+from aa_edit_data.compression import STDIO_PATH, is_stdio, strip_compression_suffix
+from aa_edit_data.edit_data import (
+    DROP_CACHE_OPTION,
+    IDLE_IO_OPTION,
+    MAX_IO_RATE_OPTION,
+    NICE_OPTION,
+    PROFILE_OPTION,
+    STATS_JSON_OPTION,
+    limit_io,
+    new_stats,
+    report_stats,
+    validate_pb_file,
+)
+from aa_edit_data.hdf5 import DEFAULT_COMPRESSION_LEVEL, write_hdf5
+from aa_edit_data.validate import summarise, validate_files
+from aa_edit_data.waveform import BATCH_SIZE
 
 app = typer.Typer()
 
-FILENAME_ARGUMENT = typer.Argument(help="path/to/file.pb of PB file.")
-TXT_FILENAME_ARGUMENT = typer.Argument(None, help="path/to/file.txt of text file.")
+FILENAME_ARGUMENT = typer.Argument(
+    help="path/to/file.pb of PB file, or - for standard input."
+)
+TXT_FILENAME_ARGUMENT = typer.Argument(
+    None, help="path/to/file.txt of text file, or - for standard output."
+)
+H5_FILENAME_ARGUMENT = typer.Argument(None, help="path/to/file.h5 of HDF5 file.")
+COLD_FILENAME_ARGUMENT = typer.Argument(help="path/to/file.cold of cold file.")
+NEW_COLD_FILENAME_ARGUMENT = typer.Argument(
+    None, help="path/to/file.cold of cold file."
+)
+PB_FILENAME_ARGUMENT = typer.Argument(
+    None, help="path/to/file.pb of PB file, or - for standard output."
+)
+BASELINE_OPTION = typer.Option(
+    None, help="path/to/baseline.json to compare the results against"
+)
+FILENAMES_ARGUMENT = typer.Argument(
+    help="path/to/file.pb of each PB file, or - for standard input."
+)
+ROOT_ARGUMENT = typer.Argument(help="path/to/archive directory to search for PB files")
+DATABASE_OPTION = typer.Option(
+    Path("pb_catalog.db"), "--database", "-d", help="path/to/catalog.db SQLite database"
+)
+SAVE_BASELINE_OPTION = typer.Option(
+    None, "--save", help="path/to/baseline.json to save the results to"
+)
 
 
 @app.callback(invoke_without_command=True)
 def main(
     version: bool = typer.Option(False, "--version", help="Show version and exit"),
+    max_io_rate: float | None = MAX_IO_RATE_OPTION,
+    drop_cache: bool = DROP_CACHE_OPTION,
+    nice: int | None = NICE_OPTION,
+    idle_io: bool = IDLE_IO_OPTION,
 ):
     if version:
         typer.echo(f"Version: {__version__}")
         raise typer.Exit()
+    limit_io(max_io_rate, drop_cache, nice, idle_io)
+
+
+def default_output(filename: Path, suffix: str) -> Path:
+    """Get the default output path for a converted PB file: the same path with a new
+    extension, or standard output if the PB file is read from standard input."""
+    if is_stdio(filename):
+        return STDIO_PATH
+    return strip_compression_suffix(filename).with_suffix(suffix)
 
 
 @app.command()
 def pb_2_txt(
     filename: Path = FILENAME_ARGUMENT,
     txt_filename: Path | None = TXT_FILENAME_ARGUMENT,
+    profile: bool = PROFILE_OPTION,
+    stats_json: Path | None = STATS_JSON_OPTION,
 ):
     """Convert a PB file to a human-readable text file."""
-    txt_file = txt_filename if txt_filename else filename.with_suffix(".txt")
-    print(f"Writing {txt_file}")
+    txt_file = txt_filename if txt_filename else default_output(filename, ".txt")
+    # Keep standard output clean if the file is being written to it
+    typer.echo(f"Writing {txt_file}", err=is_stdio(txt_file))
     # Validation
     validate_pb_file(filename, should_exist=True)
     ad = ArchiverData(filename)
-    ad.write_txt(txt_file)
-    print("Write completed!")
+    stats = new_stats(profile, stats_json)
+    ad.write_txt(txt_file, stats=stats)
+    typer.echo("Write completed!", err=is_stdio(txt_file))
+    report_stats(stats, profile, stats_json)
 
 
 @app.command()
 def pb_2_csv(
     filename: Path = FILENAME_ARGUMENT,
     csv_filename: Path | None = TXT_FILENAME_ARGUMENT,
+    profile: bool = PROFILE_OPTION,
+    stats_json: Path | None = STATS_JSON_OPTION,
 ):
     """Convert a PB file to a csv file."""
-    csv_file = csv_filename if csv_filename else filename.with_suffix(".csv")
-    print(f"Writing {csv_file}")
+    csv_file = csv_filename if csv_filename else default_output(filename, ".csv")
+    # Keep standard output clean if the file is being written to it
+    typer.echo(f"Writing {csv_file}", err=is_stdio(csv_file))
     # Validation
     validate_pb_file(filename, should_exist=True)
     ad = ArchiverData(filename)
-    ad.write_csv(csv_file)
-    print("Write completed!")
+    stats = new_stats(profile, stats_json)
+    ad.write_csv(csv_file, stats=stats)
+    typer.echo("Write completed!", err=is_stdio(csv_file))
+    report_stats(stats, profile, stats_json)
+
+
+@app.command()
+def pb_2_hdf5(
+    filename: Path = FILENAME_ARGUMENT,
+    h5_filename: Path | None = H5_FILENAME_ARGUMENT,
+    batch_size: int = typer.Option(
+        BATCH_SIZE, help="Number of samples read and written at once", min=1
+    ),
+    compression_level: int = typer.Option(
+        DEFAULT_COMPRESSION_LEVEL, help="gzip compression level", min=0, max=9
+    ),
+):
+    """Convert a waveform PB file to an HDF5 file."""
+    if h5_filename is None:
+        if is_stdio(filename):
+            raise typer.BadParameter("An HDF5 filename is needed for standard input")
+        h5_filename = default_output(filename, ".h5")
+    typer.echo(f"Writing {h5_filename}", err=True)
+    validate_pb_file(filename, should_exist=True)
+    write_hdf5(filename, h5_filename, batch_size, compression_level)
+    typer.echo("Write completed!", err=True)
+
+
+@app.command()
+def pb_2_cold(
+    filename: Path = FILENAME_ARGUMENT,
+    cold_filename: Path | None = NEW_COLD_FILENAME_ARGUMENT,
+):
+    """Convert a PB file to a compact cold file for archiving, which cold-2-pb converts
+    back to the same PB file."""
+    if cold_filename is None:
+        if is_stdio(filename):
+            raise typer.BadParameter("A cold filename is needed for standard input")
+        cold_filename = default_output(filename, COLD_SUFFIX)
+    typer.echo(f"Writing {cold_filename}", err=True)
+    validate_pb_file(filename, should_exist=True)
+    count = write_cold(filename, cold_filename)
+    size = cold_filename.stat().st_size
+    if is_stdio(filename):
+        typer.echo(f"{count} samples in {size} bytes", err=True)
+    else:
+        ratio = filename.stat().st_size / size
+        typer.echo(f"{count} samples in {size} bytes, {ratio:.1f}x smaller", err=True)
+
+
+@app.command()
+def cold_2_pb(
+    cold_filename: Path = COLD_FILENAME_ARGUMENT,
+    filename: Path | None = PB_FILENAME_ARGUMENT,
+):
+    """Convert a cold file back to the PB file it was made from, checking that it is
+    identical."""
+    if filename is None:
+        filename = cold_filename.with_suffix(".pb")
+    validate_pb_file(filename)
+    typer.echo(f"Writing {filename}", err=True)
+    count = read_cold(cold_filename, filename)
+    typer.echo(f"{count} samples restored", err=True)
 
 
 @app.command()
@@ -63,3 +198,142 @@ def print_header(filename: Path = FILENAME_ARGUMENT, lines: int = 0, start: int
         print(f"DATE{' ' * 19}SECONDS{' ' * 5}NANO{' ' * 9}VAL")
         for sample in islice(ad.get_samples(), start, start + lines):
             print(ad.format_datastr(sample, ad.header.year).strip())
+
+
+@app.command()
+def tail(
+    filename: Path = FILENAME_ARGUMENT,
+    lines: int = typer.Option(10, "--lines", "-n", help="Number of samples", min=0),
+    follow: bool = typer.Option(
+        False, "--follow", "-f", help="Keep printing samples as they are appended"
+    ),
+    interval: float = typer.Option(
+        1.0, help="Seconds between checks for new samples when following", min=0
+    ),
+):
+    """Print the last samples of a PB file, reading it backwards from the end."""
+    validate_pb_file(filename, should_exist=True)
+    ad = ArchiverData(filename)
+    year = ad.header.year
+    print(f"Name: {ad.header.pvname}, Type: {ad.pv_type}, Year: {year}")
+    print(f"DATE{' ' * 19}SECONDS{' ' * 5}NANO{' ' * 9}VAL")
+    try:
+        samples = list(islice(ad.iter_reversed(), lines))[::-1]
+    except ValueError:
+        if follow:
+            raise
+        # Compressed files and standard input can only be read forwards
+        samples = deque(ad.get_samples(), maxlen=lines) if lines else []
+    for sample in samples:
+        print(ad.format_datastr(sample, year).strip())
+    if not follow:
+        return
+    try:
+        for sample in ad.follow(interval):
+            print(ad.format_datastr(sample, year).strip(), flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
+@app.command()
+def summary(filename: Path = FILENAME_ARGUMENT):
+    """Print the sample count, first and last timestamps, average rate and bytes per
+    sample of a PB file, without decoding every sample."""
+    validate_pb_file(filename, should_exist=True)
+    ad = ArchiverData(filename)
+    count, first, last = ad.scan_samples()
+    year = ad.header.year
+    print(f"Name: {ad.header.pvname}, Type: {ad.pv_type}, Year: {year}")
+    print(f"Samples: {count}")
+    if first is None or last is None:
+        return
+    start = ad.get_sample_datetime(year, first)
+    end = ad.get_sample_datetime(year, last)
+    duration = (end - start).total_seconds()
+    print(f"First: {start}")
+    print(f"Last: {end}")
+    if count > 1 and duration > 0:
+        print(f"Average rate: {(count - 1) / duration:.6g} Hz")
+    if not is_stdio(filename):
+        print(f"Bytes per sample: {filename.stat().st_size / count:.1f}")
+
+
+@app.command()
+def catalog(root: Path = ROOT_ARGUMENT, database: Path = DATABASE_OPTION):
+    """Record the header, sample count, first and last timestamps, size and
+    modification time of every PB file under a directory in a SQLite database. Only
+    new and changed files are read when the catalog is refreshed."""
+    if not root.is_dir():
+        raise NotADirectoryError(f"No such directory: '{root}'")
+    changes = update_catalog(database, root)
+    for filepath in changes["failed"]:
+        typer.echo(f"Could not read {filepath}", err=True)
+    print(
+        ", ".join(f"{len(files)} {change}" for change, files in changes.items())
+        + f" in {database}"
+    )
+
+
+@app.command()
+def validate(
+    filenames: list[Path] = FILENAMES_ARGUMENT,
+    processes: int | None = typer.Option(
+        None, help="Number of processes. Defaults to the number of CPUs", min=1
+    ),
+    max_problems: int = typer.Option(
+        20, help="Number of problems to print for each file", min=0
+    ),
+):
+    """Check PB files for undecodable lines, bad escape sequences, timestamps that are
+    out of order, duplicated or outside the file's year, and waveforms whose length
+    does not match the header. Exits with status 1 if there are any problems."""
+    for filename in filenames:
+        validate_pb_file(filename, should_exist=True)
+    failed = False
+    with ProcessPoolExecutor(processes) as executor:
+        for filename, result in validate_files(filenames, executor):
+            if isinstance(result, DecodeError):
+                print(f"{filename}: the header cannot be decoded: {result}")
+                failed = True
+                continue
+            count, problems = result
+            for problem in problems[:max_problems]:
+                print(f"{filename}:{problem.line}: {problem.kind}: {problem.message}")
+            if len(problems) > max_problems:
+                print(f"{filename}: ... {len(problems) - max_problems} more")
+            result = f"problems: {summarise(problems)}" if problems else "OK"
+            print(f"{filename}: {count} samples, {result}")
+            failed = failed or bool(problems)
+    if failed:
+        raise typer.Exit(1)
+
+
+@app.command()
+def benchmark(
+    baseline: Path | None = BASELINE_OPTION,
+    save: Path | None = SAVE_BASELINE_OPTION,
+    tolerance: float = typer.Option(
+        DEFAULT_TOLERANCE, help="Allowed fractional drop in throughput", min=0, max=1
+    ),
+    samples: int = typer.Option(100000, help="Number of samples to process", min=1),
+    repeats: int = typer.Option(
+        DEFAULT_REPEATS, help="Number of runs of each benchmark", min=1
+    ),
+):
+    """Measure the throughput of the key processing paths and, optionally, fail if
+    any has regressed compared to a baseline."""
+    results = run_benchmarks(samples=samples, repeats=repeats)
+    print(f"{'BENCHMARK':<20}{'SAMPLES/S':>14}{'RELATIVE':>12}")
+    for name, result in results["benchmarks"].items():
+        print(
+            f"{name:<20}{result['samples_per_second']:>14.0f}"
+            f"{result['relative']:>12.4f}"
+        )
+    if save is not None:
+        save_baseline(results, save)
+    if baseline is not None:
+        regressions = compare_to_baseline(results, load_baseline(baseline), tolerance)
+        for regression in regressions:
+            typer.echo(f"REGRESSION {regression}", err=True)
+        if regressions:
+            raise typer.Exit(1)
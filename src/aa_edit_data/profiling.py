@@ -0,0 +1,172 @@
+import json
+import resource
+import sys
+import time
+from collections.abc import Generator, Iterable, Iterator
+from itertools import islice
+from os import PathLike
+from typing import TypeVar
+
+T = TypeVar("T")
+
+STAGES = ("read", "unescape", "decode", "algorithm", "encode", "write")
+# Number of samples timed together. Timing each sample on its own would take longer
+# than most stages do.
+TIMED_BATCH_SIZE = 1024
+
+
+class ProcessStats:
+    def __init__(self):
+        """Initialise a ProcessStats object, which collects wall and CPU time for each
+        stage of an ArchiverData pipeline along with sample and byte counts.
+
+        Time is attributed exclusively: while a stage pulls from the stage before it,
+        the clock is charged to the earlier stage, so the stage totals add up to the
+        time spent in the pipeline.
+        """
+        self.wall: dict[str, float] = dict.fromkeys(STAGES, 0.0)
+        self.cpu: dict[str, float] = dict.fromkeys(STAGES, 0.0)
+        self.samples_in = 0
+        self.samples_out = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.total_wall = 0.0
+        self.total_cpu = 0.0
+        self.peak_rss = 0
+        self.metadata: dict = {}
+        self._stack: list[str] = []
+        self._mark_wall = 0.0
+        self._mark_cpu = 0.0
+        self._start_wall = 0.0
+        self._start_cpu = 0.0
+
+    def start(self):
+        """Start the overall clock."""
+        self._start_wall = time.perf_counter()
+        self._start_cpu = time.process_time()
+
+    def finish(self):
+        """Stop the overall clock and record the peak resident set size."""
+        self.total_wall = time.perf_counter() - self._start_wall
+        self.total_cpu = time.process_time() - self._start_cpu
+        self.peak_rss = get_peak_rss()
+
+    def enter(self, stage: str):
+        """Charge the time since the last switch to the current stage, then make
+        `stage` the current stage."""
+        self._switch()
+        self._stack.append(stage)
+
+    def exit(self):
+        """Charge the time since the last switch to the current stage, then return to
+        the stage that was active before it."""
+        self._switch()
+        self._stack.pop()
+
+    def _switch(self):
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        if self._stack:
+            stage = self._stack[-1]
+            self.wall[stage] += wall - self._mark_wall
+            self.cpu[stage] += cpu - self._mark_cpu
+        self._mark_wall = wall
+        self._mark_cpu = cpu
+
+    def timed(
+        self, iterable: Iterable[T], stage: str, batch_size: int = TIMED_BATCH_SIZE
+    ) -> Generator[T]:
+        """Wrap an iterable so that the time taken to produce its items is charged to
+        `stage`. Items are produced in batches, so that the clock is only read once
+        for each batch.
+
+        Args:
+            iterable (Iterable): Iterable to wrap.
+            stage (str): Name of the stage, one of STAGES.
+            batch_size (int, optional): Number of items produced at once. Defaults to
+            TIMED_BATCH_SIZE.
+
+        Yields:
+            Items of the wrapped iterable.
+        """
+        iterator = iter(iterable)
+        while batch := self.timed_batch(iterator, stage, batch_size):
+            yield from batch
+
+    def timed_batch(
+        self, iterator: Iterator[T], stage: str, batch_size: int = TIMED_BATCH_SIZE
+    ) -> list[T]:
+        """Take the next batch of items from an iterator, charging the time taken to
+        `stage`.
+
+        Returns:
+            list: Up to batch_size items, or an empty list if the iterator is
+            exhausted.
+        """
+        self.enter(stage)
+        try:
+            return list(islice(iterator, batch_size))
+        finally:
+            self.exit()
+
+    def count_in(self, lines: Iterable[bytes]) -> Generator[bytes]:
+        """Count the samples and bytes read from a PB file."""
+        for line in lines:
+            self.samples_in += 1
+            self.bytes_in += len(line)
+            yield line
+
+    @property
+    def reduction_ratio(self) -> float | None:
+        """Number of input samples for every output sample."""
+        if not self.samples_out:
+            return None
+        return self.samples_in / self.samples_out
+
+    def to_dict(self) -> dict:
+        throughput = self.samples_in / self.total_wall if self.total_wall else None
+        return {
+            **self.metadata,
+            "stages": {
+                stage: {"wall": self.wall[stage], "cpu": self.cpu[stage]}
+                for stage in STAGES
+            },
+            "total_wall": self.total_wall,
+            "total_cpu": self.total_cpu,
+            "samples_in": self.samples_in,
+            "samples_out": self.samples_out,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "reduction_ratio": self.reduction_ratio,
+            "samples_per_second": throughput,
+            "peak_rss": self.peak_rss,
+        }
+
+    def write_json(self, filepath: PathLike):
+        with open(filepath, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+            f.write("\n")
+
+    def format_report(self) -> str:
+        """Get a human readable table of the collected statistics."""
+        lines = [f"{'STAGE':<12}{'WALL (s)':>12}{'CPU (s)':>12}"]
+        for stage in STAGES:
+            lines.append(
+                f"{stage:<12}{self.wall[stage]:>12.3f}{self.cpu[stage]:>12.3f}"
+            )
+        lines.append(f"{'total':<12}{self.total_wall:>12.3f}{self.total_cpu:>12.3f}")
+        ratio = self.reduction_ratio
+        lines.append(
+            f"Samples: {self.samples_in} in, {self.samples_out} out"
+            + (f" (reduction ratio {ratio:.2f})" if ratio is not None else "")
+        )
+        lines.append(f"Bytes: {self.bytes_in} in, {self.bytes_out} out")
+        lines.append(f"Peak RSS: {self.peak_rss / 2**20:.1f} MiB")
+        return "\n".join(lines)
+
+
+def get_peak_rss() -> int:
+    """Get the peak resident set size of this process in bytes."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in kilobytes on Linux but bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
@@ -0,0 +1,149 @@
+import errno
+import os
+import secrets
+import shutil
+from collections.abc import Generator
+from contextlib import contextmanager
+from os import PathLike
+from pathlib import Path
+
+# ioctl request number of FICLONE from linux/fs.h
+FICLONE = 0x40049409
+COPY_CHUNK_SIZE = 2**30
+
+
+def temp_path(filepath: PathLike) -> Path:
+    """Get an unused hidden path in the same directory as filepath, so that it can be
+    moved onto filepath with os.replace. The extensions of filepath are kept, e.g.
+    RAW:2025.pb.gz becomes .3f9c1a2b.RAW:2025.pb.gz."""
+    filepath = Path(filepath)
+    while True:
+        path = filepath.with_name(f".{secrets.token_hex(4)}.{filepath.name}")
+        if not path.exists():
+            return path
+
+
+@contextmanager
+def atomic_write(filepath: PathLike) -> Generator[Path]:
+    """Context manager that gives a temporary path to write to in place of filepath.
+    When the block exits without an error, the temporary file is flushed to disk and
+    moved onto filepath in one step, so readers see either the old file or the
+    complete new one. If the block raises, the temporary file is removed and filepath
+    is left untouched.
+
+    Args:
+        filepath (PathLike): Path of the file to write.
+
+    Yields:
+        Path: Temporary path in the same directory as filepath.
+    """
+    filepath = Path(filepath)
+    tmp = temp_path(filepath)
+    try:
+        yield tmp
+        if filepath.exists():
+            shutil.copymode(filepath, tmp)
+        fsync_path(tmp)
+        os.replace(tmp, filepath)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    fsync_path(filepath.parent)
+
+
+def fsync_path(path: PathLike):
+    """Flush a file or directory to disk."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def backup_file(src: PathLike, dst: PathLike, allow_hardlink: bool = False) -> str:
+    """Copy src to dst as cheaply as the filesystem allows. In order, try:
+    a reflink, which shares blocks copy-on-write; a hardlink, if allowed; an in-kernel
+    copy_file_range; then a plain copy. dst is replaced atomically, and is left
+    untouched if the copy fails.
+
+    A hardlink is only a safe backup if src is never modified in place afterwards,
+    e.g. when src is about to be replaced with atomic_write.
+
+    Args:
+        src (PathLike): File to back up.
+        dst (PathLike): Path of the backup.
+        allow_hardlink (bool, optional): Allow dst to be a hardlink to src.
+
+    Returns:
+        str: The method used, "reflink", "hardlink", "copy_file_range" or "copy".
+    """
+    dst = Path(dst)
+    tmp = temp_path(dst)
+    try:
+        method = _copy(Path(src), tmp, allow_hardlink)
+        if method != "hardlink":
+            fsync_path(tmp)
+        os.replace(tmp, dst)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    fsync_path(dst.parent)
+    return method
+
+
+def _copy(src: Path, dst: Path, allow_hardlink: bool) -> str:
+    if _reflink(src, dst):
+        return "reflink"
+    if allow_hardlink:
+        try:
+            os.link(src, dst)
+            return "hardlink"
+        except OSError:
+            pass
+    if _copy_file_range(src, dst):
+        shutil.copymode(src, dst)
+        return "copy_file_range"
+    shutil.copy(src, dst)
+    return "copy"
+
+
+def _reflink(src: Path, dst: Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    with open(src, "rb") as f_src, open(dst, "wb") as f_dst:
+        try:
+            fcntl.ioctl(f_dst.fileno(), FICLONE, f_src.fileno())
+        except OSError:
+            ok = False
+        else:
+            ok = True
+    if not ok:
+        dst.unlink()
+    else:
+        shutil.copymode(src, dst)
+    return ok
+
+
+def _copy_file_range(src: Path, dst: Path) -> bool:
+    if not hasattr(os, "copy_file_range"):
+        return False
+    with open(src, "rb") as f_src, open(dst, "wb") as f_dst:
+        try:
+            while os.copy_file_range(f_src.fileno(), f_dst.fileno(), COPY_CHUNK_SIZE):
+                pass
+        except OSError as e:
+            if e.errno not in (
+                errno.EXDEV,
+                errno.ENOSYS,
+                errno.EINVAL,
+                errno.EOPNOTSUPP,
+            ):
+                raise
+            ok = False
+        else:
+            ok = True
+    if not ok:
+        dst.unlink()
+    return ok
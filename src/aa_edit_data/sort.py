@@ -0,0 +1,132 @@
+import heapq
+import itertools
+import tempfile
+from collections.abc import Iterable, Iterator
+from contextlib import ExitStack
+from os import PathLike
+from pathlib import Path
+
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.compression import is_stdio
+from aa_edit_data.iocontrol import open_file
+from aa_edit_data.rewrite import atomic_write
+from aa_edit_data.wire import wire_timestamp
+
+DEFAULT_MEMORY = 256
+MB = 2**20
+# Approximate bytes of memory used by each line held in a run, beyond its length
+LINE_OVERHEAD = 100
+# Maximum number of runs merged at once, which limits the number of open files
+MERGE_FAN_IN = 64
+
+
+def sort_file(
+    filepath: PathLike,
+    new_filepath: PathLike,
+    memory: float = DEFAULT_MEMORY,
+    temp_dir: PathLike | None = None,
+) -> tuple[int, int, int]:
+    """Sort the samples of a PB file by (secondsintoyear, nano) with an external merge
+    sort, so that files far larger than memory can be sorted. Samples are read as raw
+    lines and compared by their wire-level timestamps. Lines are collected until the
+    memory budget is reached, sorted and spilled to a run file, and the runs are
+    then merged. The sort is stable, so samples with equal timestamps keep their
+    order. Lines whose timestamp cannot be decoded are kept unchanged after the
+    sorted samples, in the order they were read, followed by a partly written last
+    line, which is kept unchanged, without a newline, so that it is still seen as
+    partly written.
+
+    Args:
+        filepath (PathLike): Path to the PB file to sort, or "-" for standard input.
+        new_filepath (PathLike): Path to write the sorted PB file to, or "-" for
+        standard output. May be filepath.
+        memory (float, optional): Memory budget for the samples held at once, in
+        MiB. Defaults to DEFAULT_MEMORY.
+        temp_dir (PathLike | None, optional): Directory for the run files. Defaults
+        to the system's temporary directory.
+
+    Returns:
+        tuple[int, int, int]: Number of samples sorted, number of those that were
+        earlier than the sample before them, and number of lines kept unchanged at
+        the end because they could not be decoded or are a partly written last line.
+    """
+    ad = ArchiverData(filepath)
+    budget = memory * MB
+    count = out_of_order = unsortable = 0
+    previous = (0, 0)
+    with ExitStack() as stack:
+        runs_dir = Path(stack.enter_context(tempfile.TemporaryDirectory(dir=temp_dir)))
+        # Undecodable lines are set aside on disk, so that they do not count
+        # against the memory budget
+        undecodable_path = runs_dir / "undecodable"
+        f_undecodable = stack.enter_context(open_file(undecodable_path, "wb"))
+        runs: list[Path] = []
+        lines: list[bytes] = []
+        size = 0
+        partial = b""
+        for line in ad.get_samples_bytes():
+            if not line.endswith(b"\n"):
+                partial = line
+                unsortable += 1
+                continue
+            try:
+                timestamp = wire_timestamp(line)
+            except ValueError:
+                f_undecodable.write(line)
+                unsortable += 1
+                continue
+            count += 1
+            if timestamp < previous:
+                out_of_order += 1
+            previous = timestamp
+            lines.append(line)
+            size += len(line) + LINE_OVERHEAD
+            if size >= budget:
+                runs.append(_write_run(runs_dir / f"{len(runs)}.run", lines))
+                lines = []
+                size = 0
+        if not runs:
+            lines.sort(key=wire_timestamp)
+        elif lines:
+            runs.append(_write_run(runs_dir / f"{len(runs)}.run", lines))
+        # Merge the runs in consecutive groups, keeping the sort stable
+        while len(runs) > MERGE_FAN_IN:
+            runs = [
+                _merge_to_run(
+                    runs_dir / f"{len(runs)}_{i}.run", runs[i : i + MERGE_FAN_IN]
+                )
+                for i in range(0, len(runs), MERGE_FAN_IN)
+            ]
+
+        pb_filepath = Path(new_filepath)
+        if not is_stdio(new_filepath):
+            pb_filepath = stack.enter_context(atomic_write(new_filepath))
+        with ExitStack() as run_files:
+            files = [run_files.enter_context(open_file(run)) for run in runs]
+            samples = _merge_lines(files) if runs else iter(lines)
+            f_undecodable.close()
+            leftovers = run_files.enter_context(open_file(undecodable_path))
+            ad.write_pb(pb_filepath, itertools.chain(samples, leftovers, [partial]))
+    return count, out_of_order, unsortable
+
+
+def _merge_lines(runs: Iterable[Iterable[bytes]]) -> Iterator[bytes]:
+    return heapq.merge(*runs, key=wire_timestamp)
+
+
+def _write_run(filepath: Path, lines: list[bytes]) -> Path:
+    """Sort lines and write them to a run file."""
+    lines.sort(key=wire_timestamp)
+    with open_file(filepath, "wb") as f:
+        f.writelines(lines)
+    return filepath
+
+
+def _merge_to_run(filepath: Path, runs: list[Path]) -> Path:
+    """Merge run files into one, deleting them."""
+    with ExitStack() as stack, open_file(filepath, "wb") as f_out:
+        files = [stack.enter_context(open_file(run)) for run in runs]
+        f_out.writelines(_merge_lines(files))
+    for run in runs:
+        run.unlink()
+    return filepath
@@ -0,0 +1,217 @@
+from bisect import bisect_right
+from contextlib import ExitStack
+from datetime import datetime, timedelta
+from os import PathLike
+from pathlib import Path
+from typing import BinaryIO
+
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.compression import CHUNK_SIZE, add_to_stem, is_stdio, open_pb_write
+from aa_edit_data.iocontrol import open_file
+from aa_edit_data.rewrite import atomic_write
+from aa_edit_data.wire import wire_seconds
+
+_NO_SAMPLES = "{} has a partly written line but no complete samples to split"
+PARTITIONS = {
+    "month": "%m",
+    "day": "%m_%d",
+    "hour": "%m_%d_%H",
+}
+
+
+def partition_starts(year: int, by: str) -> list[tuple[int, str]]:
+    """Get the partitions of a year.
+
+    Args:
+        year (int): The year of a PB file.
+        by (str): "month", "day" or "hour".
+
+    Returns:
+        list[tuple[int, str]]: The secondsintoyear at which each partition starts, and
+        the suffix of its file name, e.g. (5097600, "_03") for March when by is
+        "month". Suffixes follow the archiver's partition names, e.g. PV:2025_03.pb.
+    """
+    if by not in PARTITIONS:
+        raise ValueError(f"Cannot split by {by!r}, only by {', '.join(PARTITIONS)}")
+    start = datetime(year, 1, 1)
+    starts = []
+    current = start
+    while current.year == year:
+        seconds = int((current - start).total_seconds())
+        starts.append((seconds, "_" + current.strftime(PARTITIONS[by])))
+        if by == "month":
+            current = current.replace(month=current.month % 12 + 1)
+            if current.month == 1:
+                break
+        else:
+            current += timedelta(days=1) if by == "day" else timedelta(hours=1)
+    return starts
+
+
+def find_offset(f: BinaryIO, start: int, end: int, seconds: int) -> int:
+    """Binary search an uncompressed PB file in timestamp order for the first sample
+    at or after a time.
+
+    Args:
+        f (BinaryIO): The PB file.
+        start (int): Offset of a line at or before the one sought.
+        end (int): Offset of a line, or the end of the samples, after the one sought.
+        seconds (int): The secondsintoyear sought.
+
+    Returns:
+        int: The offset of the first line in [start, end) whose secondsintoyear is at
+        least seconds, or end if there is none.
+    """
+    while start < end:
+        mid = (start + end) // 2
+        # Move to the first line starting at or after mid
+        f.seek(mid - 1)
+        f.readline()
+        pos = f.tell()
+        if pos >= end:
+            break
+        line = f.readline()
+        if wire_seconds(line) < seconds:
+            start = pos + len(line)
+        else:
+            end = pos
+    # Few lines are left between start and end, so search them in turn
+    f.seek(start)
+    while start < end:
+        line = f.readline()
+        if wire_seconds(line) >= seconds:
+            return start
+        start += len(line)
+    return end
+
+
+def split_file(
+    filepath: PathLike, by: str, directory: PathLike | None = None, force: bool = False
+) -> list[Path]:
+    """Split a PB file into one file per month, day or hour in a single pass. Each
+    file has the original header and is named after the original and its
+    partition, e.g. RAW:2025.pb is split by month into RAW:2025_01.pb,
+    RAW:2025_02.pb, ... Partitions without samples are not written. The samples must
+    be in timestamp order. A partly written last line is kept unchanged at the end
+    of the last partition.
+
+    The partition boundaries of uncompressed files are found by binary search and
+    the samples between them copied, checking that each belongs to its partition.
+    Compressed files are streamed.
+
+    Args:
+        filepath (PathLike): Path to the PB file to split.
+        by (str): "month", "day" or "hour".
+        directory (PathLike | None, optional): Directory to write the files to,
+        which is created if needed. Defaults to the directory of filepath.
+        force (bool, optional): Overwrite partition files that already exist.
+
+    Raises:
+        ValueError: Raised if filepath is standard input, if its samples are found
+        to be out of order, or if it has a partly written line but no complete
+        samples. The partition being written is then discarded.
+        FileExistsError: Raised, before anything is written, if a file of any
+        partition of the year already exists and force is False.
+
+    Returns:
+        list[Path]: Paths of the files written.
+    """
+    if is_stdio(filepath):
+        raise ValueError("Cannot split standard input")
+    ad = ArchiverData(filepath)
+    starts = partition_starts(ad.header.year, by)
+    directory = Path(directory) if directory is not None else ad.filepath.parent
+    names = [directory / add_to_stem(ad.filepath, name).name for _, name in starts]
+    existing = [path for path in names if path.exists()]
+    if existing and not force:
+        raise FileExistsError(
+            f"Partition file '{existing[0]}' already exists, use --force to "
+            + "overwrite it"
+        )
+    directory.mkdir(parents=True, exist_ok=True)
+    try:
+        start, end = ad.get_sample_range()
+    except ValueError:
+        return _split_stream(ad, [seconds for seconds, _ in starts], names)
+
+    written = []
+    bounds = [seconds for seconds, _ in starts[1:]] + [None]
+    size = ad.filepath.stat().st_size
+    if size > end and start == end:
+        raise ValueError(_NO_SAMPLES.format(ad.filepath))
+    with open_file(ad.filepath, "rb") as f:
+        offsets = [start]
+        for seconds, _ in starts[1:]:
+            offsets.append(find_offset(f, offsets[-1], end, seconds))
+        offsets.append(end)
+        for (low, _), high, path, range_start, range_end in zip(
+            starts, bounds, names, offsets[:-1], offsets[1:], strict=True
+        ):
+            if range_start == range_end:
+                continue
+            with atomic_write(path) as tmp, open_pb_write(tmp) as f_out:
+                f_out.write(ad.serialize(ad.header))
+                if not _copy_partition(f, f_out, range_start, range_end, low, high):
+                    raise ValueError(
+                        f"{ad.filepath} is not in timestamp order, so cannot be split"
+                    )
+                if range_end == end and size > end:
+                    # Keep the partly written last line, as _split_stream does
+                    f_out.write(f.read(size - end))
+            written.append(path)
+    return written
+
+
+def _split_stream(ad: ArchiverData, starts: list[int], names: list[Path]) -> list[Path]:
+    """Split a PB file that cannot be searched by reading it through once."""
+    written: list[Path] = []
+    current = -1
+    with ExitStack() as stack:
+        f_out = None
+        for line in ad.get_samples_bytes():
+            if not line.endswith(b"\n"):
+                # Keep the partly written last line in the last partition
+                if f_out is None:
+                    raise ValueError(_NO_SAMPLES.format(ad.filepath))
+                f_out.write(line)
+                break
+            index = bisect_right(starts, wire_seconds(line)) - 1
+            if index != current:
+                if index < current:
+                    raise ValueError(
+                        f"{ad.filepath} is not in timestamp order, so cannot be split"
+                    )
+                stack.close()
+                current = index
+                tmp = stack.enter_context(atomic_write(names[index]))
+                f_out = stack.enter_context(open_pb_write(tmp))
+                f_out.write(ad.serialize(ad.header))
+                written.append(names[index])
+            f_out.write(line)  # type: ignore
+    return written
+
+
+def _copy_partition(
+    f_in: BinaryIO, f_out: BinaryIO, start: int, end: int, low: int, high: int | None
+) -> bool:
+    """Copy the lines of f_in between two offsets, which must be at the start of
+    lines, to f_out, checking that the secondsintoyear of each is in [low, high).
+
+    Returns:
+        bool: Whether every line is in the partition. Copying stops at the first
+        chunk with a line that is not.
+    """
+    f_in.seek(start)
+    partial = b""
+    while start < end:
+        chunk = f_in.read(min(CHUNK_SIZE, end - start))
+        if not chunk:
+            raise ValueError("File ended before the end of the range")
+        *lines, partial = (partial + chunk).split(b"\n")
+        for line in lines:
+            seconds = wire_seconds(line)
+            if seconds < low or (high is not None and seconds >= high):
+                return False
+        f_out.write(chunk)
+        start += len(chunk)
+    return True
@@ -0,0 +1,296 @@
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Executor, Future
+from datetime import datetime
+from os import PathLike
+from typing import NamedTuple
+
+from google.protobuf.message import DecodeError
+
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.compression import is_stdio
+from aa_edit_data.generated import EPICSEvent_pb2
+from aa_edit_data.iocontrol import open_file
+
+# Bytes of a PB file checked by each task
+RANGE_SIZE = 2**26
+ESCAPED = (b"\x01", b"\x02", b"\x03")
+
+
+class Problem(NamedTuple):
+    line: int
+    offset: int
+    kind: str
+    message: str
+
+
+def split_ranges(
+    filepath: PathLike, start: int, end: int, size: int
+) -> list[tuple[int, int]]:
+    """Split part of a file into ranges of about size bytes that each start and end
+    at the start of a line.
+
+    Args:
+        filepath (PathLike): Path to the file.
+        start (int): Offset of the start of a line to start at.
+        end (int): Offset of the start of a line, or the end of the file, to end at.
+        size (int): Number of bytes in each range.
+
+    Returns:
+        list[tuple[int, int]]: The start and end offsets of each range.
+    """
+    offsets = [start]
+    with open_file(filepath, "rb") as f:
+        for pos in range(start + size, end, size):
+            if pos <= offsets[-1]:
+                continue
+            f.seek(pos - 1)
+            f.readline()
+            offsets.append(min(f.tell(), end))
+    if offsets[-1] != end:
+        offsets.append(end)
+    return [(a, b) for a, b in zip(offsets[:-1], offsets[1:], strict=True) if a < b]
+
+
+def find_bad_escape(line: bytes) -> str | None:
+    """Check that a line of a PB file only uses the archiver's escape sequences.
+
+    Returns:
+        str | None: A description of the first problem, or None if there is none.
+    """
+    pos = line.find(b"\x1b")
+    while pos != -1:
+        if line[pos + 1 : pos + 2] not in ESCAPED:
+            return f"Bad escape sequence {line[pos : pos + 2]!r} at byte {pos}"
+        pos = line.find(b"\x1b", pos + 2)
+    pos = line.find(b"\r")
+    if pos != -1:
+        return f"Unescaped carriage return at byte {pos}"
+    return None
+
+
+def validate_lines(
+    lines: Iterable[bytes],
+    offset: int,
+    proto_class_name: str,
+    year: int,
+    element_count: int,
+) -> dict:
+    """Check the sample lines of a PB file.
+
+    Args:
+        lines (Iterable[bytes]): Consecutive sample lines.
+        offset (int): Offset of the first line in the file.
+        proto_class_name (str): Name of the EPICSEvent_pb2 class of the samples.
+        year (int): Year of the file.
+        element_count (int): Number of elements each waveform sample should have, or
+        0 not to check.
+
+    Returns:
+        dict: "count", the number of lines, "problems", a list of Problems whose
+        line numbers count from the first line, starting at 0, and "first" and
+        "last", the line number, offset and timestamp of the first and last
+        samples that could be decoded, or None.
+    """
+    scratch = getattr(EPICSEvent_pb2, proto_class_name)()
+    vector = proto_class_name.startswith("Vector")
+    year_seconds = (datetime(year + 1, 1, 1) - datetime(year, 1, 1)).total_seconds()
+    problems = []
+    first = last = None
+    count = 0
+    for index, line in enumerate(lines):
+        count += 1
+        if not line.endswith(b"\n"):
+            problems.append(Problem(index, offset, "partial", "No newline at the end"))
+        message = find_bad_escape(line.rstrip(b"\n"))
+        if message is not None:
+            problems.append(Problem(index, offset, "escape", message))
+        try:
+            scratch.ParseFromString(ArchiverData.unescape_line(line))
+        except DecodeError as e:
+            problems.append(Problem(index, offset, "undecodable", str(e)))
+            offset += len(line)
+            continue
+        timestamp = (scratch.secondsintoyear, scratch.nano)
+        if scratch.secondsintoyear >= year_seconds or scratch.nano >= 10**9:
+            problems.append(
+                Problem(index, offset, "timestamp", f"{timestamp} is outside {year}")
+            )
+        if last is not None and timestamp <= last[2]:
+            problems.append(_order_problem(index, offset, last[2], timestamp))
+        if vector and element_count and len(scratch.val) != element_count:  # type: ignore
+            problems.append(
+                Problem(
+                    index,
+                    offset,
+                    "element_count",
+                    f"{len(scratch.val)} elements, not {element_count}",  # type: ignore
+                )
+            )
+        last = (index, offset, timestamp)
+        if first is None:
+            first = last
+        offset += len(line)
+    return {"count": count, "problems": problems, "first": first, "last": last}
+
+
+def validate_range(
+    filepath: PathLike,
+    start: int,
+    end: int,
+    proto_class_name: str,
+    year: int,
+    element_count: int,
+) -> dict:
+    """Check the sample lines of an uncompressed PB file between two offsets, see
+    validate_lines."""
+    lines = ArchiverData(filepath).get_lines(start, end)
+    return validate_lines(lines, start, proto_class_name, year, element_count)
+
+
+def validate_compressed(
+    filepath: PathLike, proto_class_name: str, year: int, element_count: int
+) -> dict:
+    """Check all the sample lines of a compressed PB file, see validate_lines."""
+    ad = ArchiverData(filepath)
+    # Offsets are into the decompressed data
+    offset = len(ad.serialize(ad.header))
+    return validate_lines(
+        ad.get_samples_bytes(), offset, proto_class_name, year, element_count
+    )
+
+
+def validate_file(
+    filepath: PathLike, executor: Executor | None = None, range_size: int = RANGE_SIZE
+) -> tuple[int, list[Problem]]:
+    """Check a PB file for undecodable lines, bad escape sequences, timestamps that
+    are out of order, duplicated or outside the year of the file, and waveforms
+    whose length does not match the elementCount of the header. Uncompressed files
+    are split into ranges of lines that are checked in parallel.
+
+    Args:
+        filepath (PathLike): Path to the PB file, or "-" for standard input.
+        executor (Executor | None, optional): Executor, e.g. a ProcessPoolExecutor,
+        to check the ranges of uncompressed files with. Defaults to checking them
+        in this process.
+        range_size (int, optional): Bytes of the file in each range.
+
+    Raises:
+        DecodeError: Raised if the header cannot be decoded.
+
+    Returns:
+        tuple[int, list[Problem]]: Number of samples, and the problems found, whose
+        line numbers count the header as line 1.
+    """
+    tasks = _validation_tasks(filepath, range_size)
+    if executor is None:
+        return _combine_results([function(*args) for function, args in tasks])
+    return _combine_results(
+        [future.result() for future in _submit_tasks(executor, tasks)]
+    )
+
+
+def validate_files(
+    filepaths: Iterable[PathLike], executor: Executor, range_size: int = RANGE_SIZE
+) -> Iterator[tuple[PathLike, tuple[int, list[Problem]] | DecodeError]]:
+    """Check several PB files, see validate_file. The tasks of all the files are
+    submitted before any results are waited for, so that small files, and the
+    ranges of different files, are checked in parallel.
+
+    Args:
+        filepaths (Iterable[PathLike]): Paths to the PB files.
+        executor (Executor): Executor, e.g. a ProcessPoolExecutor, to check the
+        files with.
+        range_size (int, optional): Bytes of a file in each range.
+
+    Yields:
+        tuple[PathLike, tuple[int, list[Problem]] | DecodeError]: Each path, in
+        order, with the result validate_file would return, or the error raised if
+        the header of the file cannot be decoded.
+    """
+    submitted: list[tuple[PathLike, list[Future] | DecodeError]] = []
+    for filepath in filepaths:
+        try:
+            tasks = _validation_tasks(filepath, range_size)
+        except DecodeError as e:
+            submitted.append((filepath, e))
+        else:
+            submitted.append((filepath, _submit_tasks(executor, tasks)))
+    for filepath, futures in submitted:
+        if isinstance(futures, DecodeError):
+            yield filepath, futures
+        else:
+            yield filepath, _combine_results([future.result() for future in futures])
+
+
+def summarise(problems: list[Problem]) -> str:
+    """Count problems of each kind, e.g. "order 2, duplicate 5"."""
+    counts = Counter(problem.kind for problem in problems)
+    return ", ".join(f"{kind} {n}" for kind, n in counts.items())
+
+
+def _order_problem(
+    index: int, offset: int, previous: tuple[int, int], timestamp: tuple[int, int]
+) -> Problem:
+    if timestamp == previous:
+        return Problem(index, offset, "duplicate", f"{timestamp} is repeated")
+    return Problem(index, offset, "order", f"{timestamp} is before {previous}")
+
+
+def _validation_tasks(
+    filepath: PathLike, range_size: int
+) -> list[tuple[Callable[..., dict], tuple]]:
+    """Get the functions, and their arguments, that check each part of a PB file."""
+    ad = ArchiverData(filepath)
+    args = (ad.proto_class.__name__, ad.header.year, ad.header.elementCount)
+    try:
+        start, end = ad.get_sample_range()
+    except ValueError:
+        if is_stdio(ad.filepath):
+            # Standard input can only be read in this process
+            offset = len(ad.serialize(ad.header))
+            return [(validate_lines, (ad.get_samples_bytes(), offset, *args))]
+        return [(validate_compressed, (ad.filepath, *args))]
+    ranges = split_ranges(ad.filepath, start, end, range_size)
+    size = ad.filepath.stat().st_size
+    if size > end:
+        # Include a partly written last line so that it is reported
+        ranges.append((end, size))
+    return [(validate_range, (ad.filepath, a, b, *args)) for a, b in ranges]
+
+
+def _submit_tasks(
+    executor: Executor, tasks: list[tuple[Callable[..., dict], tuple]]
+) -> list[Future]:
+    futures = []
+    for function, args in tasks:
+        if function is validate_lines:
+            # Lines of standard input cannot be sent to another process
+            future: Future = Future()
+            future.set_result(function(*args))
+            futures.append(future)
+        else:
+            futures.append(executor.submit(function, *args))
+    return futures
+
+
+def _combine_results(results: list[dict]) -> tuple[int, list[Problem]]:
+    """Combine the results of checking consecutive parts of a PB file."""
+    count = 0
+    problems: list[Problem] = []
+    last = None
+    for result in results:
+        range_problems = result["problems"]
+        first = result["first"]
+        if last is not None and first is not None and first[2] <= last[2]:
+            range_problems.append(_order_problem(first[0], first[1], last[2], first[2]))
+        # Line numbers count the header as line 1
+        problems.extend(
+            problem._replace(line=problem.line + count + 2)
+            for problem in range_problems
+        )
+        if result["last"] is not None:
+            last = result["last"]
+        count += result["count"]
+    problems.sort(key=lambda problem: problem.line)
+    return count, problems
@@ -0,0 +1,354 @@
+"""Read and slice the values of waveform PB files straight from the packed val field
+of each sample, without decoding a protobuf message per sample."""
+
+from collections.abc import Iterator
+from contextlib import ExitStack
+from os import PathLike
+from pathlib import Path
+from typing import TYPE_CHECKING, NamedTuple
+
+from google.protobuf.message import DecodeError
+
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.compression import is_stdio, open_pb_write
+from aa_edit_data.generated import EPICSEvent_pb2
+from aa_edit_data.rewrite import atomic_write
+from aa_edit_data.wire import (
+    I32,
+    I64,
+    LEN,
+    MAX_VARINT_BYTES,
+    NANO,
+    SECONDSINTOYEAR,
+    SEVERITY,
+    STATUS,
+    VAL,
+    VARINT,
+    encode_varint,
+    field_varint,
+    iter_fields,
+    read_varint,
+)
+
+if TYPE_CHECKING:
+    import numpy as np
+
+BATCH_SIZE = 1024
+# dtype of the packed val field of each waveform proto class, and whether its
+# elements are zigzag encoded varints (sint32) rather than little-endian numbers
+WAVEFORM_DTYPES = {
+    "VectorDouble": ("<f8", False),
+    "VectorFloat": ("<f4", False),
+    "VectorInt": ("<i4", False),
+    "VectorShort": ("<i2", True),
+    "VectorEnum": ("<i2", True),
+}
+LAST_VARINT_BYTES = bytes(range(0x80))
+# Index in WaveformBatch of the varint fields of a sample
+SAMPLE_FIELDS = {SECONDSINTOYEAR: 0, NANO: 1, SEVERITY: 2, STATUS: 3}
+
+
+class WaveformBatch(NamedTuple):
+    secondsintoyear: "np.ndarray"
+    nano: "np.ndarray"
+    severity: "np.ndarray"
+    status: "np.ndarray"
+    val: "np.ndarray"
+
+
+def read_waveforms(
+    filepath: PathLike, batch_size: int = BATCH_SIZE
+) -> Iterator[WaveformBatch]:
+    """Read the samples of a waveform PB file in batches of numpy arrays.
+
+    The packed val field of each sample is found in the unescaped line and the
+    batch's values are read from those bytes with np.frombuffer, so only the
+    integer types, whose elements are varints, need decoding. The values of the
+    other types are read-only views of the batch's bytes. A new batch is started
+    whenever the number of elements changes, so each batch is rectangular.
+
+    Args:
+        filepath (PathLike): Path to a VectorDouble, VectorFloat, VectorInt,
+        VectorShort or VectorEnum PB file, or "-" for standard input.
+        batch_size (int, optional): Maximum number of samples in each batch.
+        Defaults to BATCH_SIZE.
+
+    Raises:
+        ValueError: Raised if the file is not one of the types above.
+
+    Returns:
+        Iterator[WaveformBatch]: secondsintoyear, nano, severity and status arrays
+        of the samples of each batch, and a (samples x elements) array of their
+        values.
+    """
+    return waveform_batches(ArchiverData(filepath), batch_size)
+
+
+def waveform_batches(
+    ad: ArchiverData, batch_size: int = BATCH_SIZE
+) -> Iterator[WaveformBatch]:
+    """Read the samples of an open waveform PB file in batches of numpy arrays, see
+    read_waveforms."""
+    np = import_numpy()
+    name = ad.proto_class.__name__
+    if name not in WAVEFORM_DTYPES:
+        raise ValueError(f"{name} samples cannot be read as a numpy array")
+    dtype, zigzag = WAVEFORM_DTYPES[name]
+    scratch = ad.proto_class()
+    fields: list[tuple[int, int, int, int]] = []
+    payloads: list[bytes] = []
+    elements = None
+    for line in ad.get_samples_bytes():
+        data = (
+            ArchiverData.unescape_line(line) if b"\x1b" in line else line.rstrip(b"\n")
+        )
+        sample_fields, payload = _packed_val(data, scratch)
+        count = _count_elements(np, payload, dtype, zigzag)
+        if fields and (count != elements or len(fields) == batch_size):
+            yield _batch(np, name, fields, payloads)
+            fields, payloads = [], []
+        elements = count
+        fields.append(sample_fields)
+        payloads.append(payload)
+    if fields:
+        yield _batch(np, name, fields, payloads)
+
+
+def extract_elements(
+    filepath: PathLike, new_filepath: PathLike, start: int, stop: int | None = None
+) -> int:
+    """Extract one element, or a range of elements, of each sample of a waveform PB
+    file into a scalar or smaller waveform PB file. Only the bytes of the elements
+    extracted are read from each sample's packed values, and the other fields of
+    the sample are copied unchanged.
+
+    Args:
+        filepath (PathLike): Path to a VectorDouble, VectorFloat, VectorInt,
+        VectorShort or VectorEnum PB file, or "-" for standard input.
+        new_filepath (PathLike): Path to write the new PB file to, or "-" for
+        standard output. May be filepath.
+        start (int): Index of the element, or of the first element of the range.
+        stop (int | None, optional): Index after the last element of the range,
+        which is clipped to the length of each waveform. Defaults to extracting
+        only the element at start into a SCALAR_* file.
+
+    Raises:
+        ValueError: Raised if the file is not one of the types above, the indices
+        are invalid, or a sample has no element at start when extracting one
+        element. new_filepath is then left untouched.
+
+    Returns:
+        int: Number of samples.
+    """
+    ad = ArchiverData(filepath)
+    name = ad.proto_class.__name__
+    if name not in WAVEFORM_DTYPES:
+        raise ValueError(f"Cannot extract elements from {name} samples")
+    if start < 0 or (stop is not None and stop <= start):
+        raise ValueError(f"Cannot extract elements {start} to {stop}")
+    dtype, zigzag = WAVEFORM_DTYPES[name]
+    header = type(ad.header)()
+    header.CopyFrom(ad.header)
+    if stop is None:
+        scalar_type = ad.pv_type.replace("WAVEFORM_", "SCALAR_")
+        header.type = EPICSEvent_pb2.PayloadType.Value(scalar_type)  # type: ignore
+        header.elementCount = min(header.elementCount, 1)
+    elif header.elementCount:
+        header.elementCount = max(min(stop, header.elementCount) - start, 0)
+    if zigzag:
+        tag = bytes([VAL << 3 | VARINT])
+    else:
+        tag = bytes([VAL << 3 | (I64 if dtype == "<f8" else I32)])
+    scratch = ad.proto_class()
+    count = 0
+    with ExitStack() as stack:
+        pb_filepath = Path(new_filepath)
+        if not is_stdio(new_filepath):
+            pb_filepath = stack.enter_context(atomic_write(new_filepath))
+        f = stack.enter_context(open_pb_write(pb_filepath))
+        f.write(ArchiverData.serialize(header))
+        for line in ad.get_samples_bytes():
+            count += 1
+            data = ArchiverData.unescape_line(line)
+            before, payload, after = _split_val(data, scratch)
+            val = _slice_elements(payload, start, stop, dtype, zigzag)
+            if stop is not None:
+                # Empty packed fields are not written
+                field = bytes([VAL << 3 | LEN]) + encode_varint(len(val)) + val
+                field = field if val else b""
+            elif val:
+                field = tag + val
+            else:
+                raise ValueError(f"Sample {count} has no element {start}")
+            f.write(ArchiverData.escape_line(before + field + after))
+    return count
+
+
+def decode_varints(data: bytes) -> "np.ndarray":
+    """Decode a run of varints, e.g. a packed repeated field, into uint64 values."""
+    np = import_numpy()
+    raw = np.frombuffer(data, dtype=np.uint8)
+    if raw.size == 0:
+        return np.zeros(0, dtype=np.uint64)
+    if raw[-1] & 0x80:
+        raise ValueError("Truncated varint")
+    ends = np.flatnonzero(raw < 0x80)
+    values = raw[ends].astype(np.uint64)
+    # Work back from the last byte of each varint, shifting in the byte before it
+    # for as long as that byte has its continuation bit set
+    same = np.ones(ends.size, dtype=bool)
+    seven = np.uint64(7)
+    for k in range(1, MAX_VARINT_BYTES):
+        before = raw[np.maximum(ends - k, 0)]
+        same &= (before >= 0x80) & (ends >= k)
+        if not same.any():
+            break
+        values = np.where(same, values << seven | (before & 0x7F), values)
+    return values
+
+
+def decode_values(payload: bytes, proto_class_name: str) -> "np.ndarray":
+    """Decode packed values, e.g. the val field of one or more waveform samples.
+
+    Args:
+        payload (bytes): The packed values.
+        proto_class_name (str): Name of the EPICSEvent_pb2 class of the samples,
+        one of WAVEFORM_DTYPES.
+
+    Raises:
+        ValueError: Raised if the values are zigzag encoded varints that cannot be
+        decoded.
+
+    Returns:
+        np.ndarray: The values. Those of the types that are not varints are a
+        read-only view of payload.
+    """
+    np = import_numpy()
+    dtype, zigzag = WAVEFORM_DTYPES[proto_class_name]
+    if not zigzag:
+        return np.frombuffer(payload, dtype=dtype)
+    # protobuf decodes sint32 varints several times faster than numpy can, so
+    # parse the values as the val field of a single message
+    message = getattr(EPICSEvent_pb2, proto_class_name)()
+    try:
+        message.ParseFromString(
+            bytes([VAL << 3 | LEN]) + encode_varint(len(payload)) + payload
+        )
+    except DecodeError as e:
+        raise ValueError(f"Packed {proto_class_name} values: {e}") from e
+    return np.array(message.val, dtype=dtype)
+
+
+def packed_values(line: bytes, scratch) -> bytes:
+    """Get the packed val field of a line of a waveform PB file.
+
+    Args:
+        line (bytes): A line of a PB file.
+        scratch: Message of the file's proto class, used to decode the sample if its
+        values are not packed.
+
+    Returns:
+        bytes: The packed values.
+    """
+    data = ArchiverData.unescape_line(line) if b"\x1b" in line else line.rstrip(b"\n")
+    return _split_val(data, scratch)[1]
+
+
+def _batch(np, name, fields, payloads) -> WaveformBatch:
+    values = decode_values(b"".join(payloads), name)
+    # Negative int32s are serialised as 64-bit two's complement, so keep the low
+    # 32 bits
+    columns = np.array(fields, dtype=np.uint64).reshape(-1, 4).T
+    return WaveformBatch(
+        columns[0].astype(np.uint32),
+        columns[1].astype(np.uint32),
+        columns[2].astype(np.int32),
+        columns[3].astype(np.int32),
+        values.reshape(len(payloads), -1),
+    )
+
+
+def _count_elements(np, payload: bytes, dtype: str, zigzag: bool) -> int:
+    if zigzag:
+        # Each varint has one byte without the continuation bit set
+        return len(payload) - len(payload.translate(None, LAST_VARINT_BYTES))
+    size = np.dtype(dtype).itemsize
+    if len(payload) % size:
+        raise ValueError(f"Packed {dtype} values are {len(payload)} bytes long")
+    return len(payload) // size
+
+
+def _slice_elements(
+    payload: bytes, start: int, stop: int | None, dtype: str, zigzag: bool
+) -> bytes:
+    """Get the bytes of elements start to stop, or just start if stop is None, of a
+    packed repeated field."""
+    stop = start + 1 if stop is None else stop
+    if not zigzag:
+        size = int(dtype[2:])
+        return payload[start * size : stop * size]
+    # Skip to the start of each varint in turn, without decoding it
+    pos = 0
+    begin = None
+    for index in range(stop):
+        if pos >= len(payload):
+            break
+        if index == start:
+            begin = pos
+        while pos < len(payload) and payload[pos] & 0x80:
+            pos += 1
+        pos += 1
+    return b"" if begin is None else payload[begin:pos]
+
+
+def _split_val(data: bytes, scratch) -> tuple[bytes, bytes, bytes]:
+    """Split a serialised sample into the fields before its val field, the packed
+    values, and the fields after it."""
+    before = []
+    after = []
+    chunks = []
+    packed = True
+    for number, wire_type, start, end in iter_fields(data):
+        if number < VAL:
+            before.append(data[start:end])
+        elif number > VAL:
+            after.append(data[start:end])
+        elif wire_type == LEN:
+            _, pos = read_varint(data, start)
+            _, pos = read_varint(data, pos)
+            chunks.append(data[pos:end])
+        else:
+            packed = False
+    payload = b"".join(chunks) if packed else _repack(data, scratch)
+    return b"".join(before), payload, b"".join(after)
+
+
+def _packed_val(data: bytes, scratch) -> tuple[tuple[int, int, int, int], bytes]:
+    """Get the secondsintoyear, nano, severity and status, and the packed val bytes,
+    of a serialised sample."""
+    before, payload, after = _split_val(data, scratch)
+    fields = [0, 0, 0, 0]
+    for part in (before, after):
+        for number, wire_type, start, _ in iter_fields(part):
+            if number in SAMPLE_FIELDS and wire_type == VARINT:
+                fields[SAMPLE_FIELDS[number]] = field_varint(part, start)
+    return (fields[0], fields[1], fields[2], fields[3]), payload
+
+
+def _repack(data: bytes, scratch) -> bytes:
+    """Get the values of a serialised sample that were not written packed, which
+    parsers must also accept, packed."""
+    # protobuf always writes packed fields packed
+    scratch.ParseFromString(data)
+    return _split_val(scratch.SerializeToString(), scratch)[1]
+
+
+def import_numpy():
+    try:
+        import numpy
+    except ImportError as e:
+        raise ImportError(
+            "Reading waveforms into arrays requires the numpy package. "
+            + "Install it with `pip install aa-edit-data[numpy]`."
+        ) from e
+    return numpy
@@ -0,0 +1,153 @@
+"""Read fields of serialised samples straight from the protobuf wire format, without
+decoding the whole message. See https://protobuf.dev/programming-guides/encoding/."""
+
+from collections.abc import Generator
+
+from aa_edit_data.archiver_data import ArchiverData
+
+VARINT = 0
+I64 = 1
+LEN = 2
+I32 = 5
+SECONDSINTOYEAR = 1
+NANO = 2
+VAL = 3
+SEVERITY = 4
+STATUS = 5
+FIELDVALUES = 7
+FIELDACTUALCHANGE = 8
+# Field number of the name of a FieldValue
+FIELD_NAME = 1
+MAX_VARINT_BYTES = 10
+
+
+def read_varint(data: bytes, pos: int) -> tuple[int, int]:
+    """Read a varint.
+
+    Args:
+        data (bytes): A serialised message.
+        pos (int): Position of the first byte of the varint.
+
+    Raises:
+        ValueError: Raised if the varint runs past the end of data.
+
+    Returns:
+        tuple[int, int]: The value, and the position just after the varint.
+    """
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Truncated varint")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+
+
+def encode_varint(value: int) -> bytes:
+    """Encode a non-negative integer as a varint."""
+    encoded = bytearray()
+    while value > 0x7F:
+        encoded.append(value & 0x7F | 0x80)
+        value >>= 7
+    encoded.append(value)
+    return bytes(encoded)
+
+
+def iter_fields(data: bytes, pos: int = 0) -> Generator[tuple[int, int, int, int]]:
+    """Iterate over the fields of a serialised message.
+
+    Args:
+        data (bytes): A serialised message, with newline characters restored.
+        pos (int, optional): Position of the tag of the first field to read. Defaults
+        to the start of data.
+
+    Raises:
+        ValueError: Raised if the message is malformed.
+
+    Yields:
+        tuple[int, int, int, int]: The field number and wire type of each field, and
+        the start and end positions of the whole field, including its tag.
+    """
+    end = len(data)
+    while pos < end:
+        start = pos
+        tag, pos = read_varint(data, pos)
+        wire_type = tag & 7
+        if wire_type == VARINT:
+            _, pos = read_varint(data, pos)
+        elif wire_type == I64:
+            pos += 8
+        elif wire_type == I32:
+            pos += 4
+        elif wire_type == LEN:
+            length, pos = read_varint(data, pos)
+            pos += length
+        else:
+            raise ValueError(f"Unsupported wire type {wire_type}")
+        if pos > end:
+            raise ValueError("Truncated field")
+        yield tag >> 3, wire_type, start, pos
+
+
+def wire_timestamp(line: bytes) -> tuple[int, int]:
+    """Get the secondsintoyear and nano of a sample from a line of a PB file, decoding
+    only those two fields.
+
+    Args:
+        line (bytes): A line of a PB file.
+
+    Returns:
+        tuple[int, int]: secondsintoyear and nano, which are 0 if not set.
+    """
+    data = ArchiverData.unescape_line(line) if b"\x1b" in line else line.rstrip(b"\n")
+    seconds = nano = 0
+    for number, wire_type, start, _ in iter_fields(data):
+        if wire_type != VARINT:
+            continue
+        if number == SECONDSINTOYEAR:
+            seconds = field_varint(data, start)
+        elif number == NANO:
+            nano = field_varint(data, start)
+    return seconds, nano
+
+
+def wire_seconds(line: bytes) -> int:
+    """Get the secondsintoyear of a sample from a line of a PB file, see
+    wire_timestamp. The varint is read straight from the line when, as protobuf
+    writes it, secondsintoyear is the first field and no escape sequence is near it.
+
+    Args:
+        line (bytes): A line of a PB file.
+
+    Returns:
+        int: secondsintoyear, which is 0 if not set.
+    """
+    if line[:1] == b"\x08" and b"\x1b" not in line[: MAX_VARINT_BYTES + 1]:
+        return read_varint(line, 1)[0]
+    return wire_timestamp(line)[0]
+
+
+def val_fields(line: bytes) -> bytes:
+    """Get the val field of a sample from a line of a PB file, as it is serialised.
+
+    Args:
+        line (bytes): A line of a PB file.
+
+    Returns:
+        bytes: The tags and values of each val field, e.g. the elements of a
+        waveform of strings, joined.
+    """
+    data = ArchiverData.unescape_line(line) if b"\x1b" in line else line.rstrip(b"\n")
+    return b"".join(
+        data[start:end] for number, _, start, end in iter_fields(data) if number == VAL
+    )
+
+
+def field_varint(data: bytes, start: int) -> int:
+    """Get the value of the varint field whose tag starts at start."""
+    _, pos = read_varint(data, start)
+    return read_varint(data, pos)[0]
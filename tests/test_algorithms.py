@@ -4,7 +4,9 @@ from pathlib import Path
 import pytest
 
 import aa_edit_data.algorithms as algorithms
+from aa_edit_data.archiver_data import ArchiverData
 from aa_edit_data.archiver_data_generated import ArchiverDataGenerated
+from aa_edit_data.generated import EPICSEvent_pb2
 
 
 def test_get_nano_diff():
@@ -384,3 +386,219 @@ def test_remove_by_factor_n_is_len():
     n = len(list(samples))
     actual = list(algorithms.remove_by_factor(iter(samples), n))
     assert actual == [list(samples)[0]]
+
+
+@pytest.mark.parametrize(
+    "func, args",
+    [
+        (algorithms.apply_min_period, [0.7]),
+        (algorithms.apply_min_period, [6]),
+        (algorithms.remove_by_factor, [3]),
+        (algorithms.remove_before_ts, [40, 500000000]),
+        (algorithms.remove_after_ts, [40, 500000000]),
+    ],
+)
+def test_algorithms_resume_with_state(func, args):
+    adg = ArchiverDataGenerated(
+        start=10, seconds_gap=0, nano_gap=294814000, samples=300
+    )
+    samples = list(adg.get_samples())
+    expected = list(func(iter(samples), *args))
+    state = {}
+    result = []
+    for start in range(0, 300, 70):
+        result += list(func(iter(samples[start : start + 70]), *args, state=state))
+    assert result == expected
+
+
+def test_apply_min_period_empty():
+    assert list(algorithms.apply_min_period(iter([]), 1, state={})) == []
+
+
+def duplicated_lines() -> tuple[list[bytes], list[int]]:
+    """Serialised samples with runs of duplicate timestamps and of identical
+    samples, and the timestamp index of each."""
+    adg = ArchiverDataGenerated(start=10, seconds_gap=1, nano_gap=0, samples=6)
+    lines = []
+    indices = []
+    for index, sample in enumerate(adg.get_samples()):
+        for val in [1.0] * (index % 2) + [1.0, 3.0][: index % 3]:
+            sample.val = val  # type: ignore
+            lines.append(ArchiverData.serialize(sample))
+            indices.append(index)
+    return lines, indices
+
+
+def test_remove_duplicates_bytes():
+    a, b, c = b"a\n", b"b\n", b"c\n"
+    samples = iter([a, a, b, a, c, c, c])
+    assert list(algorithms.remove_duplicates(samples)) == [a, b, a, c]
+
+
+@pytest.mark.parametrize("keep", ["first", "last"])
+def test_remove_duplicates_timestamp(keep):
+    lines, indices = duplicated_lines()
+    result = list(algorithms.remove_duplicates(iter(lines), "timestamp", keep))
+    expected = []
+    for index in sorted(set(indices)):
+        run = [line for line, i in zip(lines, indices, strict=True) if i == index]
+        expected.append(run[0] if keep == "first" else run[-1])
+    assert result == expected
+
+
+@pytest.mark.parametrize("keep", ["first", "last"])
+@pytest.mark.parametrize("by", ["bytes", "timestamp"])
+def test_remove_duplicates_resume_with_state(by, keep):
+    lines, indices = duplicated_lines()
+    expected = list(algorithms.remove_duplicates(iter(lines), by, keep))
+    # Split between samples with different timestamps
+    splits = [0] + [i for i in range(1, len(lines)) if indices[i] != indices[i - 1]]
+    state = {}
+    result = []
+    for start, end in zip(splits, splits[1:] + [len(lines)], strict=True):
+        chunk = iter(lines[start:end])
+        result += list(algorithms.remove_duplicates(chunk, by, keep, state=state))
+    assert result == expected
+
+
+def test_remove_duplicates_resume_drops_written_duplicate():
+    lines, _ = duplicated_lines()
+    state = {}
+    result = algorithms.remove_duplicates(iter(lines[:1]), "timestamp", "last", state)
+    assert list(result) == lines[:1]
+    assert state == {"last": lines[0].hex(), "pending": None}
+    result = algorithms.remove_duplicates(iter(lines[1:3]), "timestamp", "last", state)
+    assert list(result) == [lines[2]]
+
+
+def test_remove_duplicates_invalid():
+    with pytest.raises(ValueError):
+        list(algorithms.remove_duplicates(iter([]), "value"))
+    with pytest.raises(ValueError):
+        list(algorithms.remove_duplicates(iter([]), keep="middle"))
+
+
+def field_samples() -> list:
+    """Samples with field values, some of which change, that include characters
+    that are escaped."""
+    adg = ArchiverDataGenerated(start=10, seconds_gap=1, nano_gap=10, samples=6)
+    fields = [
+        {"DESC": "Line\nfeed", "EGU": "mm"},
+        {},
+        {"DESC": "Line\nfeed", "EGU": "mm"},
+        {"DESC": "Line\nfeed", "EGU": "um"},
+        {"EGU": "um"},
+        {"DESC": "\x1b"},
+    ]
+    samples = []
+    for sample, values in zip(adg.get_samples(), fields, strict=True):
+        for name, val in values.items():
+            sample.fieldvalues.add(name=name, val=val)  # type: ignore
+        sample.fieldactualchange = bool(values)  # type: ignore
+        samples.append(sample)
+    return samples
+
+
+def test_strip_fields():
+    samples = field_samples()
+    lines = [ArchiverData.serialize(sample) for sample in samples]
+    expected = []
+    for sample in samples:
+        sample.ClearField("fieldvalues")
+        sample.ClearField("fieldactualchange")
+        expected.append(ArchiverData.serialize(sample))
+    assert list(algorithms.strip_fields(iter(lines))) == expected
+    # Lines without fields are passed through
+    assert list(algorithms.strip_fields(iter(expected))) == expected
+
+
+def test_strip_fields_keep_changed():
+    samples = field_samples()
+    lines = [ArchiverData.serialize(sample) for sample in samples]
+    result = [
+        ArchiverData.deserialize(line, type(samples[0]))
+        for line in algorithms.strip_fields(iter(lines), keep_changed=True)
+    ]
+    kept = [
+        {field.name: field.val for field in sample.fieldvalues} for sample in result
+    ]
+    assert kept == [
+        {"DESC": "Line\nfeed", "EGU": "mm"},
+        {},
+        {},
+        {"EGU": "um"},
+        {},
+        {"DESC": "\x1b"},
+    ]
+    assert [sample.fieldactualchange for sample in result] == [
+        True,
+        False,
+        False,
+        True,
+        False,
+        True,
+    ]
+    assert result[1].secondsintoyear == 11
+
+
+def test_strip_fields_resume_with_state():
+    lines = [ArchiverData.serialize(sample) for sample in field_samples()]
+    expected = list(algorithms.strip_fields(iter(lines), keep_changed=True))
+    state = {}
+    result = []
+    for start in range(0, len(lines), 2):
+        chunk = iter(lines[start : start + 2])
+        result += list(algorithms.strip_fields(chunk, keep_changed=True, state=state))
+    assert result == expected
+    assert sorted(state["fields"]) == [b"DESC".hex(), b"EGU".hex()]
+
+
+def waveform_lines(proto_class_name: str, values: list) -> list[bytes]:
+    proto_class = getattr(EPICSEvent_pb2, proto_class_name)
+    return [
+        ArchiverData.serialize(proto_class(secondsintoyear=i, nano=0, val=val))
+        for i, val in enumerate(values)
+    ]
+
+
+UNCHANGED_VALUES = [[1, 2], [1, 2], [1, 3], [1, 2], [1, 2], [1], [1], [5, 10], [5, 9]]
+
+
+@pytest.mark.parametrize("proto_class_name", ["VectorDouble", "VectorShort"])
+@pytest.mark.parametrize(
+    "tolerance, kept",
+    [(0, [0, 2, 3, 5, 7, 8]), (1, [0, 5, 7]), (0.5, [0, 2, 3, 5, 7, 8])],
+)
+def test_remove_unchanged(proto_class_name, tolerance, kept):
+    if tolerance:
+        pytest.importorskip("numpy")
+    lines = waveform_lines(proto_class_name, UNCHANGED_VALUES)
+    result = algorithms.remove_unchanged(iter(lines), proto_class_name, tolerance)
+    assert list(result) == [lines[i] for i in kept]
+
+
+@pytest.mark.parametrize("tolerance", [0, 1])
+def test_remove_unchanged_resume_with_state(tolerance):
+    if tolerance:
+        pytest.importorskip("numpy")
+    lines = waveform_lines("VectorInt", UNCHANGED_VALUES)
+    expected = list(algorithms.remove_unchanged(iter(lines), "VectorInt", tolerance))
+    state = {}
+    result = []
+    for start in range(0, len(lines), 2):
+        chunk = iter(lines[start : start + 2])
+        result += list(
+            algorithms.remove_unchanged(chunk, "VectorInt", tolerance, state=state)
+        )
+    assert result == expected
+
+
+def test_remove_unchanged_strings():
+    values = [["a", "b"], ["a", "b"], ["a", "\n"], ["a", "\n"], ["a"]]
+    lines = waveform_lines("VectorString", values)
+    result = algorithms.remove_unchanged(iter(lines), "VectorString")
+    assert list(result) == [lines[0], lines[2], lines[4]]
+    with pytest.raises(ValueError):
+        list(algorithms.remove_unchanged(iter(lines), "VectorString", 1))
+    with pytest.raises(ValueError):
+        list(algorithms.remove_unchanged(iter(lines), "VectorDouble", -1))
@@ -1,4 +1,6 @@
 import filecmp
+import threading
+import time
 from collections.abc import Iterator
 from datetime import datetime
 from pathlib import Path
@@ -8,6 +10,7 @@ import pytest
 from aa_edit_data.archiver_data import ArchiverData
 from aa_edit_data.archiver_data_generated import ArchiverDataGenerated
 from aa_edit_data.generated import EPICSEvent_pb2
+from aa_edit_data.profiling import ProcessStats
 
 
 class ArchiverDataDummy(ArchiverData):
@@ -376,3 +379,194 @@ def test_read_write_pb_all_types():
         if are_identical is True:
             write.unlink()  # Delete results file if test passes
         assert are_identical is True
+
+
+def test_process_and_write_with_stats():
+    ad = ArchiverDataGenerated(
+        samples=10, pv_type=4, start=25, seconds_gap=1, nano_gap=500000000
+    )
+    filepath = Path("tests/test_data/results_files/process_and_write_stats.pb")
+    expected = Path(
+        "tests/test_data/archiver_data_expected_output/process_and_write.pb"
+    )
+
+    def process_function(samples: Iterator) -> Iterator:
+        return (sample for i, sample in enumerate(samples) if i % 2)
+
+    stats = ProcessStats()
+    ad.process_and_write(filepath, True, process_function, stats=stats)
+    are_identical = filecmp.cmp(filepath, expected, shallow=False)
+    are_txt_identical = filecmp.cmp(
+        filepath.with_suffix(".txt"), expected.with_suffix(".txt")
+    )
+    filepath.unlink()
+    filepath.with_suffix(".txt").unlink()
+    assert are_identical is True
+    assert are_txt_identical is True
+    assert stats.samples_in == 10
+    assert stats.samples_out == 5
+    assert stats.bytes_out == expected.stat().st_size
+    assert stats.total_wall >= sum(stats.wall.values())
+
+
+@pytest.mark.parametrize("filepath", ["tests/test_data/WAVEFORM_INT_test_data.pb"])
+def test_get_sample_views(ad):
+    for view, sample in zip(ad.get_sample_views(), ad.get_samples(), strict=True):
+        assert view.secondsintoyear == sample.secondsintoyear
+        assert view.nano == sample.nano
+        assert view.val == list(sample.val)
+        assert not view.modified
+
+
+@pytest.mark.parametrize("filepath", ["tests/test_data/SCALAR_INT_test_data.pb"])
+def test_sample_view_passes_through_original_bytes(ad):
+    for view, line in zip(ad.get_sample_views(), ad.get_samples_bytes(), strict=True):
+        assert view.val >= 0
+        assert ArchiverData.serialize(view) is view.line
+        assert view.line == line
+
+
+@pytest.mark.parametrize("filepath", ["tests/test_data/SCALAR_INT_test_data.pb"])
+def test_sample_view_modified(ad):
+    view = next(ad.get_sample_views())
+    view.val = 12345
+    assert view.modified
+    assert view.val == 12345
+    result = ArchiverData.deserialize(ArchiverData.serialize(view), ad.proto_class)
+    assert result.val == 12345
+    assert result.secondsintoyear == view.secondsintoyear
+
+
+@pytest.mark.parametrize("filepath", ["tests/test_data/WAVEFORM_INT_test_data.pb"])
+def test_sample_view_val_is_changed_by_assignment(ad):
+    view = next(ad.get_sample_views())
+    original = view.line
+    val = view.val
+    # Each access gets a new copy, so changing it in place has no effect
+    view.val.append(7)
+    view.val[0] = 9
+    assert view.val == val
+    assert not view.modified
+    assert ArchiverData.serialize(view) == original
+    view.val = [9, *view.val[1:], 7]
+    assert view.modified
+    result = ArchiverData.deserialize(ArchiverData.serialize(view), ad.proto_class)
+    assert list(result.val) == [9, *val[1:], 7]  # type: ignore
+
+
+def test_process_and_write_lazy():
+    ad = ArchiverDataGenerated(
+        samples=10, pv_type=4, start=25, seconds_gap=1, nano_gap=500000000
+    )
+    filepath = Path("tests/test_data/results_files/process_and_write_lazy.pb")
+    expected = Path(
+        "tests/test_data/archiver_data_expected_output/process_and_write.pb"
+    )
+
+    def process_function(samples: Iterator) -> Iterator:
+        return (sample for sample in samples if sample.nano)
+
+    ad.process_and_write(filepath, True, process_function, lazy=True)
+    are_identical = filecmp.cmp(filepath, expected, shallow=False)
+    are_txt_identical = filecmp.cmp(
+        filepath.with_suffix(".txt"), expected.with_suffix(".txt")
+    )
+    filepath.unlink()
+    filepath.with_suffix(".txt").unlink()
+    assert are_identical is True
+    assert are_txt_identical is True
+
+
+@pytest.mark.parametrize(
+    "filename", ["WAVEFORM_DOUBLE_test_data.pb", "WAVEFORM_STRING_test_data.pb"]
+)
+def test_process_and_write_lazy_txt(tmp_path, filename):
+    ad = ArchiverData(Path("tests/test_data") / filename)
+    for lazy in (False, True):
+        ad.process_and_write(tmp_path / f"{lazy}.pb", True, iter, lazy=lazy)
+    assert filecmp.cmp(tmp_path / "False.txt", tmp_path / "True.txt", shallow=False)
+
+
+@pytest.mark.parametrize(
+    "filename",
+    ["SCALAR_DOUBLE_test_data.pb", "WAVEFORM_STRING_test_data.pb", "RAW:2025_short.pb"],
+)
+def test_scan_samples(filename):
+    ad = ArchiverData(Path("tests/test_data") / filename)
+    samples = list(ad.get_samples())
+    assert ad.scan_samples() == (len(samples), samples[0], samples[-1])
+
+
+def test_scan_samples_partial_last_line(tmp_path):
+    read = Path("tests/test_data") / "SCALAR_INT_test_data.pb"
+    partial = tmp_path / "SCALAR_INT_test_data.pb"
+    partial.write_bytes(read.read_bytes() + b"\x08\x01")
+    samples = list(ArchiverData(read).get_samples())
+    assert ArchiverData(partial).scan_samples() == (
+        len(samples),
+        samples[0],
+        samples[-1],
+    )
+
+
+def test_scan_samples_empty(tmp_path):
+    read = Path("tests/test_data") / "SCALAR_INT_test_data.pb"
+    empty = tmp_path / "SCALAR_INT_test_data.pb"
+    with open(read, "rb") as f:
+        empty.write_bytes(f.readline())
+    assert ArchiverData(empty).scan_samples() == (0, None, None)
+
+
+def test_scan_samples_compressed(tmp_path):
+    read = Path("tests/test_data") / "WAVEFORM_DOUBLE_test_data.pb"
+    compressed = tmp_path / "WAVEFORM_DOUBLE_test_data.pb.gz"
+    ArchiverData(read).write_pb(compressed)
+    assert ArchiverData(compressed).scan_samples() == ArchiverData(read).scan_samples()
+
+
+@pytest.mark.parametrize("block_size", [7, 2**16])
+@pytest.mark.parametrize(
+    "filename",
+    ["SCALAR_STRING_test_data.pb", "WAVEFORM_DOUBLE_test_data.pb", "RAW:2025_short.pb"],
+)
+def test_iter_reversed(monkeypatch, filename, block_size):
+    monkeypatch.setattr("aa_edit_data.archiver_data.REVERSE_BLOCK_SIZE", block_size)
+    ad = ArchiverData(Path("tests/test_data") / filename)
+    assert list(ad.iter_reversed()) == list(ad.get_samples())[::-1]
+    assert list(ad.iter_reversed(raw=True)) == list(ad.get_samples_bytes())[::-1]
+
+
+def test_iter_reversed_partial_last_line(tmp_path):
+    read = Path("tests/test_data") / "SCALAR_INT_test_data.pb"
+    partial = tmp_path / "SCALAR_INT_test_data.pb"
+    partial.write_bytes(read.read_bytes() + b"\x08\x01")
+    samples = list(ArchiverData(read).get_samples())
+    assert list(ArchiverData(partial).iter_reversed()) == samples[::-1]
+
+
+def test_iter_reversed_compressed(tmp_path):
+    compressed = tmp_path / "SCALAR_INT_test_data.pb.gz"
+    ArchiverData(Path("tests/test_data") / "SCALAR_INT_test_data.pb").write_pb(
+        compressed
+    )
+    with pytest.raises(ValueError):
+        next(ArchiverData(compressed).iter_reversed())
+
+
+def test_follow(tmp_path):
+    read = Path("tests/test_data") / "SCALAR_INT_test_data.pb"
+    lines = read.read_bytes().splitlines(keepends=True)
+    growing = tmp_path / "SCALAR_INT_test_data.pb"
+    growing.write_bytes(b"".join(lines[:10]) + lines[10][:2])
+
+    def append():
+        time.sleep(0.05)
+        with open(growing, "ab") as f:
+            f.write(lines[10][2:] + lines[11])
+
+    samples = ArchiverData(growing).follow(poll_interval=0.01, raw=True)
+    thread = threading.Thread(target=append)
+    thread.start()
+    assert [next(samples), next(samples)] == lines[10:12]
+    samples.close()
+    thread.join()
@@ -0,0 +1,40 @@
+from aa_edit_data.benchmark import BENCHMARKS, compare_to_baseline, run_benchmarks
+
+
+def make_results(**relative):
+    return {
+        "benchmarks": {
+            name: {"samples_per_second": 1.0, "relative": value}
+            for name, value in relative.items()
+        }
+    }
+
+
+def test_run_benchmarks(capsys):
+    results = run_benchmarks(samples=200, repeats=1)
+    # No progress bars are drawn
+    assert capsys.readouterr().err == ""
+    assert set(results["benchmarks"]) == set(BENCHMARKS)
+    for result in results["benchmarks"].values():
+        assert result["samples_per_second"] > 0
+        assert result["relative"] > 0
+
+
+def test_compare_to_baseline_within_tolerance():
+    baseline = make_results(raw_passthrough=1.0, text_export=2.0)
+    results = make_results(raw_passthrough=0.8, text_export=2.5)
+    assert compare_to_baseline(results, baseline, tolerance=0.25) == []
+
+
+def test_compare_to_baseline_regression():
+    baseline = make_results(raw_passthrough=1.0, apply_min_period=3.0)
+    results = make_results(raw_passthrough=0.9, apply_min_period=1.0)
+    regressions = compare_to_baseline(results, baseline, tolerance=0.25)
+    assert len(regressions) == 1
+    assert regressions[0].startswith("apply_min_period")
+
+
+def test_compare_to_baseline_ignores_missing_results():
+    baseline = make_results(raw_passthrough=1.0, time_window=1.0)
+    results = make_results(raw_passthrough=1.0)
+    assert compare_to_baseline(results, baseline) == []
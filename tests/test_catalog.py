@@ -0,0 +1,80 @@
+import gzip
+import shutil
+import sqlite3
+from pathlib import Path
+
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.catalog import format_timestamp, update_catalog
+
+TEST_DATA = Path("tests/test_data")
+
+
+def make_archive(root: Path):
+    (root / "A").mkdir()
+    (root / "B").mkdir()
+    shutil.copy(TEST_DATA / "SCALAR_DOUBLE_test_data.pb", root / "A" / "RAW:2025.pb")
+    shutil.copy(TEST_DATA / "WAVEFORM_INT_test_data.pb", root / "B" / "RAW:2025.pb")
+    (root / "B" / "RAW:2024.pb.gz").write_bytes(
+        gzip.compress((TEST_DATA / "RAW:2025_short.pb").read_bytes())
+    )
+    (root / "B" / "notes.txt").write_text("not a PB file")
+
+
+def query(database: Path, sql: str) -> list:
+    with sqlite3.connect(database) as connection:
+        rows = connection.execute(sql).fetchall()
+    connection.close()
+    return rows
+
+
+def test_update_catalog(tmp_path):
+    root = tmp_path / "archive"
+    database = tmp_path / "catalog.db"
+    root.mkdir()
+    make_archive(root)
+    changes = update_catalog(database, root)
+    assert len(changes["added"]) == 3
+    assert not changes["failed"]
+
+    filepath = root / "B" / "RAW:2025.pb"
+    ad = ArchiverData(filepath)
+    samples = list(ad.get_samples())
+    assert query(
+        database,
+        "SELECT pvname, pv_type, year, sample_count, first_timestamp, last_timestamp, "
+        + f"size FROM files WHERE path = '{filepath.resolve()}'",
+    ) == [
+        (
+            ad.header.pvname,
+            "WAVEFORM_INT",
+            ad.header.year,
+            len(samples),
+            format_timestamp(ad.header.year, samples[0]),
+            format_timestamp(ad.header.year, samples[-1]),
+            filepath.stat().st_size,
+        )
+    ]
+    assert query(database, "SELECT COUNT(*) FROM files WHERE pv_type = 'SCALAR_DOUBLE'")
+
+
+def test_update_catalog_refresh(tmp_path):
+    root = tmp_path / "archive"
+    database = tmp_path / "catalog.db"
+    root.mkdir()
+    make_archive(root)
+    update_catalog(database, root)
+
+    changed = root / "A" / "RAW:2025.pb"
+    with open(TEST_DATA / "SCALAR_DOUBLE_test_data.pb", "rb") as f:
+        changed.write_bytes(f.readline() + f.readline())
+    (root / "B" / "RAW:2024.pb.gz").unlink()
+    (root / "B" / "broken.pb").write_bytes(b"\x00\x01\x02")
+    changes = update_catalog(database, root)
+    assert changes["updated"] == [changed.resolve()]
+    assert changes["unchanged"] == [(root / "B" / "RAW:2025.pb").resolve()]
+    assert changes["removed"] == [(root / "B" / "RAW:2024.pb.gz").resolve()]
+    assert changes["failed"] == [(root / "B" / "broken.pb").resolve()]
+    assert query(database, "SELECT sample_count FROM files ORDER BY path") == [
+        (1,),
+        (100,),
+    ]
@@ -0,0 +1,82 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from aa_edit_data.algorithms import apply_min_period
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.checkpoint import Checkpoint
+
+TEST_DATA = Path("tests/test_data")
+
+
+class Interrupted(Exception):
+    pass
+
+
+# Number of samples to yield before simulating the run being stopped
+stop_after: int | None = None
+
+
+def interruptible_min_period(samples, period, state=None):
+    for i, sample in enumerate(apply_min_period(samples, period, state=state)):
+        if stop_after is not None and i == stop_after:
+            raise Interrupted
+        yield sample
+
+
+def run(ad: ArchiverData, write: Path, period: float, stop: int | None, **kwargs):
+    global stop_after
+    stop_after = stop
+    try:
+        ad.process_and_write(write, False, interruptible_min_period, [period], **kwargs)
+    finally:
+        stop_after = None
+
+
+@pytest.mark.parametrize("lazy", [True, False])
+def test_checkpoint_resume(tmp_path, lazy):
+    read = tmp_path / "RAW:2025.pb"
+    expected = tmp_path / "RAW:2025_expected.pb"
+    shutil.copy(TEST_DATA / "RAW:2025_short.pb", read)
+    ArchiverData(read).process_and_write(expected, False, apply_min_period, [0.5])
+
+    ad = ArchiverData(read)
+    checkpoint = Checkpoint(read, interval=0)
+    with pytest.raises(Interrupted):
+        run(ad, read, 0.5, 60, lazy=lazy, checkpoint=checkpoint)
+    assert read.read_bytes() == (TEST_DATA / "RAW:2025_short.pb").read_bytes()
+    assert checkpoint.partial.is_file()
+    assert checkpoint.filepath.is_file()
+
+    checkpoint = Checkpoint(read, interval=0, resume=True)
+    # The resumed run must not repeat the samples written before it was stopped
+    with pytest.raises(Interrupted):
+        run(ad, read, 0.5, 60, lazy=lazy, checkpoint=checkpoint)
+    checkpoint = Checkpoint(read, interval=0, resume=True)
+    run(ad, read, 0.5, None, lazy=lazy, checkpoint=checkpoint)
+    assert read.read_bytes() == expected.read_bytes()
+    assert sorted(os.listdir(tmp_path)) == [read.name, expected.name]
+
+
+def test_checkpoint_different_run(tmp_path):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    write = tmp_path / "RAW:2025_reduced.pb"
+    expected = tmp_path / "RAW:2025_expected.pb"
+    ad = ArchiverData(read)
+    ad.process_and_write(expected, False, interruptible_min_period, [0.2])
+    with pytest.raises(Interrupted):
+        run(ad, write, 0.5, 10, checkpoint=Checkpoint(write, interval=0))
+    # The checkpoint is for a different period, so it is ignored
+    run(ad, write, 0.2, None, checkpoint=Checkpoint(write, interval=0, resume=True))
+    assert write.read_bytes() == expected.read_bytes()
+
+
+def test_checkpoint_compressed(tmp_path):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    write = tmp_path / "RAW:2025_reduced.pb.gz"
+    with pytest.raises(ValueError):
+        ArchiverData(read).process_and_write(
+            write, False, apply_min_period, [1], checkpoint=Checkpoint(write)
+        )
@@ -0,0 +1,115 @@
+import filecmp
+import gzip
+from pathlib import Path
+
+import pytest
+
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.cold import read_cold, write_cold
+from aa_edit_data.generated import EPICSEvent_pb2
+from aa_edit_data.wire import encode_varint
+
+TEST_DATA = Path("tests/test_data")
+PB_FILES = sorted(
+    path.name
+    for path in TEST_DATA.glob("*.pb")
+    if path.name.endswith(("_test_data.pb", "_short.pb"))
+)
+
+
+def round_trip(tmp_path: Path, read: Path, block_size: int = 2**20) -> Path:
+    cold = tmp_path / "file.cold"
+    write = tmp_path / "restored.pb"
+    write_cold(read, cold, block_size=block_size)
+    read_cold(cold, write)
+    return write
+
+
+@pytest.mark.parametrize("filename", PB_FILES)
+def test_cold_round_trip(tmp_path, filename):
+    read = TEST_DATA / filename
+    cold = tmp_path / "file.cold"
+    write = tmp_path / "restored.pb"
+    count = write_cold(read, cold)
+    assert cold.stat().st_size < read.stat().st_size
+    assert (
+        read_cold(cold, write) == count == len(list(ArchiverData(read).get_samples()))
+    )
+    assert filecmp.cmp(read, write, shallow=False)
+
+
+@pytest.mark.parametrize(
+    "filename", ["P:2021_short.pb", "WAVEFORM_STRING_test_data.pb"]
+)
+def test_cold_round_trip_blocks(tmp_path, filename):
+    read = TEST_DATA / filename
+    assert filecmp.cmp(read, round_trip(tmp_path, read, block_size=7), shallow=False)
+
+
+def test_cold_compressed_input(tmp_path):
+    original = TEST_DATA / "RAW:2025_short.pb"
+    read = tmp_path / "RAW:2025_short.pb.gz"
+    read.write_bytes(gzip.compress(original.read_bytes()))
+    assert filecmp.cmp(original, round_trip(tmp_path, read), shallow=False)
+
+
+def test_cold_lines_stored_as_they_are(tmp_path):
+    with open(TEST_DATA / "RAW:2025_short.pb", "rb") as f:
+        lines = f.readlines()
+    odd_lines = [
+        # Bad escape sequence
+        lines[1][:-1] + b"\x1b\x05\n",
+        # Unescaped carriage return
+        b"\x08\x01\x10\r\x1d\x00\x00\x00\x00\n",
+        # Varint in more bytes than it needs
+        b"\x08\x01\x10\x85\x00\x1d\x01\x00\x00\x00\n",
+        # Too many nanoseconds
+        b"\x08\x01\x10" + encode_varint(10**9 + 5) + b"\x1d\x01\x00\x00\x00\n",
+        # No val field
+        b"\x08\x01\x10\x02\n",
+    ]
+    read = tmp_path / "odd.pb"
+    with open(read, "wb") as f:
+        # A partly written last line
+        f.writelines(lines[:3] + odd_lines + lines[3:10] + [lines[10][:5]])
+    assert filecmp.cmp(read, round_trip(tmp_path, read), shallow=False)
+
+
+def test_cold_waveform_lengths(tmp_path):
+    with open(TEST_DATA / "WAVEFORM_DOUBLE_test_data.pb", "rb") as f:
+        header = f.readline()
+    samples = [
+        EPICSEvent_pb2.VectorDouble(
+            secondsintoyear=i, nano=i * 1000, val=[0.5 * i] * length
+        )
+        for i, length in enumerate([3, 3, 0, 5, 5, 5, 1])
+    ]
+    lines = [ArchiverData.escape_line(s.SerializePartialToString()) for s in samples]
+    # An empty packed field, which is not written for an empty waveform
+    lines.append(b"\x08\x07\x10\x00\x1a\x00\n")
+    read = tmp_path / "waveforms.pb"
+    with open(read, "wb") as f:
+        f.writelines([header, *lines])
+    assert filecmp.cmp(read, round_trip(tmp_path, read), shallow=False)
+
+
+def test_read_cold_errors(tmp_path):
+    read = TEST_DATA / "SCALAR_DOUBLE_test_data.pb"
+    cold = tmp_path / "file.cold"
+    write = tmp_path / "restored.pb"
+    with pytest.raises(ValueError, match="not a cold file"):
+        read_cold(read, write)
+    write_cold(read, cold)
+    data = cold.read_bytes()
+    cold.write_bytes(data[:-40])
+    with pytest.raises(ValueError, match="truncated"):
+        read_cold(cold, write)
+    cold.write_bytes(data[:-1] + bytes([data[-1] ^ 1]))
+    with pytest.raises(ValueError, match="did not reproduce"):
+        read_cold(cold, write)
+    assert not write.exists()
+
+
+def test_write_cold_to_stdout():
+    with pytest.raises(ValueError, match="standard output"):
+        write_cold(TEST_DATA / "SCALAR_DOUBLE_test_data.pb", Path("-"))
@@ -0,0 +1,95 @@
+import filecmp
+import gzip
+from pathlib import Path
+
+import pytest
+
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.compression import (
+    add_to_stem,
+    get_compression,
+    open_pb_read,
+    open_pb_write,
+    strip_compression_suffix,
+)
+
+TEST_DATA = Path("tests/test_data")
+
+
+def test_get_compression():
+    assert get_compression(Path("RAW:2025.pb")) is None
+    assert get_compression(Path("RAW:2025.pb.gz")) == "gzip"
+    assert get_compression(Path("RAW:2025.pb.zst")) == "zstd"
+    assert get_compression(Path("RAW:2025.pb.xz")) == "xz"
+
+
+def test_strip_compression_suffix():
+    assert strip_compression_suffix(Path("a/RAW:2025.pb.zst")) == Path(
+        Path("a/RAW:2025.pb")
+    )
+    assert strip_compression_suffix(Path("a/RAW:2025.pb")) == Path(
+        Path("a/RAW:2025.pb")
+    )
+
+
+def test_add_to_stem():
+    assert add_to_stem(Path("a/RAW:2025.pb.gz"), "_backup") == Path(
+        "a/RAW:2025_backup.pb.gz"
+    )
+    assert add_to_stem(Path("a/RAW:2025.pb"), "_tmp") == Path("a/RAW:2025_tmp.pb")
+
+
+@pytest.mark.parametrize("suffix", [".gz", ".zst", ".xz"])
+@pytest.mark.parametrize("threaded", [True, False])
+def test_round_trip(tmp_path, suffix, threaded):
+    read = TEST_DATA / "WAVEFORM_DOUBLE_test_data.pb"
+    compressed = tmp_path / f"WAVEFORM_DOUBLE_test_data.pb{suffix}"
+    with open(read, "rb") as f_in, open_pb_write(compressed, threaded) as f_out:
+        f_out.write(f_in.read())
+    assert compressed.read_bytes() != read.read_bytes()
+    with open_pb_read(compressed, threaded) as f:
+        assert f.read() == read.read_bytes()
+
+
+@pytest.mark.parametrize("suffix", [".gz", ".zst", ".xz"])
+@pytest.mark.parametrize("threaded", [True, False])
+def test_read_concatenated_streams(tmp_path, suffix, threaded):
+    data = (TEST_DATA / "WAVEFORM_DOUBLE_test_data.pb").read_bytes()
+    half = len(data) // 2
+    compressed = tmp_path / f"WAVEFORM_DOUBLE_test_data.pb{suffix}"
+    # Two separately compressed streams, e.g. zstd frames written by pzstd
+    with open(compressed, "wb") as f:
+        for part in (data[:half], data[half:]):
+            with open_pb_write(tmp_path / f"part{suffix}") as f_part:
+                f_part.write(part)
+            f.write((tmp_path / f"part{suffix}").read_bytes())
+    with open_pb_read(compressed, threaded) as f:
+        assert f.read() == data
+
+
+def test_compression_detected_from_content(tmp_path):
+    read = TEST_DATA / "SCALAR_INT_test_data.pb"
+    compressed = tmp_path / "SCALAR_INT_test_data.pb"
+    compressed.write_bytes(gzip.compress(read.read_bytes()))
+    with open_pb_read(compressed) as f:
+        assert f.read() == read.read_bytes()
+
+
+def test_read_closed_early(tmp_path):
+    compressed = tmp_path / "large.pb.gz"
+    compressed.write_bytes(gzip.compress(b"0123456789\n" * 10**6))
+    with open_pb_read(compressed) as f:
+        assert f.readline() == b"0123456789\n"
+
+
+@pytest.mark.parametrize("suffix", [".gz", ".zst", ".xz"])
+def test_archiver_data_compressed(tmp_path, suffix):
+    read = TEST_DATA / "SCALAR_STRING_test_data.pb"
+    compressed = tmp_path / f"SCALAR_STRING_test_data.pb{suffix}"
+    result = tmp_path / "SCALAR_STRING_test_data.pb"
+    ArchiverData(read).write_pb(compressed)
+    ad = ArchiverData(compressed)
+    assert ad.pv_type == "SCALAR_STRING"
+    assert [s.val for s in ad.get_samples()] == [str(i) for i in range(100)]
+    ad.write_pb(result)
+    assert filecmp.cmp(read, result, shallow=False)
@@ -0,0 +1,99 @@
+import filecmp
+import gzip
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from aa_edit_data.algorithms import remove_by_factor
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.delta import (
+    MAGIC,
+    RECORD,
+    default_delta_filename,
+    restore_delta,
+    write_delta,
+)
+
+TEST_DATA = Path("tests/test_data")
+
+
+def test_default_delta_filename():
+    assert default_delta_filename(Path("a/RAW:2025.pb.gz")) == Path(
+        "a/RAW:2025_backup.pbdelta"
+    )
+
+
+@pytest.mark.parametrize("suffix", ["", ".gz"])
+def test_delta_round_trip(tmp_path, suffix):
+    original = TEST_DATA / "WAVEFORM_DOUBLE_test_data.pb"
+    edited = tmp_path / f"WAVEFORM_DOUBLE_test_data.pb{suffix}"
+    delta = tmp_path / "WAVEFORM_DOUBLE_test_data.pbdelta"
+    restored = tmp_path / "WAVEFORM_DOUBLE_test_data_restored.pb"
+    ArchiverData(original).process_and_write(
+        edited, False, remove_by_factor, [3], raw=True, delta_filepath=delta
+    )
+    assert delta.stat().st_size < original.stat().st_size
+    restore_delta(edited, delta, restored)
+    assert filecmp.cmp(original, restored, shallow=False)
+
+
+def test_delta_long_removed_range(tmp_path, monkeypatch):
+    monkeypatch.setattr("aa_edit_data.delta.CHUNK_SIZE", 1000)
+    original = TEST_DATA / "P:2021_short.pb"
+    header, *lines = original.read_bytes().splitlines(keepends=True)
+    edited = tmp_path / "P:2021.pb"
+    delta = tmp_path / "P:2021.pbdelta"
+    restored = tmp_path / "P:2021_restored.pb"
+    # Remove one long contiguous range, as remove-after does
+    edited.write_bytes(header + b"".join(lines[:100]))
+    write_delta(original, edited, delta)
+    restore_delta(edited, delta, restored)
+    assert filecmp.cmp(original, restored, shallow=False)
+    lengths = []
+    with gzip.GzipFile(delta, "rb") as f:
+        assert f.read(len(MAGIC)) == MAGIC
+        while length := RECORD.unpack(f.read(RECORD.size))[1]:
+            lengths.append(length)
+            f.seek(length, os.SEEK_CUR)
+    longest_line = max(len(line) for line in lines)
+    assert sum(lengths) == sum(len(line) for line in lines[100:])
+    assert len(lengths) > 1
+    assert max(lengths) < 1000 + longest_line
+
+
+def test_delta_in_place(tmp_path):
+    original = TEST_DATA / "SCALAR_STRING_test_data.pb"
+    edited = tmp_path / "SCALAR_STRING_test_data.pb"
+    delta = tmp_path / "SCALAR_STRING_test_data.pbdelta"
+    shutil.copy(original, edited)
+    ad = ArchiverData(edited)
+    ad.process_and_write(edited, False, remove_by_factor, [2], delta_filepath=delta)
+    assert not filecmp.cmp(original, edited, shallow=False)
+    restore_delta(edited, delta, edited)
+    assert filecmp.cmp(original, edited, shallow=False)
+    assert sorted(os.listdir(tmp_path)) == [edited.name, delta.name]
+
+
+def test_delta_changed_samples(tmp_path):
+    original = TEST_DATA / "SCALAR_STRING_test_data.pb"
+    edited = tmp_path / "SCALAR_STRING_test_data.pb"
+    delta = tmp_path / "SCALAR_STRING_test_data.pbdelta"
+    edited.write_bytes(original.read_bytes() + b"extra\n")
+    with pytest.raises(ValueError):
+        write_delta(original, edited, delta)
+    assert not delta.exists()
+
+
+def test_restore_wrong_file(tmp_path):
+    original = TEST_DATA / "SCALAR_STRING_test_data.pb"
+    edited = tmp_path / "SCALAR_STRING_test_data.pb"
+    delta = tmp_path / "SCALAR_STRING_test_data.pbdelta"
+    ArchiverData(original).process_and_write(
+        edited, False, remove_by_factor, [2], raw=True, delta_filepath=delta
+    )
+    edited.write_bytes(edited.read_bytes()[:-10])
+    with pytest.raises(ValueError):
+        restore_delta(edited, delta, edited)
+    assert sorted(os.listdir(tmp_path)) == [edited.name, delta.name]
@@ -1,9 +1,13 @@
 import filecmp
+import json
+import os
+import shutil
 import subprocess
 import sys
 from os import PathLike
 from pathlib import Path
 
+import pytest
 from typer.testing import CliRunner
 
 from aa_edit_data import __version__
@@ -46,6 +50,17 @@ def test_cli_reduce_to_period():
     write.unlink()
 
 
+def test_cli_reduce_to_period_write_txt_waveform(tmp_path):
+    read = TEST_DATA / "WAVEFORM_DOUBLE_test_data.pb"
+    write = tmp_path / "WAVEFORM_DOUBLE.pb"
+    cmd = ["reduce-to-period", str(read), "0.000001", f"--new-filename={write}", "-t"]
+    result = runner.invoke(app, cmd)
+    assert result.exit_code == 0
+    assert filecmp.cmp(
+        write.with_suffix(".txt"), read.with_suffix(".txt"), shallow=False
+    )
+
+
 def test_cli_reduce_to_period_invalid_period():
     read = TEST_DATA / "SCALAR_STRING_test_data.pb"
     write = RESULTS / "SCALAR_STRING_reduce_to_period_invalid_period.pb"
@@ -483,3 +498,393 @@ def try_to_remove(filepath: PathLike):
     filepath = Path(filepath)
     if filepath.is_file():
         filepath.unlink()
+
+
+def test_cli_reduce_by_factor_stats_json():
+    read = TEST_DATA / "SCALAR_STRING_test_data.pb"
+    write = RESULTS / "SCALAR_STRING_reduce_by_factor_stats.pb"
+    stats_json = RESULTS / "SCALAR_STRING_reduce_by_factor_stats.json"
+    cmd = [
+        "reduce-by-factor",
+        str(read),
+        "3",
+        f"--new-filename={write}",
+        f"--stats-json={stats_json}",
+        "--profile",
+    ]
+    result = runner.invoke(app, cmd)
+    assert result.exit_code == 0
+    assert "reduction ratio 2.94" in result.stderr
+    with open(stats_json) as f:
+        stats = json.load(f)
+    assert stats["samples_in"] == 100
+    assert stats["samples_out"] == 34
+    assert stats["bytes_out"] == write.stat().st_size
+    write.unlink()
+    stats_json.unlink()
+
+
+def test_cli_reduce_by_factor_compressed(tmp_path):
+    read = tmp_path / "SCALAR_STRING_test_data.pb.gz"
+    write = tmp_path / "SCALAR_STRING_reduce_by_factor.pb.zst"
+    expected = CLI_OUTPUT / "SCALAR_STRING_reduce_by_factor.pb"
+    ArchiverData(TEST_DATA / "SCALAR_STRING_test_data.pb").write_pb(read)
+    cmd = ["reduce-by-factor", str(read), "3", f"--new-filename={write}"]
+    result = runner.invoke(app, cmd)
+    assert result.exit_code == 0
+    result_pb = tmp_path / "result.pb"
+    ArchiverData(write).write_pb(result_pb)
+    assert filecmp.cmp(result_pb, expected, shallow=False)
+
+
+def test_cli_reduce_by_factor_compressed_in_place(tmp_path):
+    read = tmp_path / "SCALAR_STRING_test_data.pb.xz"
+    ArchiverData(TEST_DATA / "SCALAR_STRING_test_data.pb").write_pb(read)
+    cmd = ["reduce-by-factor", str(read), "3"]
+    result = runner.invoke(app, cmd)
+    assert result.exit_code == 0
+    assert (tmp_path / "SCALAR_STRING_test_data_backup.pb.xz").is_file()
+    assert len(list(ArchiverData(read).get_samples())) == 34
+
+
+def test_cli_remove_before_stdin_stdout():
+    read = TEST_DATA / "SCALAR_STRING_test_data.pb"
+    expected = CLI_OUTPUT / "SCALAR_STRING_remove_before.pb"
+    cmd = ["remove-before", "-", "1,1,0,1,5"]
+    result = runner.invoke(app, cmd, input=read.read_bytes())
+    assert result.exit_code == 0
+    assert result.stdout_bytes == expected.read_bytes()
+
+
+def test_cli_reduce_by_factor_stdin_new_filename():
+    read = TEST_DATA / "SCALAR_STRING_test_data.pb"
+    write = RESULTS / "SCALAR_STRING_reduce_by_factor_stdin.pb"
+    expected = CLI_OUTPUT / "SCALAR_STRING_reduce_by_factor.pb"
+    cmd = ["reduce-by-factor", "-", "3", "-o", str(write)]
+    result = runner.invoke(app, cmd, input=read.read_bytes())
+    assert result.exit_code == 0
+    are_identical = filecmp.cmp(write, expected, shallow=False)
+    write.unlink()
+    assert are_identical
+
+
+def test_cli_reduce_by_factor_stdin_backup():
+    read = TEST_DATA / "SCALAR_STRING_test_data.pb"
+    backup = RESULTS / "SCALAR_STRING_reduce_by_factor_stdin_backup.pb"
+    cmd = ["reduce-by-factor", "-", "3", f"--backup-filename={backup}"]
+    result = runner.invoke(app, cmd, input=read.read_bytes())
+    assert result.exit_code != 0
+    assert isinstance(result.exception, ValueError)
+
+
+def test_cli_reduce_to_period_stdout_txt():
+    read = TEST_DATA / "SCALAR_STRING_test_data.pb"
+    cmd = ["reduce-to-period", str(read), "4.5", "-o", "-", "-t"]
+    result = runner.invoke(app, cmd)
+    assert result.exit_code != 0
+    assert isinstance(result.exception, ValueError)
+
+
+def test_cli_reduce_by_factor_delta_backup_and_restore(tmp_path):
+    original = TEST_DATA / "SCALAR_STRING_test_data.pb"
+    read = tmp_path / "SCALAR_STRING_test_data.pb"
+    expected = CLI_OUTPUT / "SCALAR_STRING_reduce_by_factor.pb"
+    shutil.copy(original, read)
+    cmd = ["reduce-by-factor", str(read), "3", "--delta-backup"]
+    result = runner.invoke(app, cmd)
+    assert result.exit_code == 0
+    assert filecmp.cmp(read, expected, shallow=False)
+    assert (tmp_path / "SCALAR_STRING_test_data_backup.pbdelta").is_file()
+    result = runner.invoke(app, ["restore", str(read)])
+    assert result.exit_code == 0
+    assert filecmp.cmp(read, original, shallow=False)
+
+
+def test_cli_delta_backup_invalid_filename(tmp_path):
+    read = TEST_DATA / "SCALAR_STRING_test_data.pb"
+    backup = tmp_path / "SCALAR_STRING_test_data_backup.pb"
+    cmd = ["reduce-by-factor", str(read), "3", f"--backup-filename={backup}"]
+    result = runner.invoke(app, [*cmd, "--delta-backup"])
+    assert result.exit_code != 0
+    assert isinstance(result.exception, ValueError)
+
+
+def test_cli_reduce_to_period_state_file(tmp_path):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    growing = tmp_path / "RAW:2025.pb"
+    write = tmp_path / "RAW:2025_reduced.pb"
+    expected = tmp_path / "RAW:2025_expected.pb"
+    state_file = tmp_path / "state.json"
+    runner.invoke(app, ["reduce-to-period", str(read), "2", "-o", str(expected)])
+    header, *lines = read.read_bytes().splitlines(keepends=True)
+    growing.write_bytes(header + b"".join(lines[:500]))
+    cmd = ["reduce-to-period", str(growing), "2", "-o", str(write)]
+    cmd += ["--state-file", str(state_file)]
+    result = runner.invoke(app, cmd)
+    assert result.exit_code == 0
+    with open(growing, "ab") as f:
+        f.write(b"".join(lines[500:]))
+    result = runner.invoke(app, cmd)
+    assert result.exit_code == 0
+    assert write.read_bytes() == expected.read_bytes()
+
+
+@pytest.mark.parametrize(
+    "args",
+    [
+        ["reduce-to-period", "2"],
+        ["reduce-by-factor", "3"],
+        ["remove-before", "1,2"],
+        ["remove-after", "1,2"],
+        ["dedup", "--by", "timestamp"],
+        ["remove-unchanged"],
+        ["strip-fields"],
+    ],
+)
+def test_cli_state_file_matches_full_run(tmp_path, args):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    write = tmp_path / "RAW:2025_incremental.pb"
+    expected = tmp_path / "RAW:2025_expected.pb"
+    command, *options = args
+    result = runner.invoke(app, [command, str(read), *options, "-o", str(expected)])
+    assert result.exit_code == 0
+    cmd = [command, str(read), *options, "-o", str(write)]
+    result = runner.invoke(app, [*cmd, "--state-file", str(tmp_path / "state.json")])
+    assert result.exit_code == 0
+    assert write.read_bytes() == expected.read_bytes()
+
+
+def test_cli_state_file_needs_new_filename(tmp_path):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    cmd = ["reduce-to-period", str(read), "2", "--state-file", str(tmp_path / "s")]
+    result = runner.invoke(app, cmd)
+    assert isinstance(result.exception, ValueError)
+
+
+@pytest.mark.parametrize(
+    "options",
+    [
+        ["--delta-backup"],
+        ["--checkpoint-interval", "10"],
+        ["--resume"],
+        ["--profile"],
+        ["--stats-json", "stats.json"],
+    ],
+)
+def test_cli_state_file_unsupported_options(tmp_path, options):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    write = tmp_path / "RAW:2025_reduced.pb"
+    cmd = ["reduce-to-period", str(read), "2", "-o", str(write)]
+    cmd += ["--state-file", str(tmp_path / "state.json"), *options]
+    result = runner.invoke(app, cmd)
+    assert result.exit_code == 2
+    assert f"--state-file cannot be used with {options[0]}" in result.output
+    assert not write.exists()
+
+
+def test_cli_reduce_to_period_checkpoint(tmp_path):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    write = tmp_path / "RAW:2025_reduced.pb"
+    expected = tmp_path / "RAW:2025_expected.pb"
+    runner.invoke(app, ["reduce-to-period", str(read), "2", "-o", str(expected)])
+    cmd = ["reduce-to-period", str(read), "2", "-o", str(write)]
+    result = runner.invoke(app, [*cmd, "--checkpoint-interval", "0", "--resume"])
+    assert result.exit_code == 0
+    assert write.read_bytes() == expected.read_bytes()
+    assert sorted(os.listdir(tmp_path)) == [expected.name, write.name]
+
+
+def test_cli_merge(tmp_path):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    header, *lines = read.read_bytes().splitlines(keepends=True)
+    first = tmp_path / "first.pb"
+    second = tmp_path / "second.pb"
+    first.write_bytes(header + b"".join(lines[:300]))
+    second.write_bytes(header + b"".join(lines[200:]))
+    write = tmp_path / "merged.pb"
+    cmd = ["merge", str(first), str(second), "-o", str(write), "--drop-duplicates"]
+    result = runner.invoke(app, [*cmd, "--raw"])
+    assert result.exit_code == 0
+    assert filecmp.cmp(write, read, shallow=False)
+
+
+def test_cli_merge_missing_file(tmp_path):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    cmd = ["merge", str(read), str(tmp_path / "missing.pb"), "-o", "merged.pb"]
+    result = runner.invoke(app, cmd)
+    assert isinstance(result.exception, FileNotFoundError)
+
+
+def test_cli_split(tmp_path):
+    read = TEST_DATA / "P:2021_short.pb"
+    cmd = ["split", str(read), "--by", "day", "--output-dir", str(tmp_path)]
+    result = runner.invoke(app, cmd)
+    assert result.exit_code == 0
+    names = ["P:2021_short_05_28.pb", "P:2021_short_05_29.pb", "P:2021_short_05_30.pb"]
+    assert result.stdout.split() == [str(tmp_path / name) for name in names]
+    data = b"".join(
+        b"".join(ArchiverData(tmp_path / name).get_samples_bytes()) for name in names
+    )
+    assert data == b"".join(ArchiverData(read).get_samples_bytes())
+
+
+def test_cli_split_force(tmp_path):
+    read = TEST_DATA / "P:2021_short.pb"
+    cmd = ["split", str(read), "--by", "day", "--output-dir", str(tmp_path)]
+    assert runner.invoke(app, cmd).exit_code == 0
+    result = runner.invoke(app, cmd)
+    assert isinstance(result.exception, FileExistsError)
+    result = runner.invoke(app, [*cmd, "--force"])
+    assert result.exit_code == 0
+    assert len(result.stdout.split()) == 3
+
+
+def test_cli_split_invalid_by():
+    read = TEST_DATA / "P:2021_short.pb"
+    result = runner.invoke(app, ["split", str(read), "--by", "week"])
+    assert result.exit_code == 2
+
+
+def test_cli_repair_order(tmp_path):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    header, *lines = read.read_bytes().splitlines(keepends=True)
+    scrambled = tmp_path / "RAW:2025.pb"
+    scrambled.write_bytes(header + b"".join(lines[100:] + lines[:100]))
+    cmd = ["repair-order", str(scrambled), "--memory", "1", "--temp-dir", str(tmp_path)]
+    result = runner.invoke(app, cmd)
+    assert result.exit_code == 0
+    assert result.stdout.strip() == f"1 of {len(lines)} samples were out of order"
+    assert filecmp.cmp(scrambled, read, shallow=False)
+    assert sorted(os.listdir(tmp_path)) == ["RAW:2025.pb", "RAW:2025_backup.pb"]
+
+
+def test_cli_dedup(tmp_path):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    header, *lines = read.read_bytes().splitlines(keepends=True)
+    write = tmp_path / "RAW:2025.pb"
+    write.write_bytes(
+        header + b"".join(line * (i % 3 + 1) for i, line in enumerate(lines))
+    )
+    result = runner.invoke(app, ["dedup", str(write), "--by", "timestamp"])
+    assert result.exit_code == 0
+    assert filecmp.cmp(write, read, shallow=False)
+    assert sorted(os.listdir(tmp_path)) == ["RAW:2025.pb", "RAW:2025_backup.pb"]
+
+
+def test_cli_dedup_checkpoint(tmp_path):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    header, *lines = read.read_bytes().splitlines(keepends=True)
+    duplicated = tmp_path / "duplicated.pb"
+    duplicated.write_bytes(header + b"".join(line * 2 for line in lines))
+    write = tmp_path / "RAW:2025.pb"
+    cmd = ["dedup", str(duplicated), "--keep", "last", "-o", str(write)]
+    result = runner.invoke(app, [*cmd, "--checkpoint-interval", "0"])
+    assert result.exit_code == 0
+    assert filecmp.cmp(write, read, shallow=False)
+
+
+def test_cli_remove_unchanged(tmp_path):
+    read = TEST_DATA / "WAVEFORM_INT_test_data.pb"
+    header, *lines = read.read_bytes().splitlines(keepends=True)
+    ad = ArchiverData(read)
+    repeated = []
+    for line in lines:
+        sample = ad.deserialize(line, ad.proto_class)
+        repeated.append(line)
+        sample.nano += 1
+        repeated.append(ad.serialize(sample))
+    write = tmp_path / "WAVEFORM_INT.pb"
+    write.write_bytes(header + b"".join(repeated))
+    result = runner.invoke(app, ["remove-unchanged", str(write)])
+    assert result.exit_code == 0
+    assert filecmp.cmp(write, read, shallow=False)
+
+
+def test_cli_strip_fields(tmp_path):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    ad = ArchiverData(read)
+    lines = [ad.serialize(ad.header)]
+    for i, sample in enumerate(ad.get_samples()):
+        if i % 100 == 0:
+            sample.fieldvalues.add(name="DESC", val="Raw\nvalue")  # type: ignore
+            sample.fieldactualchange = True  # type: ignore
+        lines.append(ad.serialize(sample))
+    write = tmp_path / "RAW:2025.pb"
+    write.write_bytes(b"".join(lines))
+    result = runner.invoke(app, ["strip-fields", str(write)])
+    assert result.exit_code == 0
+    assert filecmp.cmp(write, read, shallow=False)
+    assert sorted(os.listdir(tmp_path)) == ["RAW:2025.pb", "RAW:2025_backup.pb"]
+
+    changed = tmp_path / "changed.pb"
+    cmd = ["strip-fields", str(tmp_path / "RAW:2025_backup.pb"), "-o", str(changed)]
+    result = runner.invoke(app, [*cmd, "--keep-changed"])
+    assert result.exit_code == 0
+    samples = list(ArchiverData(changed).get_samples())
+    assert [i for i, sample in enumerate(samples) if sample.fieldvalues] == [0]
+
+
+def test_cli_strip_fields_delta_backup(tmp_path):
+    write = tmp_path / "RAW:2025.pb"
+    shutil.copy(TEST_DATA / "RAW:2025_short.pb", write)
+    result = runner.invoke(app, ["strip-fields", str(write), "--delta-backup"])
+    assert result.exit_code == 2
+    assert "--delta-backup" in result.output
+    assert os.listdir(tmp_path) == ["RAW:2025.pb"]
+    assert filecmp.cmp(write, TEST_DATA / "RAW:2025_short.pb", shallow=False)
+
+
+def test_cli_dedup_invalid_by():
+    read = TEST_DATA / "RAW:2025_short.pb"
+    result = runner.invoke(app, ["dedup", str(read), "--by", "value"])
+    assert result.exit_code == 2
+
+
+def test_cli_extract_element(tmp_path):
+    read = TEST_DATA / "WAVEFORM_DOUBLE_test_data.pb"
+    write = tmp_path / "WAVEFORM_DOUBLE.pb"
+    shutil.copy(read, write)
+    result = runner.invoke(app, ["extract-element", str(write), "--index", "2"])
+    assert result.exit_code == 0
+    assert filecmp.cmp(tmp_path / "WAVEFORM_DOUBLE_backup.pb", read, shallow=False)
+    ad = ArchiverData(write)
+    assert ad.pv_type == "SCALAR_DOUBLE"
+    assert [sample.val for sample in ad.get_samples()] == [
+        sample.val[2]  # type: ignore
+        for sample in ArchiverData(read).get_samples()
+    ]
+
+    write = tmp_path / "range.pb"
+    cmd = ["extract-element", str(read), "--range", ":2", "-o", str(write)]
+    result = runner.invoke(app, cmd)
+    assert result.exit_code == 0
+    expected = [sample.val[:2] for sample in ArchiverData(read).get_samples()]  # type: ignore
+    samples = ArchiverData(write).get_samples()
+    assert [sample.val for sample in samples] == expected
+
+
+def test_cli_extract_element_invalid_options():
+    read = TEST_DATA / "WAVEFORM_DOUBLE_test_data.pb"
+    result = runner.invoke(app, ["extract-element", str(read)])
+    assert result.exit_code == 2
+    cmd = ["extract-element", str(read), "--index", "1", "--range", "0:2"]
+    assert runner.invoke(app, cmd).exit_code == 2
+    cmd = ["extract-element", str(read), "--range", "2"]
+    assert runner.invoke(app, cmd).exit_code == 2
+
+
+def test_cli_narrow_type(tmp_path):
+    read = TEST_DATA / "P:2021_short.pb"
+    write = tmp_path / "P:2021.pb"
+    shutil.copy(read, write)
+    result = runner.invoke(app, ["narrow-type", str(write)])
+    assert result.exit_code == 0
+    assert filecmp.cmp(tmp_path / "P:2021_backup.pb", read, shallow=False)
+    assert ArchiverData(write).pv_type == "SCALAR_FLOAT"
+    assert write.stat().st_size < read.stat().st_size
+
+    cmd = ["narrow-type", str(read), "-o", str(write), "--keep-double"]
+    assert runner.invoke(app, cmd).exit_code == 2
+    result = runner.invoke(app, [*cmd, "--mantissa-bits", "12"])
+    assert result.exit_code == 0
+    assert ArchiverData(write).pv_type == "SCALAR_DOUBLE"
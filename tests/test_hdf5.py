@@ -0,0 +1,60 @@
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.hdf5 import write_hdf5
+
+h5py = pytest.importorskip("h5py")
+
+TEST_DATA = Path("tests/test_data")
+
+
+@pytest.mark.parametrize("pv_type", ["DOUBLE", "FLOAT", "INT", "SHORT", "ENUM"])
+def test_write_hdf5(tmp_path, pv_type):
+    read = TEST_DATA / f"WAVEFORM_{pv_type}_test_data.pb"
+    write = tmp_path / "waveform.h5"
+    assert write_hdf5(read, write, batch_size=16) == 100
+    ad = ArchiverData(read)
+    samples = list(ad.get_samples())
+    epoch = datetime(ad.header.year, 1, 1, tzinfo=timezone.utc).timestamp()
+    with h5py.File(write) as f:
+        assert f.attrs["type"] == f"WAVEFORM_{pv_type}"
+        assert f.attrs["pvname"] == ad.header.pvname
+        assert f["val"].shape == (100, 5)
+        assert f["val"].compression == "gzip"
+        assert f["val"][:].tolist() == [list(sample.val) for sample in samples]  # type: ignore
+        assert f["nano"][:].tolist() == [sample.nano for sample in samples]
+        assert f["status"][:].tolist() == [sample.status for sample in samples]
+        assert f["element_count"][:].tolist() == [5] * 100
+        assert f["timestamp"][0] == pytest.approx(
+            epoch + samples[0].secondsintoyear + samples[0].nano / 10**9
+        )
+
+
+def test_write_hdf5_changing_length(tmp_path):
+    ad = ArchiverData(TEST_DATA / "WAVEFORM_DOUBLE_test_data.pb")
+    values = [[1.0, 2.0], [3.0], [4.0, 5.0, 6.0]]
+    lines = [ad.serialize(ad.header)]
+    for i, val in enumerate(values):
+        sample = ad.proto_class(secondsintoyear=i, nano=0, val=val)  # type: ignore
+        lines.append(ad.serialize(sample))
+    read = tmp_path / "WAVEFORM_DOUBLE.pb"
+    read.write_bytes(b"".join(lines))
+    write = tmp_path / "waveform.h5"
+    write_hdf5(read, write)
+    with h5py.File(write) as f:
+        assert f["val"].shape == (3, 3)
+        assert f["element_count"][:].tolist() == [2, 1, 3]
+        rows = f["val"][:].tolist()
+    assert [row[:n] for row, n in zip(rows, [2, 1, 3], strict=True)] == values
+    assert rows[1][1] != rows[1][1]  # Padded with NaN
+
+
+def test_write_hdf5_invalid(tmp_path):
+    with pytest.raises(ValueError):
+        write_hdf5(TEST_DATA / "SCALAR_DOUBLE_test_data.pb", tmp_path / "scalar.h5")
+    assert not (tmp_path / "scalar.h5").exists()
+    with pytest.raises(ValueError):
+        write_hdf5(TEST_DATA / "WAVEFORM_DOUBLE_test_data.pb", Path("-"))
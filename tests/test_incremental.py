@@ -0,0 +1,91 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from aa_edit_data.algorithms import apply_min_period, remove_after_ts, remove_by_factor
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.incremental import process_incremental
+
+TEST_DATA = Path("tests/test_data")
+
+
+def split_lines(filepath: Path) -> tuple[bytes, list[bytes]]:
+    header, *lines = filepath.read_bytes().splitlines(keepends=True)
+    return header, lines
+
+
+@pytest.mark.parametrize(
+    "func, args, raw",
+    [
+        (apply_min_period, [0.5], False),
+        (remove_by_factor, [7], True),
+        (remove_after_ts, [120], False),
+    ],
+)
+def test_process_incremental(tmp_path, func, args, raw):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    growing = tmp_path / "RAW:2025.pb"
+    write = tmp_path / "RAW:2025_reduced.pb"
+    expected = tmp_path / "RAW:2025_expected.pb"
+    state_file = tmp_path / "state.json"
+    ArchiverData(read).process_and_write(expected, False, func, args, raw=raw)
+
+    header, lines = split_lines(read)
+    growing.write_bytes(header)
+    bounds = [0, 100, 150, 600, len(lines)]
+    for start, end in zip(bounds, bounds[1:], strict=False):
+        with open(growing, "ab") as f:
+            f.write(b"".join(lines[start:end]))
+        ad = ArchiverData(growing)
+        process_incremental(ad, write, state_file, func, args, raw=raw)
+    assert write.read_bytes() == expected.read_bytes()
+    state = json.loads(state_file.read_text())
+    assert state["input_offset"] == read.stat().st_size
+    assert state["output_offset"] == expected.stat().st_size
+
+
+def test_process_incremental_partial_line(tmp_path):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    growing = tmp_path / "RAW:2025.pb"
+    write = tmp_path / "RAW:2025_reduced.pb"
+    state_file = tmp_path / "state.json"
+    header, lines = split_lines(read)
+    growing.write_bytes(header + b"".join(lines[:10]) + lines[10][:3])
+    count = process_incremental(
+        ArchiverData(growing), write, state_file, remove_by_factor, [1]
+    )
+    assert count == 10
+    with open(growing, "ab") as f:
+        f.write(lines[10][3:])
+    count = process_incremental(
+        ArchiverData(growing), write, state_file, remove_by_factor, [1]
+    )
+    assert count == 1
+    assert write.read_bytes() == header + b"".join(lines[:11])
+
+
+def test_process_incremental_interrupted_output(tmp_path):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    write = tmp_path / "RAW:2025_reduced.pb"
+    state_file = tmp_path / "state.json"
+    ad = ArchiverData(read)
+    process_incremental(ad, write, state_file, remove_by_factor, [2], raw=True)
+    expected = write.read_bytes()
+    # A run that appended samples but was stopped before saving its state
+    with open(write, "ab") as f:
+        f.write(b"partial")
+    process_incremental(ad, write, state_file, remove_by_factor, [2], raw=True)
+    assert write.read_bytes() == expected
+
+
+def test_process_incremental_wrong_state(tmp_path):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    write = tmp_path / "RAW:2025_reduced.pb"
+    state_file = tmp_path / "state.json"
+    ad = ArchiverData(read)
+    process_incremental(ad, write, state_file, remove_by_factor, [2], raw=True)
+    with pytest.raises(ValueError):
+        process_incremental(ad, write, state_file, remove_by_factor, [3], raw=True)
+    with pytest.raises(ValueError):
+        process_incremental(ad, write, state_file, apply_min_period, [2])
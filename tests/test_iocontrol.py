@@ -0,0 +1,108 @@
+import filecmp
+import shutil
+from pathlib import Path
+
+import pytest
+from typer.testing import CliRunner
+
+from aa_edit_data import iocontrol
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.compression import open_pb_read, open_pb_write
+from aa_edit_data.edit_data import app
+from aa_edit_data.iocontrol import LIMITS, RateLimiter, configure_io, open_file
+
+TEST_DATA = Path("tests/test_data")
+CLI_OUTPUT = Path("tests/test_data/cli_expected_output")
+
+runner = CliRunner()
+
+
+@pytest.fixture(autouse=True)
+def reset_limits():
+    yield
+    configure_io()
+
+
+def test_rate_limiter_sleeps(monkeypatch):
+    clock = [100.0]
+    sleeps = []
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(iocontrol.time, "monotonic", lambda: clock[0])
+    monkeypatch.setattr(iocontrol.time, "sleep", sleep)
+    limiter = RateLimiter(1000)
+    # The burst allowance is used up first
+    limiter.consume(250)
+    assert sleeps == []
+    limiter.consume(1000)
+    assert sleeps == [pytest.approx(1.0)]
+    limiter.consume(500)
+    assert sum(sleeps) == pytest.approx(1.5)
+
+
+def test_configure_io():
+    configure_io(10, drop_cache=True)
+    assert LIMITS.limiter is not None
+    assert LIMITS.limiter.rate == 10**7
+    assert LIMITS.active
+    configure_io()
+    assert LIMITS.limiter is None
+    assert not LIMITS.active
+
+
+def test_open_file_unlimited(tmp_path):
+    with open_file(tmp_path / "a.pb", "wb") as f:
+        assert not isinstance(f.raw, iocontrol.LimitedFile)  # type: ignore
+
+
+@pytest.mark.parametrize("suffix", [".pb", ".pb.gz", ".pb.xz", ".pb.zst"])
+def test_limited_round_trip(tmp_path, suffix):
+    configure_io(1000, drop_cache=True)
+    data = (TEST_DATA / "SCALAR_DOUBLE_test_data.pb").read_bytes()
+    write = tmp_path / f"SCALAR_DOUBLE{suffix}"
+    with open_pb_write(write) as f:
+        f.write(data)
+    with open_pb_read(write) as f:
+        assert f.read() == data
+
+
+def test_limited_drop_written(tmp_path, monkeypatch):
+    monkeypatch.setattr(iocontrol, "DROP_CHUNK_SIZE", 10)
+    configure_io(drop_cache=True)
+    write = tmp_path / "a.pb"
+    with open_file(write, "wb") as f:
+        f.write(b"x" * 25)
+        f.flush()
+        assert f.raw._unsynced == 0  # type: ignore
+    with open_file(write, "r+b") as f:
+        f.seek(20)
+        f.truncate()
+    assert write.read_bytes() == b"x" * 20
+
+
+def test_limited_read_backwards(tmp_path):
+    configure_io(1000, drop_cache=True)
+    read = tmp_path / "P:2021_short.pb"
+    shutil.copy(TEST_DATA / "P:2021_short.pb", read)
+    samples = list(ArchiverData(read).iter_reversed())
+    assert samples[::-1] == list(ArchiverData(read).get_samples())
+
+
+def test_cli_limited_reduce_to_period(tmp_path):
+    read = TEST_DATA / "SCALAR_STRING_test_data.pb"
+    write = tmp_path / "SCALAR_STRING_reduce_to_period.pb"
+    expected = CLI_OUTPUT / "SCALAR_STRING_reduce_to_period.pb"
+    cmd = [
+        "--max-io-rate=100",
+        "--drop-cache",
+        "reduce-to-period",
+        str(read),
+        "4.5",
+        f"--new-filename={write}",
+    ]
+    result = runner.invoke(app, cmd)
+    assert result.exit_code == 0
+    assert filecmp.cmp(write, expected, shallow=False)
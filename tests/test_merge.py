@@ -0,0 +1,58 @@
+import filecmp
+from pathlib import Path
+
+import pytest
+
+from aa_edit_data.merge import merge_files
+
+TEST_DATA = Path("tests/test_data")
+
+
+def split_lines(read: Path, tmp_path: Path) -> tuple[Path, Path]:
+    """Split the samples of a PB file alternately between two new PB files."""
+    header, *lines = read.read_bytes().splitlines(keepends=True)
+    even = tmp_path / "even.pb"
+    odd = tmp_path / "odd.pb"
+    even.write_bytes(header + b"".join(lines[::2]))
+    odd.write_bytes(header + b"".join(lines[1::2]))
+    return even, odd
+
+
+@pytest.mark.parametrize("raw", [False, True])
+def test_merge_files(tmp_path, raw):
+    read = TEST_DATA / "P:2021_short.pb"
+    even, odd = split_lines(read, tmp_path)
+    write = tmp_path / "merged.pb"
+    merge_files([odd, even], write, raw=raw)
+    assert filecmp.cmp(write, read, shallow=False)
+
+
+@pytest.mark.parametrize("raw", [False, True])
+def test_merge_files_duplicates(tmp_path, raw):
+    read = TEST_DATA / "SCALAR_DOUBLE_test_data.pb"
+    write = tmp_path / "merged.pb"
+    merge_files([read, read], write, raw=raw)
+    header, *lines = read.read_bytes().splitlines(keepends=True)
+    assert write.read_bytes() == header + b"".join(line * 2 for line in lines)
+    merge_files([read, read], write, raw=raw, drop_duplicates=True)
+    assert filecmp.cmp(write, read, shallow=False)
+
+
+def test_merge_files_in_place(tmp_path):
+    read = TEST_DATA / "P:2021_short.pb"
+    even, odd = split_lines(read, tmp_path)
+    merge_files([even, odd], even, raw=True)
+    assert filecmp.cmp(even, read, shallow=False)
+
+
+def test_merge_files_header_mismatch(tmp_path):
+    write = tmp_path / "merged.pb"
+    with pytest.raises(ValueError, match="type"):
+        merge_files(
+            [
+                TEST_DATA / "SCALAR_DOUBLE_test_data.pb",
+                TEST_DATA / "SCALAR_FLOAT_test_data.pb",
+            ],
+            write,
+        )
+    assert not write.exists()
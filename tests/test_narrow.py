@@ -0,0 +1,88 @@
+import struct
+from pathlib import Path
+
+import pytest
+
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.narrow import narrow_type
+
+np = pytest.importorskip("numpy")
+
+TEST_DATA = Path("tests/test_data")
+
+
+def other_fields(sample) -> tuple:
+    return (sample.secondsintoyear, sample.nano, sample.severity, sample.status)
+
+
+@pytest.mark.parametrize(
+    "filename, pv_type",
+    [
+        ("P:2021_short.pb", "SCALAR_FLOAT"),
+        ("SCALAR_DOUBLE_test_data.pb", "SCALAR_FLOAT"),
+        ("WAVEFORM_DOUBLE_test_data.pb", "WAVEFORM_FLOAT"),
+    ],
+)
+def test_narrow_type(tmp_path, filename, pv_type):
+    read = TEST_DATA / filename
+    write = tmp_path / "narrowed.pb"
+    original = list(ArchiverData(read).get_samples())
+    assert narrow_type(read, write, batch_size=64) == len(original)
+    ad = ArchiverData(write)
+    assert ad.pv_type == pv_type
+    narrowed = list(ad.get_samples())
+    assert [other_fields(sample) for sample in narrowed] == [
+        other_fields(sample) for sample in original
+    ]
+    values = np.array([sample.val for sample in original]).astype(np.float32)
+    assert np.array_equal(np.array([sample.val for sample in narrowed]), values)
+
+
+@pytest.mark.parametrize("keep_double", [False, True])
+def test_narrow_type_mantissa_bits(tmp_path, keep_double):
+    read = TEST_DATA / "P:2021_short.pb"
+    write = tmp_path / "narrowed.pb"
+    narrow_type(read, write, mantissa_bits=10, keep_double=keep_double)
+    ad = ArchiverData(write)
+    assert ad.pv_type == ("SCALAR_DOUBLE" if keep_double else "SCALAR_FLOAT")
+    values = np.array([sample.val for sample in ArchiverData(read).get_samples()])
+    truncated = np.array([sample.val for sample in ad.get_samples()])
+    assert np.all(np.abs(truncated) <= np.abs(values))
+    assert np.allclose(truncated, values, rtol=2**-10, atol=0)
+    dtype, bits = ("<u8", 52) if keep_double else ("<u4", 23)
+    as_int = truncated.astype("<f8" if keep_double else "<f4").view(dtype)
+    assert not np.any(as_int & ((1 << (bits - 10)) - 1))
+
+
+def test_narrow_type_waveform_edge_cases(tmp_path):
+    ad = ArchiverData(TEST_DATA / "WAVEFORM_DOUBLE_test_data.pb")
+    # An empty waveform, and one whose values were not packed
+    unpacked = b"\x08\x02\x10\x00" + b"".join(
+        b"\x19" + struct.pack("<d", val) for val in (0.1, -2.5)
+    )
+    read = tmp_path / "WAVEFORM_DOUBLE.pb"
+    read.write_bytes(
+        ad.serialize(ad.header)
+        + ad.serialize(ad.proto_class(secondsintoyear=1, nano=0))
+        + ad.escape_line(unpacked)
+    )
+    write = tmp_path / "narrowed.pb"
+    narrow_type(read, write)
+    samples = list(ArchiverData(write).get_samples())
+    assert list(samples[0].val) == []  # type: ignore
+    assert list(samples[1].val) == [np.float32(0.1), -2.5]  # type: ignore
+
+
+def test_narrow_type_invalid(tmp_path):
+    write = tmp_path / "narrowed.pb"
+    with pytest.raises(ValueError, match="only doubles"):
+        narrow_type(TEST_DATA / "SCALAR_FLOAT_test_data.pb", write)
+    with pytest.raises(ValueError, match="mantissa bits"):
+        narrow_type(TEST_DATA / "P:2021_short.pb", write, mantissa_bits=24)
+    ad = ArchiverData(TEST_DATA / "SCALAR_DOUBLE_test_data.pb")
+    read = tmp_path / "SCALAR_DOUBLE.pb"
+    sample = ad.proto_class(secondsintoyear=1, nano=0, val=1e300)  # type: ignore
+    read.write_bytes(ad.serialize(ad.header) + ad.serialize(sample))
+    with pytest.raises(ValueError, match="too large"):
+        narrow_type(read, write)
+    assert not write.exists()
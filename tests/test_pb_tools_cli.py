@@ -1,9 +1,13 @@
 import filecmp
+import gzip
+import json
+import shutil
 import subprocess
 import sys
 from os import PathLike
 from pathlib import Path
 
+import pytest
 from typer.testing import CliRunner
 
 from aa_edit_data import __version__
@@ -78,3 +82,167 @@ def test_cli_pb_2_csv():
     if are_identical:
         write = Path(write)
         write.unlink()
+
+
+def test_cli_pb_2_hdf5(tmp_path):
+    h5py = pytest.importorskip("h5py")
+    read = tmp_path / "WAVEFORM_SHORT.pb"
+    shutil.copy(TEST_DATA / "WAVEFORM_SHORT_test_data.pb", read)
+    result = runner.invoke(app, ["pb-2-hdf5", str(read), "--batch-size", "7"])
+    assert result.exit_code == 0
+    with h5py.File(tmp_path / "WAVEFORM_SHORT.h5") as f:
+        assert f["val"].shape == (100, 5)
+
+
+def test_cli_pb_2_hdf5_stdin_without_filename():
+    result = runner.invoke(app, ["pb-2-hdf5", "-"])
+    assert result.exit_code == 2
+
+
+def test_cli_pb_2_cold_and_back(tmp_path):
+    read = tmp_path / "RAW:2025_short.pb"
+    shutil.copy(TEST_DATA / "RAW:2025_short.pb", read)
+    result = runner.invoke(app, ["pb-2-cold", str(read)])
+    assert result.exit_code == 0
+    assert "1000 samples" in result.output
+    write = tmp_path / "restored.pb"
+    result = runner.invoke(
+        app, ["cold-2-pb", str(tmp_path / "RAW:2025_short.cold"), str(write)]
+    )
+    assert result.exit_code == 0
+    assert filecmp.cmp(read, write, shallow=False)
+
+
+def test_cli_pb_2_cold_stdin_without_filename():
+    result = runner.invoke(app, ["pb-2-cold", "-"])
+    assert result.exit_code == 2
+
+
+def test_cli_pb_2_txt_stats_json():
+    read = TEST_DATA / "RAW:2025_short.pb"
+    write = RESULTS / "RAW:2025_short_test_cli_pb_2_txt_stats.txt"
+    stats_json = RESULTS / "RAW:2025_short_test_cli_pb_2_txt_stats.json"
+    cmd = ["pb-2-txt", str(read), str(write), f"--stats-json={stats_json}"]
+    result = runner.invoke(app, cmd)
+    assert result.exit_code == 0
+    are_identical = filecmp.cmp(write, TEST_DATA / "RAW:2025_short.txt", shallow=False)
+    with open(stats_json) as f:
+        stats = json.load(f)
+    write.unlink()
+    stats_json.unlink()
+    assert are_identical
+    assert stats["samples_in"] == stats["samples_out"] > 0
+
+
+def test_cli_benchmark_regression():
+    baseline = RESULTS / "benchmark_regression_baseline.json"
+    with open(baseline, "w") as f:
+        json.dump({"benchmarks": {"raw_passthrough": {"relative": 10.0**9}}}, f)
+    cmd = ["benchmark", f"--baseline={baseline}", "--samples=100", "--repeats=1"]
+    result = runner.invoke(app, cmd)
+    baseline.unlink()
+    assert result.exit_code == 1
+    assert "REGRESSION raw_passthrough" in result.stderr
+
+
+def test_cli_print_header_compressed(tmp_path):
+    read = tmp_path / "RAW:2025_short.pb.gz"
+    with open(TEST_DATA / "RAW:2025_short.pb", "rb") as f:
+        read.write_bytes(gzip.compress(f.read()))
+    cmd = ["print-header", str(read), "--lines=1"]
+    expected = (
+        "Name: BL11K-EA-ADC-01:M4:CH4:RAW, Type: SCALAR_INT, Year: 2025\n"
+        + "DATE                   SECONDS     NANO         VAL\n"
+        + "2025-01-01 00:00:00           0      2588941    -1850\n"
+    )
+    result = runner.invoke(app, cmd)
+    assert result.stdout == expected
+
+
+def test_cli_pb_2_txt_stdin_stdout():
+    read = TEST_DATA / "RAW:2025_short.pb"
+    expected = TEST_DATA / "RAW:2025_short.txt"
+    cmd = ["pb-2-txt", "-"]
+    result = runner.invoke(app, cmd, input=gzip.compress(read.read_bytes()))
+    assert result.exit_code == 0
+    assert result.stdout == expected.read_text()
+
+
+def test_cli_catalog(tmp_path):
+    root = tmp_path / "archive"
+    root.mkdir()
+    shutil.copy(TEST_DATA / "SCALAR_DOUBLE_test_data.pb", root / "RAW:2025.pb")
+    database = tmp_path / "catalog.db"
+    cmd = ["catalog", str(root), "--database", str(database)]
+    result = runner.invoke(app, cmd)
+    assert result.exit_code == 0
+    assert "1 added" in result.stdout
+    result = runner.invoke(app, cmd)
+    assert "1 unchanged" in result.stdout
+
+
+def test_cli_summary():
+    read = TEST_DATA / "RAW:2025_short.pb"
+    result = runner.invoke(app, ["summary", str(read)])
+    assert result.exit_code == 0
+    assert result.stdout.splitlines() == [
+        "Name: BL11K-EA-ADC-01:M4:CH4:RAW, Type: SCALAR_INT, Year: 2025",
+        "Samples: 1000",
+        "First: 2025-01-01 00:00:00.002588",
+        "Last: 2025-01-01 00:03:13.102601",
+        "Average rate: 5.17348 Hz",
+        f"Bytes per sample: {read.stat().st_size / 1000:.1f}",
+    ]
+
+
+def test_cli_summary_stdin():
+    read = TEST_DATA / "RAW:2025_short.pb"
+    result = runner.invoke(
+        app, ["summary", "-"], input=gzip.compress(read.read_bytes())
+    )
+    assert result.exit_code == 0
+    assert "Samples: 1000" in result.stdout
+    assert "Bytes per sample" not in result.stdout
+
+
+def test_cli_tail():
+    read = TEST_DATA / "RAW:2025_short.pb"
+    expected = (TEST_DATA / "RAW:2025_short.txt").read_text().splitlines()
+    result = runner.invoke(app, ["tail", str(read), "-n", "3"])
+    assert result.exit_code == 0
+    assert result.stdout.splitlines() == [
+        "Name: BL11K-EA-ADC-01:M4:CH4:RAW, Type: SCALAR_INT, Year: 2025",
+        expected[1],
+        *expected[-3:],
+    ]
+
+
+def test_cli_tail_compressed(tmp_path):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    compressed = tmp_path / "RAW:2025_short.pb.gz"
+    compressed.write_bytes(gzip.compress(read.read_bytes()))
+    expected = runner.invoke(app, ["tail", str(read), "-n", "5"]).stdout
+    result = runner.invoke(app, ["tail", str(compressed), "-n", "5"])
+    assert result.exit_code == 0
+    assert result.stdout == expected
+
+
+def test_cli_validate(tmp_path):
+    read = TEST_DATA / "RAW:2025_short.pb"
+    header, *lines = read.read_bytes().splitlines(keepends=True)
+    damaged = tmp_path / "damaged.pb"
+    damaged.write_bytes(header + b"".join(lines[:10] + lines[9:]))
+    cmd = ["validate", str(read), str(damaged), "--processes", "2"]
+    result = runner.invoke(app, cmd)
+    assert result.exit_code == 1
+    assert result.stdout.splitlines() == [
+        f"{read}: 1000 samples, OK",
+        f"{damaged}:12: duplicate: (0, 902593841) is repeated",
+        f"{damaged}: 1001 samples, problems: duplicate 1",
+    ]
+
+
+def test_cli_validate_bad_header():
+    result = runner.invoke(app, ["validate", str(TEST_DATA / "dummy_file.pb")])
+    assert result.exit_code == 1
+    assert "the header cannot be decoded" in result.stdout
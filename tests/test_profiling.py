@@ -0,0 +1,59 @@
+import json
+
+from aa_edit_data.profiling import STAGES, ProcessStats
+
+
+def test_timed_yields_all_items():
+    stats = ProcessStats()
+    assert list(stats.timed(range(5), "read")) == [0, 1, 2, 3, 4]
+
+
+def test_timed_charges_nested_stages_exclusively():
+    stats = ProcessStats()
+
+    def slow_source():
+        for i in range(3):
+            sum(range(10**5))
+            yield i
+
+    items = stats.timed((i * 2 for i in stats.timed(slow_source(), "read")), "decode")
+    assert list(items) == [0, 2, 4]
+    assert stats.wall["read"] > stats.wall["decode"]
+    assert not stats._stack
+
+
+def test_timed_reads_clock_once_per_batch(monkeypatch):
+    stats = ProcessStats()
+    entered = []
+    monkeypatch.setattr(stats, "enter", entered.append)
+    monkeypatch.setattr(stats, "exit", lambda: None)
+    assert list(stats.timed(range(2500), "read", batch_size=1000)) == list(range(2500))
+    # Three batches, then an empty one at the end
+    assert entered == ["read"] * 4
+
+
+def test_count_in():
+    stats = ProcessStats()
+    lines = [b"abc\n", b"de\n"]
+    assert list(stats.count_in(lines)) == lines
+    assert stats.samples_in == 2
+    assert stats.bytes_in == 7
+
+
+def test_reduction_ratio():
+    stats = ProcessStats()
+    assert stats.reduction_ratio is None
+    stats.samples_in = 100
+    stats.samples_out = 25
+    assert stats.reduction_ratio == 4
+
+
+def test_write_json(tmp_path):
+    stats = ProcessStats()
+    stats.start()
+    stats.finish()
+    stats.write_json(tmp_path / "stats.json")
+    with open(tmp_path / "stats.json") as f:
+        result = json.load(f)
+    assert set(result["stages"]) == set(STAGES)
+    assert result["peak_rss"] > 0
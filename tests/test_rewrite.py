@@ -0,0 +1,73 @@
+import filecmp
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.rewrite import atomic_write, backup_file, temp_path
+
+TEST_DATA = Path("tests/test_data")
+
+
+def test_temp_path_keeps_extensions(tmp_path):
+    path = temp_path(tmp_path / "RAW:2025.pb.gz")
+    assert path.parent == tmp_path
+    assert path.name.startswith(".")
+    assert path.name.endswith(".RAW:2025.pb.gz")
+
+
+def test_atomic_write(tmp_path):
+    write = tmp_path / "RAW:2025.pb"
+    write.write_bytes(b"old")
+    write.chmod(0o640)
+    with atomic_write(write) as tmp:
+        tmp.write_bytes(b"new")
+        assert write.read_bytes() == b"old"
+    assert write.read_bytes() == b"new"
+    assert write.stat().st_mode & 0o777 == 0o640
+    assert os.listdir(tmp_path) == ["RAW:2025.pb"]
+
+
+def test_atomic_write_failure(tmp_path):
+    write = tmp_path / "RAW:2025.pb"
+    write.write_bytes(b"old")
+    with pytest.raises(RuntimeError), atomic_write(write) as tmp:
+        tmp.write_bytes(b"partial")
+        raise RuntimeError
+    assert write.read_bytes() == b"old"
+    assert os.listdir(tmp_path) == ["RAW:2025.pb"]
+
+
+@pytest.mark.parametrize("allow_hardlink", [True, False])
+def test_backup_file(tmp_path, allow_hardlink):
+    read = tmp_path / "RAW:2025.pb"
+    backup = tmp_path / "RAW:2025_backup.pb"
+    read.write_bytes(b"old")
+    backup.write_bytes(b"stale backup")
+    method = backup_file(read, backup, allow_hardlink=allow_hardlink)
+    if not allow_hardlink:
+        assert method != "hardlink"
+        assert not backup.samefile(read)
+    assert backup.read_bytes() == b"old"
+    with atomic_write(read) as tmp:
+        tmp.write_bytes(b"new")
+    assert backup.read_bytes() == b"old"
+    assert sorted(os.listdir(tmp_path)) == ["RAW:2025.pb", "RAW:2025_backup.pb"]
+
+
+def test_process_and_write_failure(tmp_path):
+    read = tmp_path / "SCALAR_STRING_test_data.pb"
+    shutil.copy(TEST_DATA / "SCALAR_STRING_test_data.pb", read)
+
+    def fail(samples):
+        for i, sample in enumerate(samples):
+            if i == 50:
+                raise RuntimeError
+            yield sample
+
+    with pytest.raises(RuntimeError):
+        ArchiverData(read).process_and_write(read, False, fail)
+    assert filecmp.cmp(read, TEST_DATA / "SCALAR_STRING_test_data.pb", shallow=False)
+    assert os.listdir(tmp_path) == ["SCALAR_STRING_test_data.pb"]
@@ -0,0 +1,103 @@
+import filecmp
+import random
+from pathlib import Path
+
+import pytest
+
+from aa_edit_data import sort
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.sort import DEFAULT_MEMORY, sort_file
+from aa_edit_data.validate import validate_file
+
+TEST_DATA = Path("tests/test_data")
+
+
+def shuffled(read: Path, write: Path, seed: int = 0):
+    header, *lines = read.read_bytes().splitlines(keepends=True)
+    random.Random(seed).shuffle(lines)
+    write.write_bytes(header + b"".join(lines))
+
+
+def test_sort_file_in_memory(tmp_path):
+    read = TEST_DATA / "P:2021_short.pb"
+    scrambled = tmp_path / "scrambled.pb"
+    shuffled(read, scrambled)
+    write = tmp_path / "sorted.pb"
+    count, out_of_order, unsortable = sort_file(scrambled, write, temp_dir=tmp_path)
+    assert count == 10000
+    assert 0 < out_of_order < count
+    assert unsortable == 0
+    assert filecmp.cmp(write, read, shallow=False)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "scrambled.pb",
+        "sorted.pb",
+    ]
+
+
+@pytest.mark.parametrize("fan_in", [64, 2])
+def test_sort_file_external(tmp_path, monkeypatch, fan_in):
+    monkeypatch.setattr(sort, "MERGE_FAN_IN", fan_in)
+    read = TEST_DATA / "P:2021_short.pb"
+    write = tmp_path / "P:2021.pb"
+    shuffled(read, write)
+    # About 20 runs
+    memory = read.stat().st_size * 2 / sort.MB / 20
+    sort_file(write, write, memory=memory, temp_dir=tmp_path)
+    assert filecmp.cmp(write, read, shallow=False)
+    assert [path.name for path in tmp_path.iterdir()] == ["P:2021.pb"]
+
+
+def test_sort_file_sorted(tmp_path):
+    read = TEST_DATA / "SCALAR_DOUBLE_test_data.pb"
+    write = tmp_path / "sorted.pb"
+    assert sort_file(read, write, memory=0.001) == (100, 0, 0)
+    assert filecmp.cmp(write, read, shallow=False)
+
+
+def test_sort_file_stable(tmp_path):
+    read = TEST_DATA / "SCALAR_DOUBLE_test_data.pb"
+    ad = ArchiverData(read)
+    samples = list(ad.get_samples())
+    lines = []
+    for sample in samples[::-1]:
+        # Three different samples with each timestamp, in a known order
+        for val in (1.0, 2.0, 3.0):
+            sample.val = val  # type: ignore
+            lines.append(ad.serialize(sample))
+    write = tmp_path / "scrambled.pb"
+    write.write_bytes(ad.serialize(ad.header) + b"".join(lines))
+    sort_file(write, write, memory=0.001)
+    result = list(ArchiverData(write).get_samples())
+    assert [(s.secondsintoyear, s.nano) for s in result] == [
+        (s.secondsintoyear, s.nano) for s in samples for _ in range(3)
+    ]
+    assert [s.val for s in result] == [1.0, 2.0, 3.0] * 100
+
+
+def test_sort_file_partial_last_line(tmp_path):
+    read = TEST_DATA / "SCALAR_DOUBLE_test_data.pb"
+    header, *lines = read.read_bytes().splitlines(keepends=True)
+    write = tmp_path / "scrambled.pb"
+    write.write_bytes(header + b"".join(lines[50:]) + b"".join(lines[:50])[:-1])
+    assert sort_file(write, write) == (99, 1, 1)
+    # The partly written last line stays last, still without a newline
+    assert write.read_bytes() == (
+        header + b"".join(lines[:49] + lines[50:]) + lines[49][:-1]
+    )
+    assert "partial" in [problem.kind for problem in validate_file(write)[1]]
+
+
+@pytest.mark.parametrize("memory", [DEFAULT_MEMORY, 0.001])
+def test_sort_file_truncated_last_line(tmp_path, memory):
+    read = TEST_DATA / "SCALAR_DOUBLE_test_data.pb"
+    header, *lines = read.read_bytes().splitlines(keepends=True)
+    scrambled = tmp_path / "scrambled.pb"
+    # An undecodable line, and a last sample cut off part way through its value
+    garbage = b"\x0f\xff\n"
+    truncated = lines[0][:-4]
+    scrambled.write_bytes(
+        header + b"".join(lines[50:]) + garbage + b"".join(lines[1:50]) + truncated
+    )
+    write = tmp_path / "sorted.pb"
+    assert sort_file(scrambled, write, memory=memory) == (99, 1, 2)
+    assert write.read_bytes() == header + b"".join(lines[1:]) + garbage + truncated
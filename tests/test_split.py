@@ -0,0 +1,140 @@
+import gzip
+import shutil
+from pathlib import Path
+
+import pytest
+
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.split import find_offset, partition_starts, split_file
+
+TEST_DATA = Path("tests/test_data")
+
+
+def test_partition_starts():
+    months = partition_starts(2024, "month")
+    assert len(months) == 12
+    assert months[2] == ((31 + 29) * 86400, "_03")
+    assert len(partition_starts(2024, "day")) == 366
+    hours = partition_starts(2025, "hour")
+    assert len(hours) == 365 * 24
+    assert hours[-1] == (365 * 86400 - 3600, "_12_31_23")
+    with pytest.raises(ValueError):
+        partition_starts(2025, "week")
+
+
+def test_find_offset():
+    read = TEST_DATA / "P:2021_short.pb"
+    ad = ArchiverData(read)
+    start, end = ad.get_sample_range()
+    lines = list(ad.get_samples_bytes())
+    offsets = [start]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line))
+    seconds = [sample.secondsintoyear for sample in ad.get_samples()]
+    with open(read, "rb") as f:
+        for index in (0, 1, 4999, 9999):
+            assert find_offset(f, start, end, seconds[index]) == offsets[index]
+        assert find_offset(f, start, end, seconds[-1] + 1) == end
+        assert find_offset(f, start, end, 0) == start
+
+
+def check_split(read: Path, written: list[Path], by: str):
+    ad = ArchiverData(read)
+    header = ad.serialize(ad.header)
+    data = b""
+    for filepath in written:
+        part = ArchiverData(filepath)
+        assert part.serialize(part.header) == header
+        names = {
+            ArchiverData.get_sample_datetime(2021, sample).strftime(
+                {"day": "_%m_%d", "hour": "_%m_%d_%H"}[by]
+            )
+            for sample in part.get_samples()
+        }
+        assert names == {filepath.name[len("P:2021") : filepath.name.index(".")]}
+        data += b"".join(part.get_samples_bytes())
+    assert data == b"".join(ad.get_samples_bytes())
+
+
+@pytest.mark.parametrize("by", ["day", "hour"])
+def test_split_file(tmp_path, by):
+    read = tmp_path / "P:2021.pb"
+    shutil.copy(TEST_DATA / "P:2021_short.pb", read)
+    written = split_file(read, by)
+    assert written[0] == tmp_path / (
+        "P:2021_05_28.pb" if by == "day" else "P:2021_05_28_11.pb"
+    )
+    assert len(written) == (3 if by == "day" else 52)
+    check_split(read, written, by)
+
+
+def test_split_file_compressed(tmp_path):
+    read = tmp_path / "P:2021.pb.gz"
+    read.write_bytes(gzip.compress((TEST_DATA / "P:2021_short.pb").read_bytes()))
+    written = split_file(read, "day", tmp_path / "out")
+    assert [path.name for path in written] == [
+        "P:2021_05_28.pb.gz",
+        "P:2021_05_29.pb.gz",
+        "P:2021_05_30.pb.gz",
+    ]
+    check_split(read, written, "day")
+
+
+def test_split_file_compressed_out_of_order(tmp_path):
+    header, *lines = (TEST_DATA / "P:2021_short.pb").read_bytes().splitlines(True)
+    read = tmp_path / "P:2021.pb.gz"
+    read.write_bytes(gzip.compress(header + b"".join(lines[::-1])))
+    with pytest.raises(ValueError, match="order"):
+        split_file(read, "day")
+    assert [path.name for path in tmp_path.iterdir()] == ["P:2021.pb.gz"]
+
+
+def test_split_file_out_of_order(tmp_path):
+    header, *lines = (TEST_DATA / "P:2021_short.pb").read_bytes().splitlines(True)
+    read = tmp_path / "P:2021.pb"
+    # A sample of the last day among those of the first day
+    read.write_bytes(header + lines[-1] + b"".join(lines[:-1]))
+    with pytest.raises(ValueError, match="order"):
+        split_file(read, "day")
+    assert [path.name for path in tmp_path.iterdir()] == ["P:2021.pb"]
+
+
+def test_split_file_exists(tmp_path):
+    read = tmp_path / "P:2021.pb"
+    shutil.copy(TEST_DATA / "P:2021_short.pb", read)
+    existing = tmp_path / "P:2021_12_31.pb"
+    existing.write_bytes(b"")
+    with pytest.raises(FileExistsError, match="P:2021_12_31.pb"):
+        split_file(read, "day")
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "P:2021.pb",
+        "P:2021_12_31.pb",
+    ]
+    written = split_file(read, "day", force=True)
+    check_split(read, written, "day")
+
+
+@pytest.mark.parametrize("suffix", ["", ".gz"])
+def test_split_file_truncated_last_line(tmp_path, suffix):
+    header, *lines = (TEST_DATA / "P:2021_short.pb").read_bytes().splitlines(True)
+    truncated = lines[-1][:-3]
+    data = header + b"".join(lines[:-1]) + truncated
+    read = tmp_path / f"P:2021.pb{suffix}"
+    read.write_bytes(gzip.compress(data) if suffix else data)
+    written = split_file(read, "day", tmp_path / "out")
+    assert len(written) == 3
+    parts = [b"".join(ArchiverData(path).get_samples_bytes()) for path in written]
+    # The partly written last line is kept unchanged at the end of the last partition
+    assert parts[-1].endswith(lines[-2] + truncated)
+    assert b"".join(parts) == b"".join(lines[:-1]) + truncated
+
+
+@pytest.mark.parametrize("suffix", ["", ".gz"])
+def test_split_file_only_partial_line(tmp_path, suffix):
+    header, *lines = (TEST_DATA / "P:2021_short.pb").read_bytes().splitlines(True)
+    data = header + lines[0][:-3]
+    read = tmp_path / f"P:2021.pb{suffix}"
+    read.write_bytes(gzip.compress(data) if suffix else data)
+    with pytest.raises(ValueError, match="partly written"):
+        split_file(read, "day", tmp_path / "out")
+    assert list((tmp_path / "out").iterdir()) == []
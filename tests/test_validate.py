@@ -0,0 +1,172 @@
+import gzip
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
+from pathlib import Path
+
+import pytest
+from google.protobuf.message import DecodeError
+
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.validate import (
+    find_bad_escape,
+    split_ranges,
+    summarise,
+    validate_file,
+    validate_files,
+)
+
+TEST_DATA = Path("tests/test_data")
+
+
+def damaged_file(filepath: Path) -> Path:
+    """Write a copy of SCALAR_DOUBLE_test_data.pb with a problem of each kind."""
+    ad = ArchiverData(TEST_DATA / "SCALAR_DOUBLE_test_data.pb")
+    header, *lines = (
+        (TEST_DATA / "SCALAR_DOUBLE_test_data.pb")
+        .read_bytes()
+        .splitlines(keepends=True)
+    )
+    late = ad.deserialize(lines[20], ad.proto_class)
+    late.secondsintoyear = 366 * 86400
+    lines[10] = lines[9]
+    lines[30], lines[31] = lines[31], lines[30]
+    lines[40] = b"\x1b\x05\xff\xff\n"
+    lines[60:60] = [ad.serialize(late)]
+    filepath.write_bytes(header + b"".join(lines) + lines[-1].rstrip(b"\n"))
+    return filepath
+
+
+EXPECTED = [
+    (12, "duplicate"),
+    (33, "order"),
+    (42, "escape"),
+    (42, "undecodable"),
+    (62, "timestamp"),
+    (63, "order"),
+    (103, "partial"),
+    (103, "duplicate"),
+]
+
+
+@pytest.mark.parametrize(
+    "filename",
+    [
+        "P:2021_short.pb",
+        "SCALAR_STRING_test_data.pb",
+        "WAVEFORM_SHORT_test_data.pb",
+        "V4_GENERIC_BYTES_test_data.pb",
+    ],
+)
+def test_validate_file_ok(filename):
+    count, problems = validate_file(TEST_DATA / filename)
+    assert count == len(list(ArchiverData(TEST_DATA / filename).get_samples_bytes()))
+    assert problems == []
+
+
+def test_validate_file_problems(tmp_path):
+    filepath = damaged_file(tmp_path / "damaged.pb")
+    count, problems = validate_file(filepath)
+    assert count == 102
+    assert [(problem.line, problem.kind) for problem in problems] == EXPECTED
+    assert summarise(problems) == (
+        "duplicate 2, order 2, escape 1, undecodable 1, timestamp 1, partial 1"
+    )
+    lines = filepath.read_bytes().splitlines(keepends=True)
+    for problem in problems:
+        assert sum(len(line) for line in lines[: problem.line - 1]) == problem.offset
+
+
+def test_validate_file_parallel(tmp_path):
+    filepath = damaged_file(tmp_path / "damaged.pb")
+    expected = validate_file(filepath)
+    with ProcessPoolExecutor(2) as executor:
+        for range_size in (1, 100, 1000):
+            assert validate_file(filepath, executor, range_size) == expected
+
+
+def test_validate_file_compressed(tmp_path):
+    filepath = damaged_file(tmp_path / "damaged.pb")
+    compressed = tmp_path / "damaged.pb.gz"
+    compressed.write_bytes(gzip.compress(filepath.read_bytes()))
+    assert validate_file(compressed) == validate_file(filepath)
+
+
+class RecordingExecutor(Executor):
+    """Run tasks when their results are first waited for, recording the order in
+    which tasks are submitted and waited for."""
+
+    def __init__(self):
+        self.events = []
+
+    def submit(self, fn, /, *args, **kwargs):
+        executor = self
+
+        class LazyFuture(Future):
+            def result(self, timeout=None):
+                if not self.done():
+                    executor.events.append("result")
+                    self.set_result(fn(*args, **kwargs))
+                return super().result(timeout)
+
+        self.events.append("submit")
+        return LazyFuture()
+
+
+def test_validate_files(tmp_path):
+    damaged = damaged_file(tmp_path / "damaged.pb")
+    compressed = tmp_path / "damaged.pb.gz"
+    compressed.write_bytes(gzip.compress(damaged.read_bytes()))
+    filepaths = [
+        damaged,
+        TEST_DATA / "dummy_file.pb",
+        compressed,
+        TEST_DATA / "P:2021_short.pb",
+    ]
+    executor = RecordingExecutor()
+    results = list(validate_files(filepaths, executor, range_size=1000))
+    assert [filepath for filepath, _ in results] == filepaths
+    assert isinstance(results[1][1], DecodeError)
+    for filepath, result in results[:1] + results[2:]:
+        assert result == validate_file(filepath)
+    # Every file is submitted before any result is waited for
+    submits = executor.events.count("submit")
+    assert submits > len(filepaths)
+    assert executor.events == ["submit"] * submits + ["result"] * submits
+
+
+def test_validate_file_element_count(tmp_path):
+    ad = ArchiverData(TEST_DATA / "WAVEFORM_DOUBLE_test_data.pb")
+    ad.header.elementCount = 5
+    samples = list(ad.get_samples())
+    del samples[3].val[-1]  # type: ignore
+    filepath = tmp_path / "waveform.pb"
+    filepath.write_bytes(
+        ad.serialize(ad.header) + b"".join(ad.serialize(s) for s in samples)
+    )
+    _, problems = validate_file(filepath)
+    assert [(problem.line, problem.kind) for problem in problems] == [
+        (5, "element_count")
+    ]
+    assert problems[0].message == "4 elements, not 5"
+
+
+def test_split_ranges():
+    filepath = TEST_DATA / "P:2021_short.pb"
+    ad = ArchiverData(filepath)
+    start, end = ad.get_sample_range()
+    ranges = split_ranges(filepath, start, end, 10000)
+    assert ranges[0][0] == start
+    assert ranges[-1][1] == end
+    data = filepath.read_bytes()
+    for a, b in ranges:
+        assert data[a - 1 : a] == b"\n"
+        assert data[b - 1 : b] == b"\n"
+    assert all(b == c for (_, b), (c, _) in zip(ranges[:-1], ranges[1:], strict=True))
+
+
+def test_find_bad_escape():
+    assert find_bad_escape(b"a\x1b\x01b\x1b\x02c\x1b\x03") is None
+    assert (
+        find_bad_escape(b"a\x1b\x04") == "Bad escape sequence b'\\x1b\\x04' at byte 1"
+    )
+    assert find_bad_escape(b"ab\x1b") == "Bad escape sequence b'\\x1b' at byte 2"
+    assert find_bad_escape(b"a\rb") == "Unescaped carriage return at byte 1"
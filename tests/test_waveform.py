@@ -0,0 +1,163 @@
+import struct
+from pathlib import Path
+
+import pytest
+
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.generated import EPICSEvent_pb2
+from aa_edit_data.waveform import (
+    decode_values,
+    decode_varints,
+    extract_elements,
+    read_waveforms,
+)
+from aa_edit_data.wire import encode_varint
+
+TEST_DATA = Path("tests/test_data")
+TYPES = ["DOUBLE", "FLOAT", "INT", "SHORT", "ENUM"]
+
+
+@pytest.mark.parametrize("pv_type", TYPES)
+@pytest.mark.parametrize("batch_size", [1, 7, 1024])
+def test_read_waveforms(pv_type, batch_size):
+    np = pytest.importorskip("numpy")
+    read = TEST_DATA / f"WAVEFORM_{pv_type}_test_data.pb"
+    samples = list(ArchiverData(read).get_samples())
+    batches = list(read_waveforms(read, batch_size))
+    assert len(batches) == -(-len(samples) // batch_size)
+    assert all(batch.val.shape == (len(batch.nano), 5) for batch in batches)
+    seconds = np.concatenate([batch.secondsintoyear for batch in batches])
+    nano = np.concatenate([batch.nano for batch in batches])
+    val = np.concatenate([batch.val for batch in batches])
+    assert seconds.tolist() == [sample.secondsintoyear for sample in samples]
+    assert nano.tolist() == [sample.nano for sample in samples]
+    for field in ("severity", "status"):
+        column = np.concatenate([getattr(batch, field) for batch in batches])
+        assert column.tolist() == [getattr(sample, field) for sample in samples]
+    assert val.tolist() == [list(sample.val) for sample in samples]  # type: ignore
+
+
+def test_read_waveforms_changing_length(tmp_path):
+    np = pytest.importorskip("numpy")
+    ad = ArchiverData(TEST_DATA / "WAVEFORM_SHORT_test_data.pb")
+    lengths = [3, 3, 2, 2, 2, 0, 4]
+    values = [[-32768, 32767, 10, -1][:length] for length in lengths]
+    lines = [ad.serialize(ad.header)]
+    for i, val in enumerate(values):
+        sample = ad.proto_class(secondsintoyear=i, nano=10, val=val, status=-i)  # type: ignore
+        lines.append(ad.serialize(sample))
+    write = tmp_path / "WAVEFORM_SHORT.pb"
+    write.write_bytes(b"".join(lines))
+    batches = list(read_waveforms(write, batch_size=2))
+    assert [batch.val.shape for batch in batches] == [
+        (2, 3),
+        (2, 2),
+        (1, 2),
+        (1, 0),
+        (1, 4),
+    ]
+    assert [row for batch in batches for row in batch.val.tolist()] == values
+    assert batches[0].val.dtype == np.int16
+    assert [status for batch in batches for status in batch.status] == [
+        -i for i in range(len(values))
+    ]
+
+
+def test_read_waveforms_unpacked(tmp_path):
+    pytest.importorskip("numpy")
+    ad = ArchiverData(TEST_DATA / "WAVEFORM_DOUBLE_test_data.pb")
+    # Each value as its own field, as written by encoders that do not pack them
+    unpacked = b"\x08\x05\x10\x0a" + b"".join(
+        b"\x19" + struct.pack("<d", val) for val in (1.5, -2.0, 10.0)
+    )
+    write = tmp_path / "WAVEFORM_DOUBLE.pb"
+    write.write_bytes(ad.serialize(ad.header) + ad.escape_line(unpacked))
+    (batch,) = read_waveforms(write)
+    assert batch.secondsintoyear.tolist() == [5]
+    assert batch.nano.tolist() == [10]
+    assert batch.val.tolist() == [[1.5, -2.0, 10.0]]
+
+
+def test_read_waveforms_scalar():
+    pytest.importorskip("numpy")
+    with pytest.raises(ValueError, match="ScalarDouble"):
+        list(read_waveforms(TEST_DATA / "SCALAR_DOUBLE_test_data.pb"))
+
+
+def test_decode_varints():
+    pytest.importorskip("numpy")
+    assert decode_varints(b"\x00\x7f\x80\x01\xac\x02").tolist() == [0, 127, 128, 300]
+    assert decode_varints(b"").tolist() == []
+    with pytest.raises(ValueError):
+        decode_varints(b"\x01\x80")
+    values = [2**64 - 1, 1, 2**35, 0, 2**63, 16383, 16384]
+    data = b"".join(encode_varint(value) for value in values)
+    assert decode_varints(data).tolist() == values
+
+
+@pytest.mark.parametrize("proto_class_name", ["VectorShort", "VectorEnum"])
+def test_decode_values_zigzag(proto_class_name):
+    pytest.importorskip("numpy")
+    val = [0, -1, 1, -32768, 32767, -64, 64, 8191, -8192]
+    sample = getattr(EPICSEvent_pb2, proto_class_name)(val=val)
+    payload = sample.SerializePartialToString()[2:]
+    assert decode_values(payload, proto_class_name).tolist() == val
+    assert decode_values(b"", proto_class_name).tolist() == []
+    with pytest.raises(ValueError):
+        decode_values(payload[:-1] + b"\x80", proto_class_name)
+
+
+@pytest.mark.parametrize("pv_type", TYPES)
+def test_extract_elements_index(tmp_path, pv_type):
+    read = TEST_DATA / f"WAVEFORM_{pv_type}_test_data.pb"
+    write = tmp_path / "scalar.pb"
+    assert extract_elements(read, write, 3) == 100
+    ad = ArchiverData(write)
+    assert ad.pv_type == f"SCALAR_{pv_type}"
+    for sample, original in zip(
+        ad.get_samples(), ArchiverData(read).get_samples(), strict=True
+    ):
+        assert sample.val == original.val[3]  # type: ignore
+        original.ClearField("val")
+        sample.ClearField("val")
+        assert sample.SerializePartialToString() == original.SerializeToString()
+
+
+@pytest.mark.parametrize("pv_type", TYPES)
+@pytest.mark.parametrize("start, stop", [(0, 5), (1, 3), (4, 100), (5, 8)])
+def test_extract_elements_range(tmp_path, pv_type, start, stop):
+    read = TEST_DATA / f"WAVEFORM_{pv_type}_test_data.pb"
+    write = tmp_path / "waveform.pb"
+    extract_elements(read, write, start, stop)
+    ad = ArchiverData(write)
+    assert ad.pv_type == f"WAVEFORM_{pv_type}"
+    expected = []
+    for sample in ArchiverData(read).get_samples():
+        val = sample.val[start:stop]  # type: ignore
+        sample.ClearField("val")
+        sample.val.extend(val)  # type: ignore
+        expected.append(ad.serialize(sample))
+    assert list(ad.get_samples_bytes()) == expected
+
+
+def test_extract_elements_element_count(tmp_path):
+    ad = ArchiverData(TEST_DATA / "WAVEFORM_INT_test_data.pb")
+    ad.header.elementCount = 5
+    read = tmp_path / "WAVEFORM_INT.pb"
+    ad.write_pb(read)
+    extract_elements(read, tmp_path / "range.pb", 2, 10)
+    assert ArchiverData(tmp_path / "range.pb").header.elementCount == 3
+    extract_elements(read, tmp_path / "scalar.pb", 2)
+    assert ArchiverData(tmp_path / "scalar.pb").header.elementCount == 1
+
+
+def test_extract_elements_invalid(tmp_path):
+    read = TEST_DATA / "WAVEFORM_SHORT_test_data.pb"
+    write = tmp_path / "scalar.pb"
+    with pytest.raises(ValueError, match="no element 5"):
+        extract_elements(read, write, 5)
+    assert not write.exists()
+    with pytest.raises(ValueError):
+        extract_elements(read, write, 3, 3)
+    with pytest.raises(ValueError, match="VectorString"):
+        extract_elements(TEST_DATA / "WAVEFORM_STRING_test_data.pb", write, 0)
@@ -0,0 +1,53 @@
+from pathlib import Path
+
+import pytest
+
+from aa_edit_data.archiver_data import ArchiverData
+from aa_edit_data.wire import (
+    encode_varint,
+    iter_fields,
+    read_varint,
+    wire_seconds,
+    wire_timestamp,
+)
+
+TEST_DATA = Path("tests/test_data")
+
+
+def test_read_varint():
+    assert read_varint(b"\x08\x96\x01", 1) == (150, 3)
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 150, 2**32 - 1, 2**63])
+def test_encode_varint(value):
+    encoded = encode_varint(value)
+    assert read_varint(encoded, 0) == (value, len(encoded))
+
+
+@pytest.mark.parametrize(
+    "filename", ["P:2021_short.pb", "WAVEFORM_STRING_test_data.pb"]
+)
+def test_wire_timestamp(filename):
+    ad = ArchiverData(TEST_DATA / filename)
+    for line, sample in zip(ad.get_samples_bytes(), ad.get_samples(), strict=True):
+        assert wire_timestamp(line) == (sample.secondsintoyear, sample.nano)
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        b"\x08\x96\x01\x10\x05\n",
+        # An escaped newline in secondsintoyear
+        b"\x08\x1b\x02\x10\x05\n",
+        # secondsintoyear after nano
+        b"\x10\x05\x08\x96\x01\n",
+        b"\x10\x05\n",
+    ],
+)
+def test_wire_seconds(line):
+    assert wire_seconds(line) == wire_timestamp(line)[0]
+
+
+def test_iter_fields_truncated():
+    with pytest.raises(ValueError):
+        list(iter_fields(b"\x08\x96"))